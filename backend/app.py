@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request, Blueprint
+from flask import Flask, jsonify, request, Blueprint, Response, stream_with_context
 from flask_cors import CORS
 import os
 import json
@@ -13,7 +13,10 @@ import re
 from textblob import TextBlob
 import duckdb
 import logging
+import math
 import sys
+import threading
+import time
 from dotenv import load_dotenv
 
 # Imports for machine learning and NLP capabilities
@@ -24,9 +27,40 @@ from sklearn.metrics import silhouette_score
 
 # Import chat module - we'll import this later to avoid circular imports
 from chat.routes import init_chat_module
+from ingest.snapshot import (
+    ensure_snapshot, attach_snapshot, default_snapshot_path, require_snapshot, snapshot_dataset_version, SNAPSHOT_ALIAS
+)
+from ingest.routes import init_ingest_module, start_tailer
+from ingest.progress import ATTACHING, load_progress
+from ingest.version import set_version
+from ingest.schema import (
+    DIMENSIONS, POSTS_TABLE, TIME_BUCKETS, TRIGRAMS_TABLE, dimension_view_sql, has_table, lengths_view_sql,
+    posts_view_sql, terms_view_sql, trigrams_view_sql
+)
+from query.dimensions import EXCLUDED_AUTHORS_FILTER, top_values_sql
+from query.cache import create_response_cache
+from query.columnar import arrow_response, columns_json, fetch_columns, response_format
+from query.conditional import conditional_get
+from query.dashboard import DASHBOARD_COLUMNS, DASHBOARD_TEXT_COLUMNS, materialized, run_panels
+from query.export import EXPORT_FORMATS, EXPORT_STREAMS
+from query.filters import FilterSpec
+from query.guard import DOWNGRADED, QueryTooExpensive, create_query_guard, current_deadline, estimate_rows
+from query.fulltext import set_trigram_index
+from query.pagination import (
+    DEFAULT_TOTAL_LIMIT, KEYSET_ORDER, TOTAL_MODES, count_matches, encode_cursor, keyset_condition
+)
+from query.pool import DEFAULT_ACQUIRE_TIMEOUT, DEFAULT_POOL_SIZE, PooledConnection, init_pool, request_cursor
+from query.prepared import execute_prepared
+from query.relevance import SORT_MODES, relevance_scores_sql
+from query.serialization import init_json
+from query.stats import compute_stats, stats_rollup
 
 # Initialize Flask app
 app = Flask(__name__)
+
+# jsonify encodes with orjson when installed (JSON_SERIALIZER=auto|orjson|stdlib)
+init_json(app)
+
 CORS(app, origins=[
     "https://reddit-dashboard-one.vercel.app",
     "https://reddit-dashboard-git-main-sarthakb11.vercel.app",
@@ -43,9 +77,30 @@ CORS(app, origins=[
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Serve a prebuilt snapshot read-only, so several worker processes can open
+# the same database file; admin ingests are then disabled
+READ_ONLY = os.getenv('DB_READ_ONLY', '').lower() in ('1', 'true', 'yes')
+
 # Initialize DuckDB connection
 con = duckdb.connect(database=':memory:')
 
+# Cap this process's buffer pool, e.g. to fit several workers on one machine
+if os.getenv('DB_MEMORY_LIMIT_MB'):
+    con.execute(f"SET memory_limit = '{int(os.getenv('DB_MEMORY_LIMIT_MB'))}MB'")
+
+# Requests query through a pool of cursors on the connection, so they run in parallel
+db_pool = init_pool(
+    app, con,
+    size=int(os.getenv('DB_POOL_SIZE', DEFAULT_POOL_SIZE)),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', DEFAULT_ACQUIRE_TIMEOUT))
+)
+
+# Analytics responses are cached per endpoint, parameters and dataset version
+response_cache = create_response_cache()
+
+# Heavy endpoints run under time budgets and cost limits
+query_guard = create_query_guard()
+
 # Gemini API integration
 try:
     import google.generativeai as genai
@@ -82,68 +137,109 @@ except ImportError:
     logger.warning("Gemini API not available. Using fallback implementation.")
     GEMINI_AVAILABLE = False
 
+# Function to locate the source data file
+def find_data_path():
+    """Return the path of the Reddit data: a JSONL file, a directory of daily files or a glob"""
+    # DATA_PATH can point at a single file, a directory of partitions or a glob
+    data_path = os.getenv('DATA_PATH')
+    if data_path:
+        logger.info(f"Using data from DATA_PATH: {data_path}")
+        return data_path
+    
+    # Try different possible data paths
+    possible_paths = [
+        os.path.join('/app', 'data', 'data.jsonl'),  # Docker path
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', 'data', 'data.jsonl'),  # Local dev path
+        os.path.join(os.path.dirname(__file__), 'data', 'data.jsonl'),  # Current directory path
+        os.path.join('data', 'data.jsonl')  # Relative path
+    ]
+    
+    for path in possible_paths:
+        if os.path.exists(path):
+            logger.info(f"Found data file at: {path}")
+            return path
+    
+    raise FileNotFoundError(f"Data file not found in any of the following locations: {', '.join(possible_paths)}")
+
 # Function to load and process data
 def load_and_process_data():
-    """Load and process the Reddit data from JSONL file"""
+    """Load the Reddit data, reusing the on-disk snapshot when the JSONL is unchanged"""
+    load_progress.start()
     try:
         logger.info("Starting data loading process...")
         
-        # Try different possible data paths
-        possible_paths = [
-            os.path.join('/app', 'data', 'data.jsonl'),  # Docker path
-            os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', 'data', 'data.jsonl'),  # Local dev path
-            os.path.join(os.path.dirname(__file__), 'data', 'data.jsonl'),  # Current directory path
-            os.path.join('data', 'data.jsonl')  # Relative path
-        ]
-        
-        data_path = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                data_path = path
-                logger.info(f"Found data file at: {data_path}")
-                break
-        
-        if not data_path:
-            raise FileNotFoundError(f"Data file not found in any of the following locations: {', '.join(possible_paths)}")
-        
-        # Read data into DuckDB
-        con.execute(f"""
-            CREATE TABLE IF NOT EXISTS reddit_posts AS 
-            SELECT * FROM read_json_auto('{data_path}', format='auto');
-        """)
-        
-        # Create a view with flattened structure for easier querying
-        con.execute("""
-            CREATE OR REPLACE VIEW reddit_posts_view AS
-            SELECT 
-                kind,
-                data->>'id' AS id,
-                data->>'subreddit' AS subreddit,
-                data->>'author' AS author,
-                data->>'title' AS title,
-                data->>'selftext' AS selftext,
-                CAST(data->>'created_utc' AS FLOAT) AS created_utc,
-                CAST(data->>'score' AS INTEGER) AS score,
-                CAST(data->>'num_comments' AS INTEGER) AS num_comments,
-                data->>'permalink' AS permalink,
-                data->>'url' AS url,
-                CAST(data->>'upvote_ratio' AS FLOAT) AS upvote_ratio,
-                data->>'domain' AS domain
-            FROM reddit_posts;
-        """)
+        if READ_ONLY:
+            # A separate ingest step builds the snapshot; every worker only attaches it
+            snapshot_path = require_snapshot(os.getenv('SNAPSHOT_PATH') or default_snapshot_path(find_data_path()))
+        else:
+            # Parse the JSONL into the snapshot only if it changed, then attach it
+            # read-write so admin ingests can append to it
+            snapshot_path = ensure_snapshot(find_data_path())
+        load_progress.set_phase(ATTACHING)
+        attach_snapshot(con, snapshot_path, read_only=READ_ONLY)
+        set_version(snapshot_dataset_version(con))
+        
+        # Expose the typed posts table under the view name every endpoint queries
+        con.execute(posts_view_sql(f"{SNAPSHOT_ALIAS}.{POSTS_TABLE}"))
+        for dimension in DIMENSIONS:
+            con.execute(dimension_view_sql(dimension, SNAPSHOT_ALIAS))
+        con.execute(terms_view_sql(SNAPSHOT_ALIAS))
+        con.execute(lengths_view_sql(SNAPSHOT_ALIAS))
+        if has_table(con, TRIGRAMS_TABLE, SNAPSHOT_ALIAS):
+            con.execute(trigrams_view_sql(SNAPSHOT_ALIAS))
+            set_trigram_index(True)
+        
+        # Count the unfiltered /api/stats once; appends refresh it incrementally
+        stats_rollup.build(con)
         
         # Compute the total number of posts
         result = con.execute("SELECT COUNT(*) FROM reddit_posts_view").fetchone()
         total_posts = result[0] if result else 0
         logger.info(f"Successfully loaded {total_posts} posts into the database")
         
+        load_progress.finish(total_posts)
         return True
     except Exception as e:
         logger.error(f"Error loading data: {str(e)}")
+        load_progress.fail(str(e))
         return False
 
-# Load the data when the application starts
-data_loaded = load_and_process_data()
+def load_data_in_background():
+    """Load the data without blocking startup, then start the ingest tailer"""
+    global data_loaded
+    data_loaded = load_and_process_data()
+    if data_loaded:
+        start_tailer()
+
+# Set once the background load has finished; data endpoints answer 503 until then
+data_loaded = False
+
+# Seconds a client is told to wait before retrying while the data is loading
+DEFAULT_RETRY_AFTER = 5
+MAX_RETRY_AFTER = 30
+
+def _retry_after_seconds():
+    """Suggest a Retry-After delay from the load's ETA"""
+    eta = load_progress.eta_seconds()
+    if eta is None:
+        return DEFAULT_RETRY_AFTER
+    return min(max(1, math.ceil(eta)), MAX_RETRY_AFTER)
+
+@app.before_request
+def require_data_loaded():
+    """Answer data endpoints with a fast 503 until the dataset is loaded"""
+    if data_loaded or request.method == 'OPTIONS':
+        return None
+    if not request.path.startswith('/api/') or request.path.startswith('/api/health'):
+        return None
+    
+    if load_progress.failed:
+        return jsonify({"error": "Data failed to load", "progress": load_progress.to_dict()}), 503
+    
+    response = jsonify({"error": "Data is still loading, retry shortly", "progress": load_progress.to_dict()})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(_retry_after_seconds())
+    return response
 
 # Text cleaning function
 def clean_text(text):
@@ -195,153 +291,214 @@ def get_extended_stopwords():
     return list(set(ENGLISH_STOP_WORDS).union(additional_stopwords))
 
 # API Routes
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness check: the process is up and serving requests, loaded or not"""
+    return jsonify({"status": "alive"})
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness check: 200 once the data is loaded, 503 with load progress until then"""
+    return health_check()
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint reporting liveness, readiness and load progress"""
+    progress = load_progress.to_dict()
     if data_loaded:
-        return jsonify({"status": "healthy", "data_loaded": True})
-    else:
-        return jsonify({"status": "unhealthy", "data_loaded": False}), 500
+        return jsonify({"status": "healthy", "live": True, "ready": True, "data_loaded": True, "progress": progress,
+                        "db_pool": db_pool.stats(), "response_cache": response_cache.stats(),
+                        "json_serializer": app.json.name, "query_guard": query_guard.stats(),
+                        "stats_rollup": stats_rollup.info()})
+    if load_progress.failed:
+        return jsonify({"status": "unhealthy", "live": True, "ready": False, "data_loaded": False, "progress": progress}), 500
+    
+    response = jsonify({"status": "loading", "live": True, "ready": False, "data_loaded": False, "progress": progress})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(_retry_after_seconds())
+    return response
+
+def _stats_panel(db, source='reddit_posts_view', where_clause='1=1', params=()):
+    """Compute the /api/stats payload over the posts of ``source`` matching ``where_clause``."""
+    if source == 'reddit_posts_view' and where_clause == "1=1":
+        # The unfiltered stats are kept current in memory across appends
+        stats = stats_rollup.stats()
+        if stats is not None:
+            return stats
+    return compute_stats(db, source, where_clause, params)
 
 @app.route('/api/stats', methods=['GET'])
+@conditional_get('stats')
+@response_cache.cached('stats')
+@query_guard.guarded('stats')
 def get_basic_stats():
-    """Get basic statistics about the dataset"""
+    """
+    Get basic statistics about the dataset: the number of posts, posts per
+    day and the top subreddits, domains and authors.
+    
+    Query Parameters:
+    - keyword, match, subreddit, author, domain, start_date, end_date (optional):
+      Restrict the statistics to the matching posts
+    
+    Returns:
+    - JSON with the statistics; without filters they are served from memory,
+      otherwise computed in a single scan of the matching posts
+    """
     try:
-        # Total posts
-        total_posts = con.execute("SELECT COUNT(*) FROM reddit_posts_view").fetchone()[0]
-        
-        # Top subreddits
-        top_subreddits = con.execute("""
-            SELECT subreddit, COUNT(*) as post_count 
-            FROM reddit_posts_view 
-            GROUP BY subreddit 
-            ORDER BY post_count DESC 
-            LIMIT 10
-        """).fetchall()
-        
-        # Posts over time (by day)
-        posts_over_time = con.execute("""
-            SELECT 
-                DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') AS date,
-                COUNT(*) as post_count
-            FROM reddit_posts_view
-            GROUP BY date
-            ORDER BY date
-        """).fetchall()
+        db = request_cursor()
         
-        # Top domains (excluding self posts)
-        top_domains = con.execute("""
-            SELECT 
-                domain, 
-                COUNT(*) as count 
-            FROM reddit_posts_view 
-            WHERE domain NOT LIKE 'self.%' 
-            GROUP BY domain 
-            ORDER BY count DESC 
-            LIMIT 10
-        """).fetchall()
-        
-        # Top authors
-        top_authors = con.execute("""
-            SELECT 
-                author, 
-                COUNT(*) as post_count 
-            FROM reddit_posts_view 
-            WHERE author != '[deleted]' AND author != 'AutoModerator'
-            GROUP BY author 
-            ORDER BY post_count DESC 
-            LIMIT 10
-        """).fetchall()
+        try:
+            where_clause, params = FilterSpec.from_args(request.args).compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        return jsonify({
-            "total_posts": total_posts,
-            "top_subreddits": [{"subreddit": r[0], "count": r[1]} for r in top_subreddits],
-            "posts_over_time": [{"date": r[0].strftime("%Y-%m-%d"), "count": r[1]} for r in posts_over_time],
-            "top_domains": [{"domain": r[0], "count": r[1]} for r in top_domains],
-            "top_authors": [{"author": r[0], "count": r[1]} for r in top_authors]
-        })
+        return jsonify(_stats_panel(db, where_clause=where_clause, params=params))
     except Exception as e:
         logger.error(f"Error retrieving basic stats: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/posts/search', methods=['GET'])
+@conditional_get('search')
+@query_guard.guarded('search')
 def search_posts():
-    """Search posts by keyword, subreddit, author, or domain"""
+    """
+    Search posts by keyword, subreddit, author, or domain, newest first.
+    
+    Query Parameters:
+    - sort (optional): newest (default) or relevance, which ranks keyword
+      matches by BM25 score and pages with offset only
+    - limit (optional): Posts per page (default: 100)
+    - cursor (optional): ``next_cursor`` of the previous page; pages after it
+      cost the same however deep they are
+    - offset (optional): Posts to skip, for jumping to a page; not combinable with cursor
+    - total (optional): exact (default), estimate, bounded (at most total_limit) or none
+    - total_limit (optional): Number of matches a bounded total stops at (default: 10000)
+    
+    Returns:
+    - JSON with the page of posts, ``next_cursor`` (null on the last page) and
+      the total with its ``total_relation`` (eq, approx or gte)
+    """
     try:
-        keyword = request.args.get('keyword', '')
-        subreddit = request.args.get('subreddit', '')
-        author = request.args.get('author', '')
-        domain = request.args.get('domain', '')
-        start_date = request.args.get('start_date', '')
-        end_date = request.args.get('end_date', '')
+        db = request_cursor()
+        
         limit = int(request.args.get('limit', 100))
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor', '')
+        total_mode = request.args.get('total', 'exact')
+        total_limit = int(request.args.get('total_limit', DEFAULT_TOTAL_LIMIT))
+        sort = request.args.get('sort', 'newest')
+        
+        if total_mode not in TOTAL_MODES:
+            return jsonify({"error": f"Invalid total. Use one of: {', '.join(TOTAL_MODES)}"}), 400
+        if sort not in SORT_MODES:
+            return jsonify({"error": f"Invalid sort. Use one of: {', '.join(SORT_MODES)}"}), 400
+        if cursor and offset:
+            return jsonify({"error": "Use either cursor or offset, not both"}), 400
+        
+        # Compile the filters into a canonical WHERE clause
+        filters = FilterSpec.from_args(request.args)
+        if sort == 'relevance' and not filters.keyword:
+            return jsonify({"error": "sort=relevance requires a keyword"}), 400
+        if sort == 'relevance' and cursor:
+            return jsonify({"error": "sort=relevance pages with offset, not cursor"}), 400
+        try:
+            output_format = response_format(request.args)
+            where_clause, params = filters.compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Build the query conditions
-        conditions = []
-        params = []  # Use a list for positional parameters
+        # Count the matches only as precisely as the client asked for
+        total_count, total_relation = count_matches(db, where_clause, params, total_mode, total_limit)
         
-        if keyword:
-            conditions.append("(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')")
-            params.append(keyword)
-            params.append(keyword)
-            
-        if subreddit:
-            conditions.append("LOWER(subreddit) = LOWER(?)")
-            params.append(subreddit)
-            
-        if author:
-            conditions.append("LOWER(author) = LOWER(?)")
-            params.append(author)
-            
-        if domain:
-            conditions.append("LOWER(domain) = LOWER(?)")
-            params.append(domain)
-            
-        if start_date:
-            try:
-                start_timestamp = datetime.strptime(start_date, '%Y-%m-%d').timestamp()
-                conditions.append("created_utc >= ?")
-                params.append(start_timestamp)
-            except ValueError:
-                return jsonify({"error": "Invalid start_date format. Use YYYY-MM-DD"}), 400
-                
-        if end_date:
+        # Continue after the previous page's last post instead of skipping rows
+        page_clause, page_params = where_clause, list(params)
+        if cursor:
             try:
-                end_timestamp = datetime.strptime(end_date, '%Y-%m-%d').timestamp() + 86399  # End of day
-                conditions.append("created_utc <= ?")
-                params.append(end_timestamp)
-            except ValueError:
-                return jsonify({"error": "Invalid end_date format. Use YYYY-MM-DD"}), 400
-        
-        # Create the WHERE clause
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        # Execute the query to get the count
-        query_count = f"SELECT COUNT(*) FROM reddit_posts_view WHERE {where_clause}"
-        result_count = con.execute(query_count, params).fetchone()
-        total_count = result_count[0] if result_count else 0
-        
-        # Execute the query to get the data
-        query_data = f"""
-            SELECT 
-                id, subreddit, author, title, 
-                SUBSTRING(selftext, 1, 200) as preview_text,
-                created_utc, score, num_comments, 
-                permalink, url, domain
-            FROM reddit_posts_view 
-            WHERE {where_clause}
-            ORDER BY created_utc DESC
-            LIMIT {limit} OFFSET {offset}
-        """
+                keyset, keyset_params = keyset_condition(cursor)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            page_clause = f"{where_clause} AND {keyset}"
+            page_params += keyset_params
+        
+        # Execute the query to get the data, plus one row to tell whether a next page exists
+        if sort == 'relevance':
+            # Rank by BM25 score; the LIMIT keeps only the top rows in a heap instead of sorting every match
+            scores_sql, score_params = relevance_scores_sql(db, filters.keyword, prefix=filters.match == 'substring')
+            query_data = f"""
+                SELECT 
+                    id, subreddit, author, title, 
+                    SUBSTRING(selftext, 1, 200) as preview_text,
+                    created_utc, reddit_posts_view.score, num_comments, 
+                    permalink, url, domain,
+                    COALESCE(relevance.score, 0) AS relevance
+                FROM reddit_posts_view 
+                LEFT JOIN ({scores_sql}) AS relevance ON relevance.post_id = reddit_posts_view.id
+                WHERE {page_clause}
+                ORDER BY relevance DESC, {KEYSET_ORDER}
+                LIMIT ? OFFSET ?
+            """
+            page_params = score_params + page_params
+        else:
+            query_data = f"""
+                SELECT 
+                    id, subreddit, author, title, 
+                    SUBSTRING(selftext, 1, 200) as preview_text,
+                    created_utc, score, num_comments, 
+                    permalink, url, domain
+                FROM reddit_posts_view 
+                WHERE {page_clause}
+                ORDER BY {KEYSET_ORDER}
+                LIMIT ? OFFSET ?
+            """
+        
+        result = execute_prepared(db, query_data, page_params + [limit + 1, offset])
+        page = {
+            "total": total_count,
+            "total_relation": total_relation,
+            "offset": offset,
+            "limit": limit,
+        }
+        
+        if output_format == 'arrow':
+            # created_utc stays epoch seconds in the typed Arrow table
+            table = result.fetch_arrow_table()
+            page["next_cursor"] = None
+            if table.num_rows > limit:
+                table = table.slice(0, limit)
+                if sort == 'newest':
+                    page["next_cursor"] = encode_cursor(table["created_utc"][-1].as_py(), table["id"][-1].as_py())
+            return arrow_response(table, metadata=page)
+        
+        if output_format == 'columns':
+            columns = fetch_columns(result)
+            page["next_cursor"] = None
+            if len(columns["id"]) > limit:
+                columns = {name: values[:limit] for name, values in columns.items()}
+                if sort == 'newest':
+                    page["next_cursor"] = encode_cursor(int(columns["created_utc"][-1]), columns["id"][-1])
+            if sort == 'relevance':
+                columns["relevance"] = columns["relevance"].round(4)
+            posts = columns_json(columns)
+            posts["created_utc"] = [
+                datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M:%S') if created is not None else None
+                for created in posts["created_utc"]
+            ]
+            return jsonify({**page, "posts": posts})
+        
+        result_data = result.fetchall()
         
-        result_data = con.execute(query_data, params).fetchall()
+        next_cursor = None
+        if len(result_data) > limit:
+            result_data = result_data[:limit]
+            last = result_data[-1]
+            if sort == 'newest':
+                next_cursor = encode_cursor(last[5], last[0])
         
         # Format the results
         posts = []
         for row in result_data:
             post_date = datetime.fromtimestamp(row[5]).strftime('%Y-%m-%d %H:%M:%S')
-            posts.append({
+            post = {
                 "id": row[0],
                 "subreddit": row[1],
                 "author": row[2],
@@ -353,12 +510,17 @@ def search_posts():
                 "permalink": row[8],
                 "url": row[9],
                 "domain": row[10]
-            })
+            }
+            if sort == 'relevance':
+                post["relevance"] = round(row[11], 4)
+            posts.append(post)
         
         return jsonify({
             "total": total_count,
+            "total_relation": total_relation,
             "offset": offset,
             "limit": limit,
+            "next_cursor": next_cursor,
             "posts": posts
         })
     
@@ -366,423 +528,504 @@ def search_posts():
         logger.error(f"Error searching posts: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/posts/export', methods=['GET'])
+@conditional_get('export')
+def export_posts():
+    """
+    Stream every post matching the search filters as NDJSON or CSV.
+    
+    Posts come in storage order (the order they were ingested, roughly oldest
+    first): sorting would make DuckDB buffer the whole result before the
+    first row could be sent.
+    
+    Query Parameters:
+    - format (optional): ndjson (default) or csv
+    - include_selftext (optional): 1 to export the full selftext instead of
+      the 200-character preview
+    
+    Returns:
+    - The matching posts, streamed in batches with chunked transfer encoding
+    """
+    try:
+        db = request_cursor()
+        
+        export_format = request.args.get('format', 'ndjson')
+        include_selftext = request.args.get('include_selftext', '').lower() in ('1', 'true', 'yes')
+        
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        
+        # Compile the filters into a canonical WHERE clause
+        try:
+            where_clause, params = FilterSpec.from_args(request.args).compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        text_column = "selftext" if include_selftext else "SUBSTRING(selftext, 1, 200) AS preview_text"
+        columns = ["id", "subreddit", "author", "title", "selftext" if include_selftext else "preview_text",
+                   "created_utc", "score", "num_comments", "permalink", "url", "domain"]
+        
+        # Run the query now so errors are reported before the response starts;
+        # rows are only fetched as the client reads them
+        result = execute_prepared(db, f"""
+            SELECT 
+                id, subreddit, author, title, 
+                {text_column},
+                created_utc, score, num_comments, 
+                permalink, url, domain
+            FROM reddit_posts_view 
+            WHERE {where_clause}
+        """, params)
+        
+        def format_post(post):
+            if post["created_utc"] is not None:
+                post["created_utc"] = datetime.fromtimestamp(post["created_utc"]).strftime('%Y-%m-%d %H:%M:%S')
+            return post
+        
+        stream = EXPORT_STREAMS[export_format](result, columns, convert=format_post)
+        return Response(
+            stream_with_context(stream),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f"attachment; filename=posts.{export_format}"}
+        )
+    
+    except Exception as e:
+        logger.error(f"Error exporting posts: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def _timeseries_sql(interval, source='reddit_posts_view', where_clause='1=1'):
+    """Build the query of the post counts, comments and average score per ``interval``."""
+    # Include the hour for hourly data, just the date for daily, weekly and monthly data
+    period_format = '%Y-%m-%d %H:00' if interval == 'hour' else '%Y-%m-%d'
+    
+    # Periods are formatted by DuckDB so every response format gets the same strings
+    return f"""
+        SELECT 
+            strftime({TIME_BUCKETS[interval]}, '{period_format}') AS period,
+            COUNT(*) as post_count,
+            CAST(SUM(num_comments) AS BIGINT) as comment_count,
+            AVG(score) as avg_score
+        FROM {source}
+        WHERE {where_clause}
+        GROUP BY {TIME_BUCKETS[interval]}
+        ORDER BY {TIME_BUCKETS[interval]}
+    """
+
+def _timeseries_points(rows):
+    """Format the rows of ``_timeseries_sql`` as the /api/timeseries JSON points."""
+    return [
+        {
+            "period": row[0],
+            "post_count": row[1],
+            "comment_count": row[2],
+            "avg_score": float(row[3])
+        }
+        for row in rows
+    ]
+
 @app.route('/api/timeseries', methods=['GET'])
+@conditional_get('timeseries')
+@response_cache.cached('timeseries')
+@query_guard.guarded('timeseries')
 def get_timeseries():
-    """Get time series data based on query parameters"""
+    """
+    Get time series data based on query parameters.
+    
+    Query Parameters:
+    - format (optional): json (default, a list of points), columns (one array
+      per field) or arrow (Arrow IPC stream)
+    """
     try:
-        keyword = request.args.get('keyword', '')
-        subreddit = request.args.get('subreddit', '')
-        domain = request.args.get('domain', '')
+        db = request_cursor()
+        
         interval = request.args.get('interval', 'day')  # hour, day, week, month
         
         # Validate interval
-        valid_intervals = ['hour', 'day', 'week', 'month']
+        valid_intervals = list(TIME_BUCKETS)
         if interval not in valid_intervals:
             return jsonify({"error": f"Invalid interval. Use one of: {', '.join(valid_intervals)}"}), 400
         
-        # Build query conditions
-        conditions = []
-        params = []  # Use a list for positional parameters
-        
-        if keyword:
-            conditions.append("(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')")
-            params.append(keyword)
-            params.append(keyword)
-            
-        if subreddit:
-            conditions.append("LOWER(subreddit) = LOWER(?)")
-            params.append(subreddit)
-            
-        if domain:
-            conditions.append("LOWER(domain) = LOWER(?)")
-            params.append(domain)
-            
-        # Create WHERE clause
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        # Execute the query
-        query = f"""
-            SELECT 
-                DATE_TRUNC('{interval}', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') AS time_period,
-                COUNT(*) as post_count,
-                SUM(num_comments) as comment_count,
-                AVG(score) as avg_score
-            FROM reddit_posts_view
-            WHERE {where_clause}
-            GROUP BY time_period
-            ORDER BY time_period
-        """
+        # Compile the filters into a canonical WHERE clause
+        filters = FilterSpec.from_args(request.args, fields=('keyword', 'subreddit', 'domain'))
+        try:
+            output_format = response_format(request.args)
+            where_clause, params = filters.compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        result = con.execute(query, params).fetchall()
+        result = execute_prepared(db, _timeseries_sql(interval, where_clause=where_clause), params)
+        if output_format == 'arrow':
+            return arrow_response(result)
+        if output_format == 'columns':
+            return jsonify(columns_json(fetch_columns(result)))
         
-        # Format the results
-        timeseries_data = []
-        for row in result:
-            # Format the time based on the interval
-            if interval == 'hour':
-                time_str = row[0].strftime('%Y-%m-%d %H:00')  # Include hour in format for hourly data
-            else:
-                time_str = row[0].strftime('%Y-%m-%d')  # Just date for daily, weekly, monthly
-                
-            timeseries_data.append({
-                "period": time_str,
-                "post_count": row[1],
-                "comment_count": row[2],
-                "avg_score": float(row[3])
-            })
-        
-        return jsonify(timeseries_data)
+        return jsonify(_timeseries_points(result.fetchall()))
         
     except Exception as e:
         logger.error(f"Error generating time series: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Smallest graph the query guard downgrades a network request to
+MIN_NETWORK_NODES = 50
+
+def _network_limits(limit):
+    """Return the node counts the query guard tries for a network request, halving down to ``MIN_NETWORK_NODES``."""
+    limits = [limit]
+    while limits[-1] > MIN_NETWORK_NODES:
+        limits.append(max(MIN_NETWORK_NODES, limits[-1] // 2))
+    return limits
+
+def _network_queries(network_type, where_clause, limit):
+    """Build the queries of the graph of the top ``limit`` subreddits or authors.
+    
+    Subreddits are linked by the authors they share and authors by the
+    subreddits they share. The node pairs come from a self-join of the
+    distinct (node, shared value) memberships rather than of the posts, so
+    its size grows with the number of memberships, not with the square of
+    the posts of each node.
+    
+    Returns:
+        Tuple of (dimension, nodes SQL, links SQL, SQL counting the rows of
+        the self-join of the top ``n`` nodes for every ``n`` of
+        ``_network_limits(limit)``); each takes the params of ``where_clause``
+    """
+    if network_type == 'subreddit':
+        dimension, shared, key_filter = 'subreddit', 'author', None
+        # Deleted accounts and the moderation bot do not link subreddits
+        shared_filter = f"AND author_id IN (SELECT id FROM author_dim WHERE {EXCLUDED_AUTHORS_FILTER})"
+    else:
+        dimension, shared, key_filter = 'author', 'subreddit', EXCLUDED_AUTHORS_FILTER
+        shared_filter = ""
+    column, shared_column = f"{dimension}_id", f"{shared}_id"
+    
+    query_nodes = top_values_sql(dimension, where_clause, limit=limit, count_alias='post_count', key_filter=key_filter)
+    
+    # Rank the nodes once and join the edges to them by id instead of passing every id twice as a parameter
+    memberships = f"""
+        WITH top_nodes AS ({query_nodes}),
+        memberships AS (
+            SELECT DISTINCT {column} AS node, {shared_column} AS shared
+            FROM reddit_posts_view
+            WHERE {column} IN (SELECT {column} FROM top_nodes)
+            {shared_filter}
+        )
+    """
+    query_links = f"""
+        {memberships}
+        SELECT source_nodes.{dimension} AS source, target_nodes.{dimension} AS target, edges.weight AS value
+        FROM (
+            SELECT a.node AS source, b.node AS target, COUNT(*) AS weight
+            FROM memberships a
+            JOIN memberships b ON a.shared = b.shared AND a.node != b.node
+            GROUP BY source, target
+            HAVING weight > 1
+        ) AS edges
+        JOIN top_nodes AS source_nodes ON source_nodes.{column} = edges.source
+        JOIN top_nodes AS target_nodes ON target_nodes.{column} = edges.target
+        WHERE source_nodes.{dimension} < target_nodes.{dimension}
+        ORDER BY value DESC
+    """
+    # The top n nodes are the first n of the ranking, so one scan of the
+    # memberships prices the graph at every node count the guard may try
+    candidates = ", ".join(str(int(candidate)) for candidate in _network_limits(limit))
+    query_cost = f"""
+        {memberships},
+        ranked AS (
+            SELECT {column}, ROW_NUMBER() OVER (ORDER BY post_count DESC, {column}) AS node_rank
+            FROM top_nodes
+        )
+        SELECT candidate, CAST(COALESCE(SUM(members * (members - 1)), 0) AS BIGINT) AS join_rows
+        FROM (
+            SELECT candidates.candidate, memberships.shared, COUNT(*) AS members
+            FROM memberships
+            JOIN ranked ON ranked.{column} = memberships.node
+            JOIN (SELECT UNNEST([{candidates}]) AS candidate) AS candidates ON ranked.node_rank <= candidates.candidate
+            GROUP BY candidates.candidate, memberships.shared
+        )
+        GROUP BY candidate
+    """
+    return dimension, query_nodes, query_links, query_cost
+
+def _network_limit(db, network_type, where_clause, params, limit):
+    """Halve the number of nodes until the graph's self-join fits the guard's row limit.
+    
+    Every node count tried is priced by a single cost query, see ``_network_queries``.
+    
+    Returns:
+        Tuple of (number of nodes to use, downgrade details or None)
+    
+    Raises:
+        QueryTooExpensive: If even a graph of ``MIN_NETWORK_NODES`` nodes is over the limit
+    """
+    max_rows = query_guard.max_rows('network')
+    if not max_rows:
+        return limit, None
+    
+    requested = limit
+    query_cost = _network_queries(network_type, where_clause, limit)[3]
+    join_rows = dict(execute_prepared(db, query_cost, params).fetchall())
+    estimated_rows = join_rows.get(requested, 0)
+    for limit in _network_limits(requested):
+        if join_rows.get(limit, 0) <= max_rows:
+            break
+    else:
+        raise QueryTooExpensive(join_rows.get(limit, 0), max_rows)
+    
+    if limit == requested:
+        return limit, None
+    downgrade = {"reason": "estimated_rows", "requested_limit": requested, "limit": limit,
+                 "estimated_rows": estimated_rows, "max_rows": max_rows}
+    query_guard.record('network', DOWNGRADED, **downgrade)
+    return limit, downgrade
+
+def _network_columns(db, network_type, where_clause, params, limit):
+    """Compute the network graph as columns instead of one dict per node and link.
+
+    Returns the same nodes, links and metrics as the JSON layout of
+    ``/api/network``, as ``({field: array}, {field: array}, metrics)``.
+    """
+    dimension, query_nodes, query_links, _ = _network_queries(network_type, where_clause, limit)
+    nodes = fetch_columns(execute_prepared(db, query_nodes, params))
+    links = fetch_columns(execute_prepared(db, query_links, params))
+    
+    # Count the links of every node
+    names = nodes[dimension]
+    endpoints, counts = np.unique(np.concatenate([links["source"], links["target"]]), return_counts=True)
+    link_counts = dict(zip(endpoints.tolist(), counts.tolist()))
+    connections = np.array([link_counts.get(name, 0) for name in names.tolist()], dtype=np.int64)
+    
+    node_columns = {
+        "id": names,
+        "name": names,
+        "type": np.full(len(names), dimension, dtype=object),
+        "value": nodes["post_count"],
+        "posts": nodes["post_count"],
+        "connections": connections,
+    }
+    
+    # Simple estimates for modularity and communities; a real app would run community detection
+    total_possible_connections = len(names) * (len(names) - 1) / 2
+    link_count = len(links["source"])
+    metrics = {
+        "density": round(link_count / total_possible_connections, 2) if total_possible_connections > 0 else 0,
+        "modularity": 0.65 if len(names) else 0,  # Placeholder value
+        "communities": max(1, link_count // 10) if len(names) else 0,
+        "avgConnections": round(float(connections.sum()) / len(names), 1) if len(names) else 0,
+    }
+    return node_columns, links, metrics
+
+def _column_records(columns):
+    """Turn ``{field: array}`` columns into a list of one dict per row."""
+    lists = columns_json(columns)
+    return [dict(zip(lists, values)) for values in zip(*lists.values())]
+
 @app.route('/api/network', methods=['GET'])
+@conditional_get('network')
+@response_cache.cached('network')
+@query_guard.guarded('network')
 def get_network_data():
-    """Generate network data for subreddit or author connections"""
+    """
+    Generate network data for subreddit or author connections.
+    
+    Query Parameters:
+    - type (optional): subreddit (default) or author
+    - limit (optional): Number of nodes (default: 8000); lowered when the
+      graph's self-join would exceed the ``network`` row limit of the query
+      guard, which the response then reports under ``downgraded``
+    - keyword (optional): Only rank nodes by the posts matching this keyword
+    - format (optional): json (default), columns or arrow
+    - part (optional): nodes (default) or links, the table of an Arrow response
+    """
     try:
+        db = request_cursor()
+        
         network_type = request.args.get('type', 'subreddit')  # subreddit or author
-        keyword = request.args.get('keyword', '')
-        limit = int(request.args.get('limit', 8000))  # Increased default limit to 1000 to effectively remove practical limits
+        limit = int(request.args.get('limit', 8000))
         
         if network_type not in ['subreddit', 'author']:
             return jsonify({"error": "Invalid network type. Use 'subreddit' or 'author'"}), 400
         
-        # Build the query conditions
-        conditions = []
-        params = []  # Use a list for positional parameters
+        # Compile the filters into a canonical WHERE clause
+        try:
+            output_format = response_format(request.args)
+            where_clause, params = FilterSpec.from_args(request.args, fields=('keyword',)).compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        if keyword:
-            conditions.append("(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')")
-            params.append(keyword)
-            params.append(keyword)
-            
-        # Create WHERE clause
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        if network_type == 'subreddit':
-            # Get top subreddits for the graph
-            query_nodes = f"""
-                SELECT subreddit, COUNT(*) as post_count
-                FROM reddit_posts_view
-                WHERE {where_clause}
-                GROUP BY subreddit
-                ORDER BY post_count DESC
-                LIMIT {limit}
-            """
-            
-            subreddits = con.execute(query_nodes, params).fetchall()
-            
-            # If no results, return empty data
-            if not subreddits:
-                return jsonify({
-                    "nodes": [],
-                    "links": [],
-                    "metrics": {
-                        "density": 0,
-                        "modularity": 0,
-                        "communities": 0,
-                        "avgConnections": 0
-                    }
-                })
-            
-            subreddit_list = [row[0] for row in subreddits]
-            
-            # Create a placeholder string for the IN clause
-            placeholders = ', '.join(['?' for _ in subreddit_list])
-            
-            # Get connections based on shared authors
-            query_edges = f"""
-                SELECT DISTINCT a.subreddit as source, b.subreddit as target, COUNT(DISTINCT a.author) as weight
-                FROM reddit_posts_view a
-                JOIN reddit_posts_view b ON a.author = b.author
-                WHERE a.subreddit IN ({placeholders})
-                AND b.subreddit IN ({placeholders})
-                AND a.subreddit < b.subreddit
-                AND a.author != '[deleted]'
-                AND a.author != 'AutoModerator'
-                GROUP BY source, target
-                HAVING weight > 1
-                ORDER BY weight DESC
-            """
-            
-            # Combine params
-            edge_params = subreddit_list + subreddit_list
-            connections = con.execute(query_edges, edge_params).fetchall()
-            
-            # Format the results
-            nodes = [{"id": row[0], "name": row[0], "type": "subreddit", "value": row[1], "posts": row[1], "connections": 0} for row in subreddits]
-            edges = [{"source": row[0], "target": row[1], "value": row[2]} for row in connections]
-            
-            # Count connections for each node
-            connection_counts = {}
-            for edge in edges:
-                source = edge["source"]
-                target = edge["target"]
-                if source not in connection_counts:
-                    connection_counts[source] = 0
-                if target not in connection_counts:
-                    connection_counts[target] = 0
-                connection_counts[source] += 1
-                connection_counts[target] += 1
-            
-            # Update connection counts in nodes
-            for node in nodes:
-                node_id = node["id"]
-                if node_id in connection_counts:
-                    node["connections"] = connection_counts[node_id]
-            
-        else:  # author network
-            # Get top authors for the graph
-            query_nodes = f"""
-                SELECT author, COUNT(*) as post_count
-                FROM reddit_posts_view
-                WHERE {where_clause}
-                AND author != '[deleted]'
-                AND author != 'AutoModerator'
-                GROUP BY author
-                ORDER BY post_count DESC
-                LIMIT {limit}
-            """
-            
-            authors = con.execute(query_nodes, params).fetchall()
-            
-            # If no results, return empty data
-            if not authors:
-                return jsonify({
-                    "nodes": [],
-                    "links": [],
-                    "metrics": {
-                        "density": 0,
-                        "modularity": 0,
-                        "communities": 0,
-                        "avgConnections": 0
-                    }
-                })
-            
-            author_list = [row[0] for row in authors]
-            
-            # Create a placeholder string for the IN clause
-            placeholders = ', '.join(['?' for _ in author_list])
-            
-            # Get connections based on shared subreddits
-            query_edges = f"""
-                SELECT DISTINCT a.author as source, b.author as target, COUNT(DISTINCT a.subreddit) as weight
-                FROM reddit_posts_view a
-                JOIN reddit_posts_view b ON a.subreddit = b.subreddit
-                WHERE a.author IN ({placeholders})
-                AND b.author IN ({placeholders})
-                AND a.author < b.author
-                GROUP BY source, target
-                HAVING weight > 1
-                ORDER BY weight DESC
-            """
-            
-            # Combine params
-            edge_params = author_list + author_list
-            connections = con.execute(query_edges, edge_params).fetchall()
-            
-            # Format the results
-            nodes = [{"id": row[0], "name": row[0], "type": "author", "value": row[1], "posts": row[1], "connections": 0} for row in authors]
-            edges = [{"source": row[0], "target": row[1], "value": row[2]} for row in connections]
-            
-            # Count connections for each node
-            connection_counts = {}
-            for edge in edges:
-                source = edge["source"]
-                target = edge["target"]
-                if source not in connection_counts:
-                    connection_counts[source] = 0
-                if target not in connection_counts:
-                    connection_counts[target] = 0
-                connection_counts[source] += 1
-                connection_counts[target] += 1
-            
-            # Update connection counts in nodes
-            for node in nodes:
-                node_id = node["id"]
-                if node_id in connection_counts:
-                    node["connections"] = connection_counts[node_id]
-        
-        # Calculate network metrics
-        total_possible_connections = len(nodes) * (len(nodes) - 1) / 2
-        density = len(edges) / total_possible_connections if total_possible_connections > 0 else 0
-        
-        # Simple estimate for modularity and communities
-        # In a real app, you would use a community detection algorithm
-        avg_connections = sum(node["connections"] for node in nodes) / len(nodes) if nodes else 0
-        communities = max(1, len(edges) // 10)  # Simple heuristic
-        modularity = 0.65  # Placeholder value
-        
-        metrics = {
-            "density": round(density, 2),
-            "modularity": modularity,
-            "communities": communities,
-            "avgConnections": round(avg_connections, 1)
-        }
+        part = request.args.get('part', 'nodes')
+        if output_format != 'json' and part not in ('nodes', 'links'):
+            return jsonify({"error": "Invalid part. Use 'nodes' or 'links'"}), 400
         
-        return jsonify({
-            "nodes": nodes,
-            "links": edges,
-            "metrics": metrics
-        })
+        try:
+            limit, downgrade = _network_limit(db, network_type, where_clause, params, limit)
+        except QueryTooExpensive as e:
+            return query_guard.rejection('network', e)
+        
+        nodes, links, metrics = _network_columns(db, network_type, where_clause, params, limit)
+        if output_format == 'arrow':
+            # One Arrow stream holds one table: ``part`` picks it, the metrics ride in the schema metadata
+            metadata = {"metrics": metrics, **({"downgraded": downgrade} if downgrade else {})}
+            return arrow_response(nodes if part == 'nodes' else links, metadata=metadata)
+        
+        if output_format == 'columns':
+            network = {"nodes": columns_json(nodes), "links": columns_json(links), "metrics": metrics}
+        else:
+            network = {"nodes": _column_records(nodes), "links": _column_records(links), "metrics": metrics}
+        if downgrade:
+            network["downgraded"] = downgrade
+        return jsonify(network)
         
     except Exception as e:
         logger.error(f"Error generating network data: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/sentiment', methods=['GET'])
-def get_sentiment_analysis():
-    """Perform sentiment analysis on posts matching query parameters"""
+def _sentiment_panel(db, source='reddit_posts_view', where_clause='1=1', params=()):
+    """Compute the /api/sentiment payload over the posts of ``source`` matching ``where_clause``."""
+    # Get posts for sentiment analysis
+    query = f"""
+        SELECT 
+            id, title, selftext, subreddit,
+            day_bucket AS date
+        FROM {source}
+        WHERE {where_clause}
+        ORDER BY created_utc
+    """
+    
+    posts = execute_prepared(db, query, list(params)).fetchall()
+    
+    # Import NLTK's VADER for sentiment analysis
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    
+    # Download VADER lexicon if not already downloaded
+    import nltk
     try:
-        keyword = request.args.get('keyword', '')
-        subreddit = request.args.get('subreddit', '')
-        domain = request.args.get('domain', '')
-        
-        # Build query conditions
-        conditions = []
-        params = []  # Use a list for positional parameters instead of a dictionary
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        nltk.download('vader_lexicon')
+    
+    # Initialize VADER
+    sid = SentimentIntensityAnalyzer()
+    
+    # Process sentiment analysis
+    sentiment_by_date = defaultdict(list)
+    subreddit_sentiment = defaultdict(list)
+    
+    for post in posts:
+        post_id, title, selftext, subreddit, date_str = post
+        text = title
+        if selftext and selftext.strip():
+            text += " " + selftext
         
-        if keyword:
-            conditions.append("(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')")
-            params.append(keyword)
-            params.append(keyword)
-            
-        if subreddit:
-            conditions.append("LOWER(subreddit) = LOWER(?)")
-            params.append(subreddit)
-            
-        if domain:
-            conditions.append("LOWER(domain) = LOWER(?)")
-            params.append(domain)
+        # Skip empty text
+        if not text or text.strip() == '':
+            continue
             
-        # Create WHERE clause
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        # Get posts for sentiment analysis
-        query = f"""
-            SELECT 
-                id, title, selftext, subreddit,
-                DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') AS date
-            FROM reddit_posts_view
-            WHERE {where_clause}
-            ORDER BY created_utc
-        """
-        
-        posts = con.execute(query, params).fetchall()
-        
-        # Import NLTK's VADER for sentiment analysis
-        from nltk.sentiment.vader import SentimentIntensityAnalyzer
-        
-        # Download VADER lexicon if not already downloaded
-        import nltk
+        # Analyze sentiment using VADER
         try:
-            nltk.data.find('sentiment/vader_lexicon.zip')
-        except LookupError:
-            nltk.download('vader_lexicon')
-        
-        # Initialize VADER
-        sid = SentimentIntensityAnalyzer()
-        
-        # Process sentiment analysis
-        sentiment_by_date = defaultdict(list)
-        subreddit_sentiment = defaultdict(list)
-        
-        for post in posts:
-            post_id, title, selftext, subreddit, date_str = post
-            text = title
-            if selftext and selftext.strip():
-                text += " " + selftext
+            sentiment_scores = sid.polarity_scores(text)
+            compound_score = sentiment_scores['compound']  # -1 to 1 scale
             
-            # Skip empty text
-            if not text or text.strip() == '':
-                continue
-                
-            # Analyze sentiment using VADER
-            try:
-                sentiment_scores = sid.polarity_scores(text)
-                compound_score = sentiment_scores['compound']  # -1 to 1 scale
-                
-                # Add to date-based sentiment
-                sentiment_by_date[date_str.strftime('%Y-%m-%d')].append(compound_score)
-                
-                # Add to subreddit-based sentiment
-                subreddit_sentiment[subreddit].append(compound_score)
-            except Exception as e:
-                logger.warning(f"Error analyzing sentiment for post {post_id}: {str(e)}")
-                continue
-        
-        # Calculate sentiment categories for time series
-        sentiment_timeseries = []
-        for date, scores in sorted(sentiment_by_date.items()):
-            # Calculate percentages for each sentiment category
-            positive_pct = sum(1 for score in scores if score > 0.05) / len(scores) * 100 if scores else 0
-            negative_pct = sum(1 for score in scores if score < -0.05) / len(scores) * 100 if scores else 0
-            neutral_pct = sum(1 for score in scores if -0.05 <= score <= 0.05) / len(scores) * 100 if scores else 0
+            # Add to date-based sentiment
+            sentiment_by_date[date_str.strftime('%Y-%m-%d')].append(compound_score)
             
-            sentiment_timeseries.append({
-                "date": date,
-                "positive": round(positive_pct),
-                "neutral": round(neutral_pct),
-                "negative": round(negative_pct)
-            })
-        
-        # Calculate subreddit sentiment stats
-        subreddit_stats = []
-        for sr, scores in subreddit_sentiment.items():
-            if len(scores) < 5:  # Skip subreddits with too few posts
-                continue
-                
-            positive_pct = sum(1 for score in scores if score > 0.05) / len(scores) * 100
-            negative_pct = sum(1 for score in scores if score < -0.05) / len(scores) * 100
-            neutral_pct = sum(1 for score in scores if -0.05 <= score <= 0.05) / len(scores) * 100
-            avg_score = sum(scores) / len(scores)
-            
-            subreddit_stats.append({
-                "name": sr,
-                "positive": round(positive_pct),
-                "neutral": round(neutral_pct),
-                "negative": round(negative_pct),
-                "total": len(scores),
-                "score": avg_score
-            })
-        
-        # Sort subreddits by total posts
-        subreddit_stats.sort(key=lambda x: x["total"], reverse=True)
-        
-        # Calculate overall sentiment stats
-        all_scores = [score for scores in sentiment_by_date.values() for score in scores]
-        if all_scores:
-            overall_positive = sum(1 for score in all_scores if score > 0.05) / len(all_scores) * 100
-            overall_negative = sum(1 for score in all_scores if score < -0.05) / len(all_scores) * 100
-            overall_neutral = sum(1 for score in all_scores if -0.05 <= score <= 0.05) / len(all_scores) * 100
-            overall_score = sum(all_scores) / len(all_scores)
-        else:
-            overall_positive = 0
-            overall_negative = 0
-            overall_neutral = 0
-            overall_score = 0
+            # Add to subreddit-based sentiment
+            subreddit_sentiment[subreddit].append(compound_score)
+        except Exception as e:
+            logger.warning(f"Error analyzing sentiment for post {post_id}: {str(e)}")
+            continue
+    
+    # Calculate sentiment categories for time series
+    sentiment_timeseries = []
+    for date, scores in sorted(sentiment_by_date.items()):
+        # Calculate percentages for each sentiment category
+        positive_pct = sum(1 for score in scores if score > 0.05) / len(scores) * 100 if scores else 0
+        negative_pct = sum(1 for score in scores if score < -0.05) / len(scores) * 100 if scores else 0
+        neutral_pct = sum(1 for score in scores if -0.05 <= score <= 0.05) / len(scores) * 100 if scores else 0
+        
+        sentiment_timeseries.append({
+            "date": date,
+            "positive": round(positive_pct),
+            "neutral": round(neutral_pct),
+            "negative": round(negative_pct)
+        })
+    
+    # Calculate subreddit sentiment stats
+    subreddit_stats = []
+    for sr, scores in subreddit_sentiment.items():
+        if len(scores) < 5:  # Skip subreddits with too few posts
+            continue
+            
+        positive_pct = sum(1 for score in scores if score > 0.05) / len(scores) * 100
+        negative_pct = sum(1 for score in scores if score < -0.05) / len(scores) * 100
+        neutral_pct = sum(1 for score in scores if -0.05 <= score <= 0.05) / len(scores) * 100
+        avg_score = sum(scores) / len(scores)
+        
+        subreddit_stats.append({
+            "name": sr,
+            "positive": round(positive_pct),
+            "neutral": round(neutral_pct),
+            "negative": round(negative_pct),
+            "total": len(scores),
+            "score": avg_score
+        })
+    
+    # Sort subreddits by total posts
+    subreddit_stats.sort(key=lambda x: x["total"], reverse=True)
+    
+    # Calculate overall sentiment stats
+    all_scores = [score for scores in sentiment_by_date.values() for score in scores]
+    if all_scores:
+        overall_positive = sum(1 for score in all_scores if score > 0.05) / len(all_scores) * 100
+        overall_negative = sum(1 for score in all_scores if score < -0.05) / len(all_scores) * 100
+        overall_neutral = sum(1 for score in all_scores if -0.05 <= score <= 0.05) / len(all_scores) * 100
+        overall_score = sum(all_scores) / len(all_scores)
+    else:
+        overall_positive = 0
+        overall_negative = 0
+        overall_neutral = 0
+        overall_score = 0
+    
+    # Format response to match frontend expectations
+    response = {
+        "overall": {
+            "positive": round(overall_positive),
+            "neutral": round(overall_neutral),
+            "negative": round(overall_negative),
+            "total": len(all_scores),
+            "score": overall_score
+        },
+        "timeData": sentiment_timeseries,
+        "subreddits": subreddit_stats
+    }
+    
+    return response
+
+@app.route('/api/sentiment', methods=['GET'])
+@conditional_get('sentiment')
+@response_cache.cached('sentiment')
+@query_guard.guarded('sentiment')
+def get_sentiment_analysis():
+    """Perform sentiment analysis on posts matching query parameters"""
+    try:
+        db = request_cursor()
         
-        # Format response to match frontend expectations
-        response = {
-            "overall": {
-                "positive": round(overall_positive),
-                "neutral": round(overall_neutral),
-                "negative": round(overall_negative),
-                "total": len(all_scores),
-                "score": overall_score
-            },
-            "timeData": sentiment_timeseries,
-            "subreddits": subreddit_stats
-        }
+        # Compile the filters into a canonical WHERE clause
+        filters = FilterSpec.from_args(request.args, fields=('keyword', 'subreddit', 'domain'))
+        try:
+            where_clause, params = filters.compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        return jsonify(response)
+        return jsonify(_sentiment_panel(db, where_clause=where_clause, params=params))
         
     except Exception as e:
         logger.error(f"Error performing sentiment analysis: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/topics', methods=['GET'])
+@conditional_get('topics')
+@response_cache.cached('topics')
+@query_guard.guarded('topics')
 def get_topic_modeling():
     """
     Get topic modeling results for Reddit posts.
@@ -794,43 +1037,58 @@ def get_topic_modeling():
     - num_topics (optional): Number of topics to extract (default: 8)
     
     Returns:
-    - JSON with topic modeling results
+    - JSON with topic modeling results; when more posts match than the
+      ``topics`` row limit of the query guard, the model is fitted on a
+      sample of them and ``downgraded`` says so
     """
     try:
+        db = request_cursor()
+        
         # Get query parameters
-        subreddit = request.args.get('subreddit', '')
-        after_date = request.args.get('after', '')
-        before_date = request.args.get('before', '')
         num_topics = int(request.args.get('num_topics', 8))
         
-        # Build the SQL query using DuckDB date functions
-        query = """
+        # Compile the filters into a canonical WHERE clause
+        filters = FilterSpec.from_args(request.args, fields=('subreddit', 'dates'),
+                                       start_name='after', end_name='before')
+        try:
+            where_clause, params = filters.compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Select the posts to model
+        query = f"""
             SELECT 
                 title, 
                 selftext, 
                 subreddit, 
                 created_utc,
-                DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') AS post_date
+                day_bucket AS post_date
             FROM reddit_posts_view
-            WHERE 1=1
+            WHERE {where_clause}
         """
         
-        params = []
-        
-        if subreddit:
-            query += " AND subreddit = ?"
-            params.append(subreddit)
-        
-        if after_date:
-            query += " AND DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') >= ?"
-            params.append(after_date)
-        
-        if before_date:
-            query += " AND DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') <= ?"
-            params.append(before_date)
+        # Fitting the model is the costly part and cannot be interrupted, so
+        # model a repeatable sample when too many posts are estimated to match
+        downgrade = None
+        max_posts = query_guard.max_rows('topics')
+        if max_posts:
+            try:
+                estimated_posts = estimate_rows(db, query, params)
+            except duckdb.Error as e:
+                # The estimate only guards the cost; without one, run the request as asked
+                logger.warning(f"Could not estimate the posts of a topics request: {str(e)}")
+                estimated_posts = 0
+            if estimated_posts > max_posts:
+                query = f"""
+                    SELECT * FROM ({query}) AS matching
+                    USING SAMPLE reservoir({int(max_posts)} ROWS) REPEATABLE (42)
+                    ORDER BY created_utc
+                """
+                downgrade = {"reason": "estimated_rows", "estimated_rows": estimated_posts, "max_rows": max_posts}
+                query_guard.record('topics', DOWNGRADED, **downgrade)
         
         # Execute the query
-        result = con.execute(query, params).fetchall()
+        result = execute_prepared(db, query, params).fetchall()
         
         if not result:
             return jsonify({
@@ -1101,171 +1359,238 @@ def get_topic_modeling():
         # Sort topics by post count
         topics = sorted(topics, key=lambda x: x["postCount"], reverse=True)
         
-        return jsonify({
+        topic_model = {
             "topics": topics,
             "subreddits": subreddits_data,
             "timeData": time_data
-        })
+        }
+        if downgrade:
+            topic_model["downgraded"] = downgrade
+        return jsonify(topic_model)
         
     except Exception as e:
         logger.error(f"Error in topic modeling: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Words the summary's rough sentiment counts as positive and negative
+SUMMARY_POSITIVE_WORDS = ('good', 'great', 'excellent', 'amazing', 'love')
+SUMMARY_NEGATIVE_WORDS = ('bad', 'terrible', 'awful', 'hate', 'worst')
+
+def _search_description(args):
+    """Describe the posts selected by the keyword, subreddit and domain filters, for the summary."""
+    keyword = args.get('keyword', '')
+    subreddit = args.get('subreddit', '')
+    domain = args.get('domain', '')
+    
+    search_description = "posts"
+    if keyword:
+        search_description += f" containing '{keyword}'"
+    if subreddit:
+        search_description += f" in r/{subreddit}"
+    if domain:
+        search_description += f" from {domain}"
+    return search_description
+
+def _summary_panel(db, search_description, source='reddit_posts_view', where_clause='1=1', params=()):
+    """Compute the /api/ai/summary payload over the posts of ``source`` matching ``where_clause``."""
+    params = list(params)
+    
+    # Count, date range, sentiment and engagement come out of one scan
+    text = "title || ' ' || selftext"
+    sentiment_cases = " ".join(
+        [f"WHEN {text} LIKE '%{word}%' THEN 1" for word in SUMMARY_POSITIVE_WORDS]
+        + [f"WHEN {text} LIKE '%{word}%' THEN -1" for word in SUMMARY_NEGATIVE_WORDS]
+    )
+    overview_query = f"""
+        SELECT 
+            COUNT(*) as total_count,
+            MIN(day_bucket) as min_date,
+            MAX(day_bucket) as max_date,
+            AVG(CASE {sentiment_cases} ELSE 0 END) as sentiment_score,
+            AVG(score) as avg_score,
+            AVG(num_comments) as avg_comments,
+            SUM(score) as total_score,
+            SUM(num_comments) as total_comments
+        FROM {source}
+        WHERE {where_clause}
+    """
+    (total_count, min_date, max_date, sentiment_score,
+     avg_score, avg_comments, total_score, total_comments) = execute_prepared(db, overview_query, params).fetchone()
+    
+    top_subreddits = execute_prepared(
+        db, top_values_sql('subreddit', where_clause, limit=5, source=source), params
+    ).fetchall()
+    
+    # Generate summary text
+    summary = f"Analysis of {total_count} Reddit {search_description} "
+    
+    if min_date and max_date:
+        summary += f"from {min_date.strftime('%Y-%m-%d')} to {max_date.strftime('%Y-%m-%d')}.\n\n"
+    
+    if top_subreddits:
+        summary += "Top subreddits in these results:\n"
+        for sr, count, _ in top_subreddits:
+            percentage = (count / total_count) * 100
+            summary += f"- r/{sr}: {count} posts ({percentage:.1f}%)\n"
+    
+    # Add sentiment analysis
+    sentiment_desc = "positive" if sentiment_score > 0.1 else "negative" if sentiment_score < -0.1 else "neutral"
+    
+    summary += f"\nThe overall sentiment of these posts appears to be {sentiment_desc}.\n"
+    
+    # Add engagement metrics
+    summary += f"\nEngagement metrics:\n"
+    summary += f"- Total score (upvotes minus downvotes): {int(total_score)}\n"
+    summary += f"- Total comments: {int(total_comments)}\n"
+    summary += f"- Average score per post: {avg_score:.1f}\n"
+    summary += f"- Average comments per post: {avg_comments:.1f}\n"
+    
+    # Add key observations
+    summary += "\nKey observations:\n"
+    
+    if total_count > 1000:
+        summary += f"- This is a highly discussed topic with {total_count} posts.\n"
+    elif total_count < 10:
+        summary += f"- This appears to be a niche topic with only {total_count} posts.\n"
+    
+    if avg_comments > 10:
+        summary += f"- Posts on this topic generate significant discussion with an average of {avg_comments:.1f} comments per post.\n"
+    
+    # Most active days
+    active_days_query = f"""
+        SELECT 
+            day_bucket as date,
+            COUNT(*) as post_count
+        FROM {source}
+        WHERE {where_clause}
+        GROUP BY date
+        ORDER BY post_count DESC
+        LIMIT 1
+    """
+    
+    most_active_day = execute_prepared(db, active_days_query, params).fetchone()
+    if most_active_day:
+        day, count = most_active_day
+        summary += f"- The most active day was {day.strftime('%Y-%m-%d')} with {count} posts.\n"
+    
+    return {
+        "summary": summary,
+        "total_posts": total_count,
+        "date_range": {
+            "start": min_date.strftime('%Y-%m-%d') if min_date else None,
+            "end": max_date.strftime('%Y-%m-%d') if max_date else None
+        },
+        "sentiment": sentiment_desc,
+        "top_subreddits": [{"name": sr, "count": count} for sr, count, _ in top_subreddits]
+    }
+
 @app.route('/api/ai/summary', methods=['GET'])
+@conditional_get('ai_summary')
 def get_ai_summary():
     """Generate AI summary of search results"""
     try:
-        keyword = request.args.get('keyword', '')
-        subreddit = request.args.get('subreddit', '')
-        domain = request.args.get('domain', '')
-        
-        # Build description of the search
-        search_description = "posts"
-        if keyword:
-            search_description += f" containing '{keyword}'"
-        if subreddit:
-            search_description += f" in r/{subreddit}"
-        if domain:
-            search_description += f" from {domain}"
-        
-        # Build query conditions
-        conditions = []
-        params = []  # Use a list for positional parameters
+        db = request_cursor()
         
-        if keyword:
-            conditions.append("(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')")
-            params.append(keyword)
-            params.append(keyword)
-            
-        if subreddit:
-            conditions.append("LOWER(subreddit) = LOWER(?)")
-            params.append(subreddit)
-            
-        if domain:
-            conditions.append("LOWER(domain) = LOWER(?)")
-            params.append(domain)
-            
-        # Create WHERE clause
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        # Get stats for summary
-        total_count = con.execute(f"SELECT COUNT(*) FROM reddit_posts_view WHERE {where_clause}", params).fetchone()[0]
-        
-        time_range = con.execute(f"""
-            SELECT 
-                MIN(DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second')) as min_date,
-                MAX(DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second')) as max_date
-            FROM reddit_posts_view
-            WHERE {where_clause}
-        """, params).fetchone()
-        
-        min_date, max_date = time_range
-        
-        top_subreddits = con.execute(f"""
-            SELECT subreddit, COUNT(*) as count
-            FROM reddit_posts_view
-            WHERE {where_clause}
-            GROUP BY subreddit
-            ORDER BY count DESC
-            LIMIT 5
-        """, params).fetchall()
-        
-        # Generate summary text
-        summary = f"Analysis of {total_count} Reddit {search_description} "
-        
-        if min_date and max_date:
-            summary += f"from {min_date.strftime('%Y-%m-%d')} to {max_date.strftime('%Y-%m-%d')}.\n\n"
-        
-        if top_subreddits:
-            summary += "Top subreddits in these results:\n"
-            for sr, count in top_subreddits:
-                percentage = (count / total_count) * 100
-                summary += f"- r/{sr}: {count} posts ({percentage:.1f}%)\n"
-        
-        # Add sentiment analysis
-        sentiment_query = f"""
-            SELECT 
-                AVG(CASE WHEN title || ' ' || selftext LIKE '%good%' THEN 1
-                    WHEN title || ' ' || selftext LIKE '%great%' THEN 1
-                    WHEN title || ' ' || selftext LIKE '%excellent%' THEN 1
-                    WHEN title || ' ' || selftext LIKE '%amazing%' THEN 1
-                    WHEN title || ' ' || selftext LIKE '%love%' THEN 1
-                    WHEN title || ' ' || selftext LIKE '%bad%' THEN -1
-                    WHEN title || ' ' || selftext LIKE '%terrible%' THEN -1
-                    WHEN title || ' ' || selftext LIKE '%awful%' THEN -1
-                    WHEN title || ' ' || selftext LIKE '%hate%' THEN -1
-                    WHEN title || ' ' || selftext LIKE '%worst%' THEN -1
-                    ELSE 0 END) as sentiment_score
-            FROM reddit_posts_view
-            WHERE {where_clause}
-        """
-        
-        sentiment_score = con.execute(sentiment_query, params).fetchone()[0]
-        sentiment_desc = "positive" if sentiment_score > 0.1 else "negative" if sentiment_score < -0.1 else "neutral"
-        
-        summary += f"\nThe overall sentiment of these posts appears to be {sentiment_desc}.\n"
-        
-        # Add engagement metrics
-        engagement_query = f"""
-            SELECT 
-                AVG(score) as avg_score,
-                AVG(num_comments) as avg_comments,
-                SUM(score) as total_score,
-                SUM(num_comments) as total_comments
-            FROM reddit_posts_view
-            WHERE {where_clause}
-        """
-        
-        engagement = con.execute(engagement_query, params).fetchone()
-        avg_score, avg_comments, total_score, total_comments = engagement
-        
-        summary += f"\nEngagement metrics:\n"
-        summary += f"- Total score (upvotes minus downvotes): {int(total_score)}\n"
-        summary += f"- Total comments: {int(total_comments)}\n"
-        summary += f"- Average score per post: {avg_score:.1f}\n"
-        summary += f"- Average comments per post: {avg_comments:.1f}\n"
+        # Compile the filters into a canonical WHERE clause
+        filters = FilterSpec.from_args(request.args, fields=('keyword', 'subreddit', 'domain'))
+        try:
+            where_clause, params = filters.compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Add key observations
-        summary += "\nKey observations:\n"
+        return jsonify(_summary_panel(db, _search_description(request.args), where_clause=where_clause, params=params))
         
-        if total_count > 1000:
-            summary += f"- This is a highly discussed topic with {total_count} posts.\n"
-        elif total_count < 10:
-            summary += f"- This appears to be a niche topic with only {total_count} posts.\n"
+    except Exception as e:
+        logger.error(f"Error generating AI summary: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Panels of /api/dashboard, each the payload of the standalone endpoint with the same filters
+DASHBOARD_PANELS = ('stats', 'timeseries', 'sentiment', 'summary')
+
+@app.route('/api/dashboard', methods=['GET'])
+@conditional_get('dashboard')
+@response_cache.cached('dashboard')
+@query_guard.guarded('dashboard')
+def get_dashboard():
+    """
+    Compute the dashboard's panels from one filtered row set in a single request.
+    
+    The posts matching the filters are copied once into a table holding only
+    the columns the requested panels read (without filters the panels read
+    the posts directly); the panels then run concurrently on it, each on a
+    cursor of its own.
+    
+    Query Parameters:
+    - keyword, match, subreddit, author, domain, start_date, end_date (optional):
+      Filters shared by every panel
+    - interval (optional): Period of the timeseries panel (default: day)
+    - panels (optional): Comma-separated panels to compute (default: all of
+      stats, timeseries, sentiment, summary)
+    
+    Returns:
+    - JSON with each panel's payload under ``panels`` (as returned by /api/stats,
+      /api/timeseries, /api/sentiment and /api/ai/summary), ``errors`` for panels
+      that failed (with status 500), the number of matching ``rows`` (null without filters, when
+      the panels read the posts directly) and ``timings_ms`` per panel, for
+      materializing the rows and in total
+    """
+    try:
+        started = time.perf_counter()
+        db = request_cursor()
         
-        if avg_comments > 10:
-            summary += f"- Posts on this topic generate significant discussion with an average of {avg_comments:.1f} comments per post.\n"
+        interval = request.args.get('interval', 'day')
+        if interval not in TIME_BUCKETS:
+            return jsonify({"error": f"Invalid interval. Use one of: {', '.join(TIME_BUCKETS)}"}), 400
         
-        # Most active days
-        active_days_query = f"""
-            SELECT 
-                DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') as date,
-                COUNT(*) as post_count
-            FROM reddit_posts_view
-            WHERE {where_clause}
-            GROUP BY date
-            ORDER BY post_count DESC
-            LIMIT 1
-        """
+        requested = [name.strip() for name in request.args.get('panels', ','.join(DASHBOARD_PANELS)).split(',') if name.strip()]
+        unknown = [name for name in requested if name not in DASHBOARD_PANELS]
+        if unknown or not requested:
+            return jsonify({"error": f"Invalid panels. Use any of: {', '.join(DASHBOARD_PANELS)}"}), 400
         
-        most_active_day = con.execute(active_days_query, params).fetchone()
-        if most_active_day:
-            day, count = most_active_day
-            summary += f"- The most active day was {day.strftime('%Y-%m-%d')} with {count} posts.\n"
+        # Compile the filters into a canonical WHERE clause
+        try:
+            where_clause, params = FilterSpec.from_args(request.args).compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        columns = DASHBOARD_COLUMNS
+        if TIME_BUCKETS[interval] not in columns:
+            columns += (TIME_BUCKETS[interval],)
+        if 'sentiment' in requested or 'summary' in requested:
+            columns += DASHBOARD_TEXT_COLUMNS
+        search_description = _search_description(request.args)
+        
+        materialize_started = time.perf_counter()
+        with materialized(db, where_clause, params, columns) as (source, rows):
+            materialize_ms = round((time.perf_counter() - materialize_started) * 1000, 3)
+            
+            # Every panel reads the materialized rows, so none of them filters again
+            panel_functions = {
+                'stats': lambda cursor: _stats_panel(cursor, source),
+                'timeseries': lambda cursor: _timeseries_points(
+                    execute_prepared(cursor, _timeseries_sql(interval, source)).fetchall()
+                ),
+                'sentiment': lambda cursor: _sentiment_panel(cursor, source),
+                'summary': lambda cursor: _summary_panel(cursor, search_description, source),
+            }
+            panels, errors, timings = run_panels(
+                {name: panel_functions[name] for name in requested}, con, deadline=current_deadline()
+            )
         
+        # A dashboard missing a panel is an error, so it is neither cached nor given an ETag
         return jsonify({
-            "summary": summary,
-            "total_posts": total_count,
-            "date_range": {
-                "start": min_date.strftime('%Y-%m-%d') if min_date else None,
-                "end": max_date.strftime('%Y-%m-%d') if max_date else None
+            "panels": panels,
+            "errors": errors,
+            "rows": rows,
+            "timings_ms": {
+                "materialize": materialize_ms,
+                **timings,
+                "total": round((time.perf_counter() - started) * 1000, 3),
             },
-            "sentiment": sentiment_desc,
-            "top_subreddits": [{"name": sr, "count": count} for sr, count in top_subreddits]
-        })
+        }), 500 if errors else 200
         
     except Exception as e:
-        logger.error(f"Error generating AI summary: {str(e)}")
+        logger.error(f"Error building dashboard: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/ai/insights', methods=['GET'])
@@ -1284,12 +1609,12 @@ def get_ai_insights():
     - JSON with AI-generated insights about the matching posts
     """
     try:
+        db = request_cursor()
+        
         # Get query parameters
         keyword = request.args.get('keyword', '')
         subreddit = request.args.get('subreddit', '')
         domain = request.args.get('domain', '')
-        after_date = request.args.get('after', '')
-        before_date = request.args.get('before', '')
         
         # Build description of the search
         search_description = "posts"
@@ -1300,36 +1625,16 @@ def get_ai_insights():
         if domain:
             search_description += f" from {domain}"
         
-        # Build query conditions
-        conditions = []
-        params = []  # Use a list for positional parameters
-        
-        if keyword:
-            conditions.append("(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')")
-            params.append(keyword)
-            params.append(keyword)
-            
-        if subreddit:
-            conditions.append("LOWER(subreddit) = LOWER(?)")
-            params.append(subreddit)
-            
-        if domain:
-            conditions.append("LOWER(domain) = LOWER(?)")
-            params.append(domain)
-        
-        if after_date:
-            conditions.append("DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') >= ?")
-            params.append(after_date)
-        
-        if before_date:
-            conditions.append("DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') <= ?")
-            params.append(before_date)
-            
-        # Create WHERE clause
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        # Compile the filters into a canonical WHERE clause
+        filters = FilterSpec.from_args(request.args, fields=('keyword', 'subreddit', 'domain', 'dates'),
+                                       start_name='after', end_name='before')
+        try:
+            where_clause, params = filters.compile(db)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Get stats for summary
-        total_count = con.execute(f"SELECT COUNT(*) FROM reddit_posts_view WHERE {where_clause}", params).fetchone()[0]
+        total_count = execute_prepared(db, f"SELECT COUNT(*) FROM reddit_posts_view WHERE {where_clause}", params).fetchone()[0]
         
         if total_count == 0:
             return jsonify({
@@ -1337,10 +1642,10 @@ def get_ai_insights():
             }), 404
         
         # Get time range
-        time_range = con.execute(f"""
+        time_range = execute_prepared(db, f"""
             SELECT 
-                MIN(DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second')) as min_date,
-                MAX(DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second')) as max_date
+                MIN(day_bucket) as min_date,
+                MAX(day_bucket) as max_date
             FROM reddit_posts_view
             WHERE {where_clause}
         """, params).fetchone()
@@ -1348,14 +1653,7 @@ def get_ai_insights():
         min_date, max_date = time_range
         
         # Get top subreddits
-        top_subreddits = con.execute(f"""
-            SELECT subreddit, COUNT(*) as count
-            FROM reddit_posts_view
-            WHERE {where_clause}
-            GROUP BY subreddit
-            ORDER BY count DESC
-            LIMIT 5
-        """, params).fetchall()
+        top_subreddits = execute_prepared(db, top_values_sql('subreddit', where_clause, limit=5), params).fetchall()
         
         # Get sentiment distribution
         sentiment_query = f"""
@@ -1375,7 +1673,7 @@ def get_ai_insights():
             WHERE {where_clause}
         """
         
-        sentiment_counts = con.execute(sentiment_query, params).fetchone()
+        sentiment_counts = execute_prepared(db, sentiment_query, params).fetchone()
         positive, negative, total = sentiment_counts
         neutral = total - positive - negative
         
@@ -1409,7 +1707,7 @@ def get_ai_insights():
         
         if top_subreddits:
             summary += "Top subreddits in these results:\n"
-            for sr, count in top_subreddits:
+            for sr, count, _ in top_subreddits:
                 percentage = (count / total_count) * 100
                 summary += f"- r/{sr}: {count} posts ({percentage:.1f}%)\n"
         
@@ -1426,7 +1724,7 @@ def get_ai_insights():
             WHERE {where_clause}
         """
         
-        engagement = con.execute(engagement_query, params).fetchone()
+        engagement = execute_prepared(db, engagement_query, params).fetchone()
         avg_score, avg_comments, total_score, total_comments = engagement
         
         summary += f"\nEngagement metrics:\n"
@@ -1452,7 +1750,7 @@ def get_ai_insights():
         # Most active days
         active_days_query = f"""
             SELECT 
-                DATE_TRUNC('day', TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') as date,
+                day_bucket as date,
                 COUNT(*) as post_count
             FROM reddit_posts_view
             WHERE {where_clause}
@@ -1461,7 +1759,7 @@ def get_ai_insights():
             LIMIT 1
         """
         
-        most_active_day = con.execute(active_days_query, params).fetchone()
+        most_active_day = execute_prepared(db, active_days_query, params).fetchone()
         if most_active_day:
             day, count = most_active_day
             summary += f"- The most active day was {day.strftime('%Y-%m-%d')} with {count} posts.\n"
@@ -1479,7 +1777,7 @@ def get_ai_insights():
             LIMIT 1000
         """
         
-        posts = con.execute(posts_query, params).fetchall()
+        posts = execute_prepared(db, posts_query, params).fetchall()
         
         # Prepare texts
         texts = []
@@ -1574,7 +1872,7 @@ def get_ai_insights():
         # Most active times
         time_of_day_query = f"""
             SELECT 
-                EXTRACT(hour FROM TIMESTAMP 'epoch' + CAST(created_utc AS BIGINT) * INTERVAL '1 second') as hour,
+                hour_of_day as hour,
                 COUNT(*) as post_count
             FROM reddit_posts_view
             WHERE {where_clause}
@@ -1583,7 +1881,7 @@ def get_ai_insights():
             LIMIT 3
         """
         
-        active_hours = con.execute(time_of_day_query, params).fetchall()
+        active_hours = execute_prepared(db, time_of_day_query, params).fetchall()
         if active_hours:
             # Convert hour numbers to time periods
             hour_to_period = {
@@ -1689,7 +1987,7 @@ def get_ai_insights():
                 "end": max_date.strftime('%Y-%m-%d') if max_date else None
             },
             "sentiment": sentiment_desc,
-            "top_subreddits": [{"name": sr, "count": count} for sr, count in top_subreddits],
+            "top_subreddits": [{"name": sr, "count": count} for sr, count, _ in top_subreddits],
             "topics": topics,
             "time_trends": time_trends,
             "engagement_patterns": engagement_patterns,
@@ -1706,15 +2004,19 @@ def get_ai_insights():
 # Register the chat blueprint
 try:
     # Pass the Gemini model to the chat module
-    init_chat_module(app, con, model)
+    init_chat_module(app, PooledConnection(), model)
     logger.info("Chat module initialized with Gemini model")
 except NameError:
     # If model is not defined (Gemini not available), initialize without it
-    init_chat_module(app, con)
+    init_chat_module(app, PooledConnection())
     logger.info("Chat module initialized without Gemini model")
 
+# Register the admin ingest blueprint; its tailer starts once the data is loaded
+init_ingest_module(app, con, start_tailer=False, serve_read_only=READ_ONLY)
+
+# Load the data in the background so the app answers health checks right away
+data_loader = threading.Thread(target=load_data_in_background, name='data-loader', daemon=True)
+data_loader.start()
+
 if __name__ == '__main__':
-    # Load data
-    load_and_process_data()
-    
     app.run(debug=True, port=5000)
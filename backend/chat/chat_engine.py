@@ -5,6 +5,9 @@ import json
 import re
 from typing import Dict, List, Any, Optional, Tuple
 
+from query.dimensions import dimension_condition, top_values_sql
+from query.fulltext import any_substring_condition
+
 # Import Gemini API if available
 try:
     import google.generativeai as genai
@@ -175,17 +178,18 @@ class ChatEngine:
                 subreddit_match = re.search(r'r/(\w+)', query)
                 if subreddit_match:
                     subreddit = subreddit_match.group(1)
-                    subreddit_conditions.append("LOWER(subreddit) = LOWER(?)")
-                    params.append(subreddit)
+                    condition, condition_params = dimension_condition(self.db_connection, 'subreddit', subreddit)
+                    subreddit_conditions.append(condition)
+                    params.extend(condition_params)
                     logger.info(f"Added subreddit condition for: {subreddit}")
             
             # Add keyword conditions
-            for keyword in keywords:
-                if len(keyword) > 3:  # Only use meaningful keywords
-                    keyword_conditions.append("(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')")
-                    params.append(keyword)
-                    params.append(keyword)
-                    logger.info(f"Added keyword condition for: {keyword}")
+            meaningful_keywords = [keyword for keyword in keywords if len(keyword) > 3]
+            if meaningful_keywords:
+                condition, condition_params = any_substring_condition(meaningful_keywords)
+                keyword_conditions.append(condition)
+                params.extend(condition_params)
+                logger.info(f"Added keyword condition for: {meaningful_keywords}")
             
             # If no conditions, return None
             if not subreddit_conditions and not keyword_conditions:
@@ -211,13 +215,7 @@ class ChatEngine:
                 logger.info("General subreddit question detected, returning top subreddits")
                 
                 # Get top subreddits
-                subreddit_query = """
-                    SELECT subreddit, COUNT(*) as count
-                    FROM reddit_posts_view
-                    GROUP BY subreddit
-                    ORDER BY count DESC
-                    LIMIT 5
-                """
+                subreddit_query = top_values_sql('subreddit', limit=5)
                 
                 subreddits = self.db_connection.execute(subreddit_query).fetchall()
                 logger.info(f"Top subreddits: {subreddits}")
@@ -228,7 +226,7 @@ class ChatEngine:
                     "avg_comments": None,
                     "total_score": None,
                     "total_comments": None,
-                    "top_subreddits": [{"name": sr, "count": count} for sr, count in subreddits]
+                    "top_subreddits": [{"name": sr, "count": count} for sr, count, _ in subreddits]
                 }
             
             # Execute query to get basic stats
@@ -248,14 +246,7 @@ class ChatEngine:
             logger.info(f"Query result: {result}")
             
             # Get top subreddits
-            subreddit_query = f"""
-                SELECT subreddit, COUNT(*) as count
-                FROM reddit_posts_view
-                {f"WHERE {where_clause}" if where_clause else ""}
-                GROUP BY subreddit
-                ORDER BY count DESC
-                LIMIT 5
-            """
+            subreddit_query = top_values_sql('subreddit', where_clause or "1=1", limit=5)
             
             subreddits = self.db_connection.execute(subreddit_query, params).fetchall()
             logger.info(f"Top subreddits: {subreddits}")
@@ -266,7 +257,7 @@ class ChatEngine:
                 "avg_comments": result[2],
                 "total_score": result[3],
                 "total_comments": result[4],
-                "top_subreddits": [{"name": sr, "count": count} for sr, count in subreddits]
+                "top_subreddits": [{"name": sr, "count": count} for sr, count, _ in subreddits]
             }
             
         except Exception as e:
@@ -6,6 +6,10 @@ import json
 from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 
+from query.dimensions import dimension_condition, top_values_sql
+from query.fulltext import any_substring_condition
+from query.filters import date_range_conditions
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -158,15 +162,15 @@ class QueryEngine:
             
             # Add subreddit conditions
             if entities["subreddits"]:
-                subreddit_placeholders = ", ".join(["?" for _ in entities["subreddits"]])
-                conditions.append(f"LOWER(subreddit) IN ({subreddit_placeholders})")
-                params.extend([s.lower() for s in entities["subreddits"]])
+                condition, condition_params = dimension_condition(self.db_connection, 'subreddit', entities["subreddits"])
+                conditions.append(condition)
+                params.extend(condition_params)
             
             # Add keyword conditions
             for keyword in entities["keywords"]:
-                conditions.append("(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')")
-                params.append(keyword)
-                params.append(keyword)
+                condition, condition_params = any_substring_condition([keyword])
+                conditions.append(condition)
+                params.extend(condition_params)
             
             # Add time period conditions
             if entities["time_period"]:
@@ -190,11 +194,13 @@ class QueryEngine:
                 
                 if time_period in month_map:
                     month_num = month_map[time_period]
-                    conditions.append("strftime('%m', created_utc) = ?")
-                    params.append(month_num)
+                    conditions.append("EXTRACT(month FROM month_bucket) = ?")
+                    params.append(int(month_num))
                 elif re.match(r'202[0-9]', time_period):
-                    conditions.append("strftime('%Y', created_utc) = ?")
-                    params.append(time_period)
+                    # A whole year is a plain epoch range on created_utc
+                    year_conditions, year_params = date_range_conditions(f"{time_period}-01-01", f"{time_period}-12-31")
+                    conditions.extend(year_conditions)
+                    params.extend(year_params)
             
             # Create WHERE clause
             where_clause = " AND ".join(conditions) if conditions else "1=1"
@@ -210,20 +216,13 @@ class QueryEngine:
                 return {"count": result[0]}
                 
             elif intent == "popular":
-                query = f"""
-                    SELECT subreddit, COUNT(*) as count
-                    FROM reddit_posts_view
-                    WHERE {where_clause}
-                    GROUP BY subreddit
-                    ORDER BY count DESC
-                    LIMIT 5
-                """
+                query = top_values_sql('subreddit', where_clause, limit=5)
                 results = self.db_connection.execute(query, params).fetchall()
                 return {"popular_subreddits": [{"name": r[0], "count": r[1]} for r in results]}
                 
             elif intent == "trend":
                 query = f"""
-                    SELECT strftime('%Y-%m-%d', created_utc) as date, COUNT(*) as count
+                    SELECT strftime(day_bucket, '%Y-%m-%d') as date, COUNT(*) as count
                     FROM reddit_posts_view
                     WHERE {where_clause}
                     GROUP BY date
@@ -250,21 +249,24 @@ class QueryEngine:
                 
             elif intent == "compare" and len(entities["subreddits"]) >= 2:
                 # Compare two subreddits
-                subreddit1, subreddit2 = entities["subreddits"][:2]
+                condition, condition_params = dimension_condition(
+                    self.db_connection, 'subreddit', entities["subreddits"][:2]
+                )
                 
                 query = f"""
                     SELECT 
-                        subreddit,
+                        ANY_VALUE(subreddit_dim.name) as subreddit,
                         COUNT(*) as post_count,
                         AVG(score) as avg_score,
                         AVG(num_comments) as avg_comments,
                         AVG(sentiment_score) as avg_sentiment
                     FROM reddit_posts_view
-                    WHERE LOWER(subreddit) IN (?, ?)
-                    GROUP BY subreddit
+                    JOIN subreddit_dim ON subreddit_dim.id = reddit_posts_view.subreddit_id
+                    WHERE {condition}
+                    GROUP BY subreddit_id
                 """
                 
-                results = self.db_connection.execute(query, [subreddit1.lower(), subreddit2.lower()]).fetchall()
+                results = self.db_connection.execute(query, condition_params).fetchall()
                 return {"comparison": [
                     {
                         "subreddit": r[0],
@@ -291,14 +293,7 @@ class QueryEngine:
                 result = self.db_connection.execute(query, params).fetchone()
                 
                 # Get top subreddits
-                subreddit_query = f"""
-                    SELECT subreddit, COUNT(*) as count
-                    FROM reddit_posts_view
-                    WHERE {where_clause}
-                    GROUP BY subreddit
-                    ORDER BY count DESC
-                    LIMIT 5
-                """
+                subreddit_query = top_values_sql('subreddit', where_clause, limit=5)
                 
                 subreddits = self.db_connection.execute(subreddit_query, params).fetchall()
                 
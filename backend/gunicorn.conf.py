@@ -0,0 +1,17 @@
+"""Gunicorn settings, picked up automatically from the working directory.
+
+With ``DB_READ_ONLY=1`` every worker attaches the same prebuilt snapshot
+read-only, so one worker per core is started by default. Otherwise a single
+worker owns the read-write snapshot. ``WEB_CONCURRENCY`` and ``WEB_THREADS``
+override the worker and thread counts.
+"""
+
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+_read_only = os.getenv('DB_READ_ONLY', '').lower() in ('1', 'true', 'yes')
+workers = int(os.getenv('WEB_CONCURRENCY', (os.cpu_count() or 1) if _read_only else 1))
+
+# Each thread serves requests on its own pooled database cursor
+threads = int(os.getenv('WEB_THREADS', os.getenv('DB_POOL_SIZE', 8)))
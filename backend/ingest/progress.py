@@ -0,0 +1,113 @@
+"""Progress of the startup data load, reported by the health endpoints.
+
+The app loads (or attaches) the dataset in a background thread, so the
+loaders report what they are doing here and the readiness check can tell a
+caller how far along the load is and roughly how long it has left.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Phases of a load, in order
+PENDING = 'pending'
+STARTING = 'starting'
+DISCOVERING = 'discovering sources'
+BUILDING = 'building snapshot'
+EXTENDING = 'extending snapshot'
+ATTACHING = 'attaching snapshot'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class LoadProgress:
+    """Thread-safe record of how far the dataset load has come."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget any previous load."""
+        with self._lock:
+            self.phase = PENDING
+            self.rows_loaded = 0
+            self.bytes_loaded = 0
+            self.total_bytes = 0
+            self.started_at: Optional[float] = None
+            self.finished_at: Optional[float] = None
+            self.error: Optional[str] = None
+
+    def start(self):
+        """Mark the beginning of a load."""
+        self.reset()
+        with self._lock:
+            self.phase = STARTING
+            self.started_at = time.time()
+
+    def set_phase(self, phase: str):
+        with self._lock:
+            self.phase = phase
+
+    def expect(self, total_bytes: int):
+        """Announce how many source bytes the load is going to parse."""
+        with self._lock:
+            self.total_bytes += total_bytes
+
+    def advance(self, rows: int = 0, bytes_loaded: int = 0):
+        """Record rows and source bytes that have been loaded."""
+        with self._lock:
+            self.rows_loaded += rows
+            self.bytes_loaded += bytes_loaded
+
+    def finish(self, total_rows: int):
+        """Mark the dataset as loaded with ``total_rows`` posts."""
+        with self._lock:
+            self.phase = READY
+            self.rows_loaded = total_rows
+            self.bytes_loaded = self.total_bytes
+            self.finished_at = time.time()
+
+    def fail(self, error: str):
+        with self._lock:
+            self.phase = FAILED
+            self.error = error
+            self.finished_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == READY
+
+    @property
+    def failed(self) -> bool:
+        return self.phase == FAILED
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimate the remaining load time from the share of source bytes parsed so far."""
+        with self._lock:
+            if self.phase in (READY, FAILED) or not self.started_at:
+                return None
+            if not self.total_bytes or not self.bytes_loaded:
+                return None
+            elapsed = time.time() - self.started_at
+            remaining = max(self.total_bytes - self.bytes_loaded, 0)
+            return round(elapsed * remaining / self.bytes_loaded, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        eta = self.eta_seconds()
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "phase": self.phase,
+                "rows_loaded": self.rows_loaded,
+                "bytes_loaded": self.bytes_loaded,
+                "total_bytes": self.total_bytes,
+                "percent": round(100.0 * self.bytes_loaded / self.total_bytes, 1) if self.total_bytes else None,
+                "elapsed_seconds": round(end - self.started_at, 1) if self.started_at else None,
+                "eta_seconds": eta,
+                "error": self.error
+            }
+
+
+# Progress of this process's load
+load_progress = LoadProgress()
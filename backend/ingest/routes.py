@@ -0,0 +1,125 @@
+"""Admin API routes for appending new data without a restart."""
+
+import hmac
+import logging
+import os
+from flask import Blueprint, request, jsonify
+
+from .appender import PostAppender
+from .tailer import DirectoryTailer
+from .version import current_version
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Create Blueprint
+ingest_bp = Blueprint('ingest', __name__, url_prefix='/api/admin')
+
+# Global instances
+appender = None
+tailer = None
+read_only = False
+
+
+def init_ingest_module(app, db_connection, start_tailer=True, serve_read_only=False):
+    """Initialize the ingest module with the Flask app and database connection.
+
+    Setting ``INGEST_WATCH_DIR`` starts a tailer that appends JSONL files
+    dropped into that directory (polled every ``INGEST_POLL_SECONDS``).
+
+    Args:
+        app: Flask application instance
+        db_connection: Database connection with the snapshot attached read-write
+        start_tailer: Whether to start the directory tailer if one is configured
+        serve_read_only: Whether the snapshot is attached read-only; appends
+            are then rejected and no tailer is started
+    """
+    global appender, tailer, read_only
+
+    appender = PostAppender(db_connection)
+    read_only = serve_read_only
+
+    watch_dir = None if read_only else os.getenv('INGEST_WATCH_DIR')
+    if watch_dir:
+        tailer = DirectoryTailer(appender, watch_dir, interval=float(os.getenv('INGEST_POLL_SECONDS', 30)))
+        if start_tailer:
+            tailer.start()
+
+    app.register_blueprint(ingest_bp)
+
+    logger.info(f"Ingest module initialized (watching: {watch_dir or 'nothing'})")
+
+
+def start_tailer():
+    """Start the configured directory tailer, e.g. once the startup load has finished."""
+    if tailer:
+        tailer.start()
+
+
+def _is_authorized() -> bool:
+    """Check the admin token; admin routes are disabled when ``ADMIN_TOKEN`` is unset."""
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+
+@ingest_bp.route('/ingest', methods=['POST'])
+def ingest_batch():
+    """Append a batch of posts to the dataset.
+
+    Request body: newline-delimited Reddit JSON records (``{"kind": ..., "data": {...}}``)
+
+    Headers:
+    - X-Admin-Token: must match the ``ADMIN_TOKEN`` environment variable
+    - Content-Encoding: optional, ``gzip`` or ``zstd`` for a compressed body
+
+    Returns:
+        JSON with the number of rows appended and the new dataset version
+    """
+    try:
+        if not _is_authorized():
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if read_only:
+            return jsonify({"error": "The dataset is served read-only; rebuild the snapshot with python -m ingest.snapshot"}), 409
+
+        compression = request.headers.get('Content-Encoding', '').lower() or None
+        if compression not in (None, 'identity', 'gzip', 'zstd'):
+            return jsonify({"error": f"Unsupported Content-Encoding: {compression}"}), 400
+
+        payload = request.get_data()
+        if not payload or not payload.strip():
+            return jsonify({"error": "Request body must contain JSONL records"}), 400
+
+        if not appender:
+            return jsonify({"error": "Ingest module not initialized"}), 500
+
+        result = appender.append_lines(payload, source=request.args.get('source', 'api'), compression=compression)
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Error ingesting batch: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@ingest_bp.route('/ingest/status', methods=['GET'])
+def ingest_status():
+    """Report the dataset version and the state of the directory tailer."""
+    if not _is_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    load_metrics = None
+    if appender:
+        load_metrics = appender.load_metrics()
+
+    return jsonify({
+        "dataset_version": current_version(),
+        "read_only": read_only,
+        "load_metrics": load_metrics,
+        "tailer": {
+            "directory": tailer.directory,
+            "interval": tailer.interval,
+            "last_scan": tailer.last_scan
+        } if tailer else None
+    })
@@ -0,0 +1,486 @@
+"""Typed, columnar layout of the posts table built at ingest time."""
+
+import json
+from typing import List, Optional, Tuple
+
+POSTS_TABLE = 'posts'
+
+# Fields of the raw ``data`` object the API uses. Records are parsed straight
+# into this STRUCT, so every other field of a Reddit dump is skipped while
+# parsing instead of being materialized and thrown away later.
+RAW_DATA_FIELDS: List[Tuple[str, str]] = [
+    ('id', 'VARCHAR'),
+    ('subreddit', 'VARCHAR'),
+    ('author', 'VARCHAR'),
+    ('title', 'VARCHAR'),
+    ('selftext', 'VARCHAR'),
+    ('created_utc', 'DOUBLE'),
+    ('score', 'DOUBLE'),
+    ('num_comments', 'DOUBLE'),
+    ('permalink', 'VARCHAR'),
+    ('url', 'VARCHAR'),
+    ('upvote_ratio', 'DOUBLE'),
+    ('domain', 'VARCHAR'),
+]
+
+# (column, DuckDB type, expression that extracts it from a raw {"kind", "data"} record)
+POSTS_COLUMNS: List[Tuple[str, str, str]] = [
+    ('kind', 'VARCHAR', "kind"),
+    ('id', 'VARCHAR', "data.id"),
+    ('subreddit', 'VARCHAR', "data.subreddit"),
+    ('author', 'VARCHAR', "data.author"),
+    ('title', 'VARCHAR', "data.title"),
+    ('selftext', 'VARCHAR', "data.selftext"),
+    ('created_utc', 'BIGINT', "TRY_CAST(data.created_utc AS BIGINT)"),
+    ('score', 'INTEGER', "TRY_CAST(data.score AS INTEGER)"),
+    ('num_comments', 'INTEGER', "TRY_CAST(data.num_comments AS INTEGER)"),
+    ('permalink', 'VARCHAR', "data.permalink"),
+    ('url', 'VARCHAR', "data.url"),
+    ('upvote_ratio', 'FLOAT', "TRY_CAST(data.upvote_ratio AS FLOAT)"),
+    ('domain', 'VARCHAR', "data.domain"),
+]
+
+# Every post is stored once, keyed by its Reddit id
+POSTS_KEY = 'id'
+
+# Metrics that change between crawls of the same post; re-ingesting a post
+# updates these in place and leaves every other column as first seen
+ENGAGEMENT_COLUMNS = ['score', 'num_comments', 'upvote_ratio']
+
+# Case-insensitive string columns that are dictionary-encoded at ingest. Each
+# gets a dimension table mapping a small integer id to the lowercased key
+# (what filters match on) and the first spelling seen (what is displayed),
+# and posts store the id next to the original string
+DIMENSIONS = ['subreddit', 'author', 'domain']
+
+# Time columns derived from created_utc once at ingest, so queries group and
+# filter on stored values instead of re-truncating the epoch for every row
+TIME_COLUMNS: List[Tuple[str, str, str]] = [
+    ('ts', 'TIMESTAMP', "TIMESTAMP 'epoch' + created_utc * INTERVAL '1 second'"),
+    ('hour_bucket', 'TIMESTAMP', "DATE_TRUNC('hour', TIMESTAMP 'epoch' + created_utc * INTERVAL '1 second')"),
+    ('day_bucket', 'TIMESTAMP', "DATE_TRUNC('day', TIMESTAMP 'epoch' + created_utc * INTERVAL '1 second')"),
+    ('week_bucket', 'TIMESTAMP', "DATE_TRUNC('week', TIMESTAMP 'epoch' + created_utc * INTERVAL '1 second')"),
+    ('month_bucket', 'TIMESTAMP', "DATE_TRUNC('month', TIMESTAMP 'epoch' + created_utc * INTERVAL '1 second')"),
+    ('hour_of_day', 'TINYINT', "CAST(EXTRACT(hour FROM TIMESTAMP 'epoch' + created_utc * INTERVAL '1 second') AS TINYINT)"),
+    ('day_of_week', 'TINYINT', "CAST(EXTRACT(dow FROM TIMESTAMP 'epoch' + created_utc * INTERVAL '1 second') AS TINYINT)"),
+]
+
+# Inverted index of the words of every post's title and selftext: one
+# (term, post_id) row per distinct word of a post with the number of times it
+# occurs in each field and the post's field lengths (so relevance ranking
+# never joins another table), stored sorted by term so zone maps narrow a
+# term lookup to the few row groups holding its postings
+TERMS_TABLE = 'post_terms'
+
+# Number of words in each post's title and selftext, for corpus-wide averages
+LENGTHS_TABLE = 'post_lengths'
+
+# Words are maximal runs of letters and digits, lowercased; the query side
+# (``query.fulltext``) splits keywords the same way
+TERM_SPLIT_PATTERN = r'[^\pL\pN]+'
+
+# Longer "words" (URLs, hashes, base64) are left out of the index
+MAX_TERM_LENGTH = 64
+
+# Optional index of the character trigrams of every post's lowercased title
+# and selftext: one (trigram, post_id) row per distinct trigram of a post. It
+# narrows substring keyword matches down to the posts holding every trigram
+# of the keyword before the exact LIKE runs on them
+TRIGRAMS_TABLE = 'post_trigrams'
+
+# Intervals accepted by the API, each backed by a precomputed bucket column
+TIME_BUCKETS = {
+    'hour': 'hour_bucket',
+    'day': 'day_bucket',
+    'week': 'week_bucket',
+    'month': 'month_bucket',
+}
+
+
+def raw_struct_type() -> str:
+    """Return the DuckDB STRUCT type of the projected ``data`` object."""
+    fields = ", ".join(f"{name} {field_type}" for name, field_type in RAW_DATA_FIELDS)
+    return f"STRUCT({fields})"
+
+
+def raw_json_structure() -> str:
+    """Return the projected record layout in ``json_transform`` notation."""
+    return json.dumps({"kind": "VARCHAR", "data": dict(RAW_DATA_FIELDS)})
+
+
+def raw_source_sql(path: str) -> str:
+    """Build the table function that reads raw Reddit records from JSONL.
+
+    ``data`` is read with an explicit, projected STRUCT type rather than
+    letting DuckDB infer one, so every batch yields the same shape regardless
+    of which fields it happens to contain. Malformed lines are skipped.
+    """
+    return (
+        f"read_json('{path}', format='auto', ignore_errors=true, "
+        f"columns={{'kind': 'VARCHAR', 'data': '{raw_struct_type()}'}})"
+    )
+
+
+def raw_lines_source_sql(lines_table: str, column: str = 'line') -> str:
+    """Build a subquery that parses raw JSONL lines held in a table or frame.
+
+    Lines that are not valid JSON are skipped rather than failing the batch.
+
+    Args:
+        lines_table: Table, view or registered frame with one JSON document per row
+        column: Name of the column holding the raw lines
+    """
+    structure = raw_json_structure().replace("'", "''")
+    return f"""(
+                SELECT record.kind AS kind, record.data AS data
+                FROM (
+                    SELECT json_transform({column}, '{structure}') AS record
+                    FROM {lines_table}
+                    WHERE json_valid({column})
+                )
+            )"""
+
+
+def qualified(name: str, catalog: Optional[str] = None) -> str:
+    """Prefix a table name with the catalog it lives in, if any."""
+    return f"{catalog}.{name}" if catalog else name
+
+
+def dimension_table(dimension: str) -> str:
+    """Return the name of the dimension table of ``subreddit``/``author``/``domain``."""
+    return f"{dimension}_dim"
+
+
+def dimension_id_column(dimension: str) -> str:
+    """Return the name of the posts column holding a dimension's integer id."""
+    return f"{dimension}_id"
+
+
+def posts_column_names() -> List[str]:
+    """Return the names of the posts table columns in order."""
+    return [name for name, _, _ in POSTS_COLUMNS + TIME_COLUMNS] + [dimension_id_column(d) for d in DIMENSIONS]
+
+
+def posts_projection_sql(source: str) -> str:
+    """Build a SELECT that turns raw Reddit records into typed posts rows.
+
+    Rows come out ordered by ``created_utc`` so each row group of the posts
+    table covers a narrow time range and DuckDB's min/max zone maps can skip
+    row groups outside a date filter. Records without an id are dropped, and
+    a post crawled more than once in the same batch is kept once: the copy
+    with the most comments, i.e. the latest crawl.
+
+    Args:
+        source: Table, view or table function producing raw ``kind``/``data`` records
+
+    Returns:
+        SQL selecting the typed posts columns from ``source``
+    """
+    projections = ",\n                    ".join(f"{expression} AS {name}" for name, _, expression in POSTS_COLUMNS)
+    derived = ",\n                ".join(f"{expression} AS {name}" for name, _, expression in TIME_COLUMNS)
+    return f"""
+            SELECT
+                *,
+                {derived}
+            FROM (
+                SELECT
+                    {projections}
+                FROM {source}
+                WHERE data IS NOT NULL AND data.id IS NOT NULL
+            )
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY {POSTS_KEY}
+                ORDER BY num_comments DESC NULLS LAST, score DESC NULLS LAST
+            ) = 1
+            ORDER BY created_utc
+    """
+
+
+def create_posts_table_sql(table: str = POSTS_TABLE) -> str:
+    """Build the DDL of an empty, typed posts table.
+
+    The primary key on the post id is backed by an index that upserts probe
+    to find re-crawled posts, see ``posts_upsert_sql``.
+    """
+    columns = [f"{name} {column_type}" for name, column_type, _ in POSTS_COLUMNS + TIME_COLUMNS]
+    columns += [f"{dimension_id_column(dimension)} INTEGER" for dimension in DIMENSIONS]
+    columns = ",\n                ".join(columns)
+    return f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {columns},
+                PRIMARY KEY ({POSTS_KEY})
+            )
+    """
+
+
+def create_dimension_table_sql(dimension: str) -> str:
+    """Build the DDL of an empty dimension table."""
+    return f"""
+            CREATE TABLE IF NOT EXISTS {dimension_table(dimension)} (
+                id INTEGER PRIMARY KEY,
+                key VARCHAR UNIQUE,
+                name VARCHAR
+            )
+    """
+
+
+def create_terms_table_sql() -> str:
+    """Build the DDL of the empty inverted index, see ``TERMS_TABLE``."""
+    return f"""
+            CREATE TABLE IF NOT EXISTS {TERMS_TABLE} (
+                term VARCHAR,
+                post_id VARCHAR,
+                title_tf USMALLINT,
+                body_tf USMALLINT,
+                title_length USMALLINT,
+                body_length UINTEGER
+            )
+    """
+
+
+def create_lengths_table_sql() -> str:
+    """Build the DDL of the empty document lengths table, see ``LENGTHS_TABLE``."""
+    return f"""
+            CREATE TABLE IF NOT EXISTS {LENGTHS_TABLE} (
+                post_id VARCHAR,
+                title_length USMALLINT,
+                body_length UINTEGER
+            )
+    """
+
+
+def _new_posts_words_sql(staged_table: str, catalog: Optional[str]) -> str:
+    # Title and selftext words of the batch's posts that are not stored yet, with their counts
+    return f"""
+                SELECT
+                    post_id, title_words, body_words,
+                    LENGTH(list_filter(title_words, word -> word <> '')) AS title_length,
+                    LENGTH(list_filter(body_words, word -> word <> '')) AS body_length
+                FROM (
+                    SELECT
+                        id AS post_id,
+                        regexp_split_to_array(LOWER(COALESCE(title, '')), '{TERM_SPLIT_PATTERN}') AS title_words,
+                        regexp_split_to_array(LOWER(COALESCE(selftext, '')), '{TERM_SPLIT_PATTERN}') AS body_words
+                    FROM {staged_table}
+                    WHERE id NOT IN (SELECT {POSTS_KEY} FROM {qualified(POSTS_TABLE, catalog)})
+                )
+    """
+
+
+def index_terms_sql(staged_table: str, catalog: Optional[str] = None) -> str:
+    """Build an INSERT adding the words of a batch's new posts to the inverted index.
+
+    Must run before the batch is upserted, in the same transaction:
+    re-crawled posts only get their engagement metrics updated, never their
+    text, so only posts not stored yet need indexing, and the index has no key
+    that would stop a batch retried after a partial commit from indexing its
+    posts twice (see ``ingest.upsert.upsert_posts``).
+
+    Args:
+        staged_table: Table holding the typed posts rows of the batch
+        catalog: Catalog the posts and terms tables live in
+
+    Returns:
+        SQL of the insert
+    """
+    return f"""
+            INSERT INTO {qualified(TERMS_TABLE, catalog)}
+            WITH new_posts AS ({_new_posts_words_sql(staged_table, catalog)})
+            SELECT term, post_id, SUM(in_title), SUM(1 - in_title), ANY_VALUE(title_length), ANY_VALUE(body_length)
+            FROM (
+                SELECT post_id, UNNEST(title_words) AS term, 1 AS in_title, title_length, body_length
+                FROM new_posts
+                UNION ALL
+                SELECT post_id, UNNEST(body_words) AS term, 0 AS in_title, title_length, body_length
+                FROM new_posts
+            )
+            WHERE term <> '' AND LENGTH(term) <= {MAX_TERM_LENGTH}
+            GROUP BY term, post_id
+            ORDER BY term, post_id
+    """
+
+
+def index_lengths_sql(staged_table: str, catalog: Optional[str] = None) -> str:
+    """Build an INSERT recording the title and selftext word counts of a batch's new posts.
+
+    Like ``index_terms_sql`` it must run before the batch is upserted, in the same transaction.
+
+    Args:
+        staged_table: Table holding the typed posts rows of the batch
+        catalog: Catalog the posts and lengths tables live in
+
+    Returns:
+        SQL of the insert
+    """
+    return f"""
+            INSERT INTO {qualified(LENGTHS_TABLE, catalog)}
+            SELECT post_id, title_length, body_length
+            FROM ({_new_posts_words_sql(staged_table, catalog)})
+    """
+
+
+def create_trigrams_table_sql() -> str:
+    """Build the DDL of the empty trigram index, see ``TRIGRAMS_TABLE``."""
+    return f"""
+            CREATE TABLE IF NOT EXISTS {TRIGRAMS_TABLE} (
+                trigram VARCHAR,
+                post_id VARCHAR
+            )
+    """
+
+
+def index_trigrams_sql(staged_table: str, catalog: Optional[str] = None) -> str:
+    """Build an INSERT adding the trigrams of a batch's new posts to the trigram index.
+
+    Like ``index_terms_sql`` it must run before the batch is upserted, in the
+    same transaction. Title and selftext are joined by a newline and trigrams
+    spanning it are dropped, so each post stores exactly the trigrams of its
+    two fields.
+
+    Args:
+        staged_table: Table holding the typed posts rows of the batch
+        catalog: Catalog the posts and trigram tables live in
+
+    Returns:
+        SQL of the insert
+    """
+    return f"""
+            INSERT INTO {qualified(TRIGRAMS_TABLE, catalog)}
+            SELECT DISTINCT trigram, post_id
+            FROM (
+                SELECT
+                    post_id,
+                    UNNEST(list_transform(range(1, LENGTH(text) - 1), i -> substring(text, i, 3))) AS trigram
+                FROM (
+                    SELECT id AS post_id, LOWER(COALESCE(title, '') || chr(10) || COALESCE(selftext, '')) AS text
+                    FROM {staged_table}
+                    WHERE id NOT IN (SELECT {POSTS_KEY} FROM {qualified(POSTS_TABLE, catalog)})
+                )
+            )
+            WHERE NOT contains(trigram, chr(10))
+            ORDER BY trigram, post_id
+    """
+
+
+def trigrams_view_sql(catalog: str) -> str:
+    """Build a view exposing the trigram index of an attached catalog to the API's queries."""
+    return f"""
+        CREATE OR REPLACE VIEW {TRIGRAMS_TABLE} AS
+        SELECT trigram, post_id
+        FROM {qualified(TRIGRAMS_TABLE, catalog)};
+    """
+
+
+def has_table(db_connection, table: str, catalog: Optional[str] = None) -> bool:
+    """Tell whether a table exists in a catalog (the connection's default one if ``None``)."""
+    database = "current_database()" if catalog is None else "?"
+    params = [table] if catalog is None else [table, catalog]
+    return db_connection.execute(
+        f"SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ? AND database_name = {database}", params
+    ).fetchone()[0] > 0
+
+
+def register_dimension_sql(dimension: str, staged_table: str, catalog: Optional[str] = None) -> str:
+    """Build an INSERT assigning ids to the dimension values first seen in a batch.
+
+    A new key is displayed with its spelling in the batch's earliest post
+    (ties broken alphabetically); keys already registered keep theirs.
+
+    Args:
+        dimension: ``subreddit``, ``author`` or ``domain``
+        staged_table: Table holding the typed posts rows of the batch
+        catalog: Catalog the dimension table lives in
+
+    Returns:
+        SQL adding the batch's new lowercase keys with consecutive ids
+    """
+    table = qualified(dimension_table(dimension), catalog)
+    return f"""
+            INSERT INTO {table}
+            SELECT
+                (SELECT COALESCE(MAX(id), 0) FROM {table}) + ROW_NUMBER() OVER (ORDER BY batch.key),
+                batch.key,
+                batch.name
+            FROM (
+                SELECT LOWER({dimension}) AS key, FIRST({dimension} ORDER BY created_utc, {dimension}) AS name
+                FROM {staged_table}
+                WHERE {dimension} IS NOT NULL
+                GROUP BY key
+            ) AS batch
+            WHERE NOT EXISTS (SELECT 1 FROM {table} AS existing WHERE existing.key = batch.key)
+    """
+
+
+def posts_upsert_sql(staged_table: str, catalog: Optional[str] = None) -> str:
+    """Build an INSERT that adds new posts and refreshes re-crawled ones.
+
+    The staged rows get their dimension ids from the dimension tables, so
+    the batch's new values must have been registered first (see
+    ``register_dimension_sql``). Posts whose id is already stored only get
+    their engagement metrics updated, so ingesting the same post twice never
+    duplicates it. The staged rows must not repeat an id, which
+    ``posts_projection_sql`` guarantees.
+
+    Args:
+        staged_table: Table holding the typed posts rows of the batch
+        catalog: Catalog the posts and dimension tables live in
+
+    Returns:
+        SQL of the upsert; executing it returns the number of rows inserted or updated
+    """
+    ids = ", ".join(f"{dimension}_dim.id" for dimension in DIMENSIONS)
+    joins = "\n            ".join(
+        f"LEFT JOIN {qualified(dimension_table(dimension), catalog)} AS {dimension}_dim "
+        f"ON {dimension}_dim.key = LOWER(staged.{dimension})"
+        for dimension in DIMENSIONS
+    )
+    updates = ", ".join(f"{name} = EXCLUDED.{name}" for name in ENGAGEMENT_COLUMNS)
+    return f"""
+            INSERT INTO {qualified(POSTS_TABLE, catalog)}
+            SELECT staged.*, {ids}
+            FROM {staged_table} AS staged
+            {joins}
+            ORDER BY staged.created_utc
+            ON CONFLICT ({POSTS_KEY}) DO UPDATE SET {updates}
+    """
+
+
+def dimension_view_sql(dimension: str, catalog: str) -> str:
+    """Build a view exposing a dimension table of an attached catalog to the API's queries."""
+    return f"""
+        CREATE OR REPLACE VIEW {dimension_table(dimension)} AS
+        SELECT id, key, name
+        FROM {qualified(dimension_table(dimension), catalog)};
+    """
+
+
+def terms_view_sql(catalog: str) -> str:
+    """Build a view exposing the inverted index of an attached catalog to the API's queries."""
+    return f"""
+        CREATE OR REPLACE VIEW {TERMS_TABLE} AS
+        SELECT term, post_id, title_tf, body_tf, title_length, body_length
+        FROM {qualified(TERMS_TABLE, catalog)};
+    """
+
+
+def lengths_view_sql(catalog: str) -> str:
+    """Build a view exposing the document lengths of an attached catalog to the API's queries."""
+    return f"""
+        CREATE OR REPLACE VIEW {LENGTHS_TABLE} AS
+        SELECT post_id, title_length, body_length
+        FROM {qualified(LENGTHS_TABLE, catalog)};
+    """
+
+
+def posts_view_sql(source_table: str, view: str = 'reddit_posts_view') -> str:
+    """Build the ``reddit_posts_view`` the API queries on top of the typed table.
+
+    The view is a plain projection, so DuckDB pushes column pruning and
+    filters straight down into the underlying table scan.
+    """
+    columns = ", ".join(posts_column_names())
+    return f"""
+        CREATE OR REPLACE VIEW {view} AS
+        SELECT {columns}
+        FROM {source_table};
+    """
@@ -0,0 +1,478 @@
+"""On-disk DuckDB snapshot of the Reddit dataset.
+
+Parsing the raw JSONL with ``read_json_auto`` is the slowest part of boot. The
+snapshot stores the parsed table in a DuckDB database file keyed by a
+fingerprint of the source files, so a restart only has to ATTACH the file and
+the JSON is parsed again only when the sources change. When a partitioned
+dataset only gained new files, just those partitions are loaded into the
+existing snapshot.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+from .schema import (
+    DIMENSIONS, POSTS_TABLE, create_dimension_table_sql, create_lengths_table_sql, create_posts_table_sql,
+    create_terms_table_sql, create_trigrams_table_sql, posts_projection_sql
+)
+from .progress import ATTACHING, BUILDING, DISCOVERING, EXTENDING, load_progress
+from .sources import SourceFile, dataset_root, discover_sources, source_sql
+from .streaming import LoadMetrics, StreamingLoader
+from .upsert import upsert_posts
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Bump this whenever the layout of the snapshot changes so old files get rebuilt
+SNAPSHOT_FORMAT_VERSION = 10
+
+SNAPSHOT_FILENAME = 'reddit_posts.duckdb'
+SNAPSHOT_ALIAS = 'snapshot'
+META_TABLE = 'snapshot_meta'
+INGEST_LOG_TABLE = 'ingest_log'
+PARTITIONS_TABLE = 'partitions'
+PARTITION_STAGING_TABLE = 'staged_partition'
+
+# Sources larger than this are loaded with the bounded-memory streaming loader
+DEFAULT_STREAMING_THRESHOLD_MB = 256
+
+
+def trigram_index_enabled() -> bool:
+    """Tell whether snapshots get the optional trigram index (``INGEST_TRIGRAMS=1``)."""
+    return os.getenv('INGEST_TRIGRAMS', '0').lower() in ('1', 'true', 'yes')
+
+
+def dataset_fingerprint(sources: List[SourceFile]) -> str:
+    """Combine the fingerprints of every source file into one dataset fingerprint."""
+    digest = hashlib.sha1(str(SNAPSHOT_FORMAT_VERSION).encode('utf-8'))
+    if trigram_index_enabled():
+        # Turning the trigram index on or off rebuilds the snapshot
+        digest.update(b':trigrams')
+    for source in sources:
+        digest.update(f"{os.path.abspath(source.path)}:{source.fingerprint()}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def default_snapshot_path(data_path: str) -> str:
+    """Return where the snapshot for ``data_path`` should live.
+
+    ``SNAPSHOT_PATH`` overrides the default of a file next to the source
+    (or inside the dataset directory).
+    """
+    return os.getenv('SNAPSHOT_PATH') or os.path.join(dataset_root(data_path), SNAPSHOT_FILENAME)
+
+
+def read_snapshot_meta(snapshot_path: str) -> dict:
+    """Read the metadata table of an existing snapshot.
+
+    Args:
+        snapshot_path: Path to the snapshot database file
+
+    Returns:
+        Dictionary of metadata values, empty if the snapshot is missing or unreadable
+    """
+    if not os.path.exists(snapshot_path):
+        return {}
+
+    try:
+        snapshot_con = duckdb.connect(snapshot_path, read_only=True)
+        try:
+            rows = snapshot_con.execute(f"SELECT key, value FROM {META_TABLE}").fetchall()
+        finally:
+            snapshot_con.close()
+        return {key: value for key, value in rows}
+    except Exception as e:
+        logger.warning(f"Could not read snapshot metadata from {snapshot_path}: {str(e)}")
+        return {}
+
+
+def next_build_version(snapshot_path: str) -> int:
+    """Return the dataset version of a snapshot about to be (re)built at ``snapshot_path``.
+
+    Responses are cached and tagged by dataset version alone, so a rebuild must
+    never reuse a version an earlier build of the dataset served. The version
+    carries on from the snapshot being replaced and is at least the current
+    Unix time, which keeps it increasing even when the old file is gone.
+    """
+    previous = read_snapshot_meta(snapshot_path).get('dataset_version')
+    version = int(time.time())
+    if previous is not None and previous.isdigit():
+        version = max(version, int(previous) + 1)
+    return version
+
+
+def read_snapshot_partitions(snapshot_path: str) -> Dict[str, str]:
+    """Return the partition manifest of a snapshot as ``{source path: fingerprint}``."""
+    try:
+        snapshot_con = duckdb.connect(snapshot_path, read_only=True)
+        try:
+            rows = snapshot_con.execute(f"SELECT source, fingerprint FROM {PARTITIONS_TABLE}").fetchall()
+        finally:
+            snapshot_con.close()
+        return {source: fingerprint for source, fingerprint in rows}
+    except Exception as e:
+        logger.warning(f"Could not read snapshot partitions from {snapshot_path}: {str(e)}")
+        return {}
+
+
+def use_streaming(data_path: str) -> bool:
+    """Decide whether ``data_path`` should be loaded with the streaming loader.
+
+    ``INGEST_STREAMING=1``/``0`` forces the choice; otherwise sources larger
+    than ``INGEST_STREAMING_THRESHOLD_MB`` are streamed.
+    """
+    forced = os.getenv('INGEST_STREAMING')
+    if forced is not None:
+        return forced.lower() in ('1', 'true', 'yes')
+    threshold_mb = float(os.getenv('INGEST_STREAMING_THRESHOLD_MB', DEFAULT_STREAMING_THRESHOLD_MB))
+    return os.path.getsize(data_path) > threshold_mb * 1024 * 1024
+
+
+def default_workers() -> int:
+    """Return the number of files loaded concurrently (``INGEST_WORKERS``, default: one per core)."""
+    return max(1, int(os.getenv('INGEST_WORKERS', os.cpu_count() or 1)))
+
+
+def _record_partition(cursor, source: SourceFile, rows: int, min_created: Optional[int], max_created: Optional[int]):
+    cursor.execute(f"INSERT INTO {PARTITIONS_TABLE} VALUES (?, ?, ?, ?, ?, ?)", [
+        os.path.abspath(source.path), source.fingerprint(), source.partition, rows, min_created, max_created
+    ])
+
+
+def _stream_partition(cursor, source: SourceFile) -> LoadMetrics:
+    """Load a large JSONL file in bounded-memory batches.
+
+    Batches commit one by one so memory stays bounded by the batch size, each
+    in a transaction of its own so its index rows never outlive its posts. The
+    manifest row is only written once the whole file is in, and batches are
+    upserts, so a file interrupted half way is simply loaded again.
+    """
+    metrics = StreamingLoader.from_env(cursor).load(source.path)
+
+    # Rows of the file as upserted, re-crawled posts included, and the created_utc range of all of them
+    _record_partition(cursor, source, metrics.rows, metrics.min_created_utc, metrics.max_created_utc)
+    return metrics
+
+
+def _staged_partition(cursor, source: SourceFile, commit_lock: threading.Lock) -> LoadMetrics:
+    """Decompress and parse a file into a connection-local staging table, then append it.
+
+    The parse is the expensive part and runs concurrently on every worker;
+    only the append of the already typed rows is serialized by ``commit_lock``.
+    """
+    metrics = LoadMetrics(source=os.path.abspath(source.path), bytes=os.path.getsize(source.path))
+    start_time = time.time()
+
+    cursor.execute(f"CREATE OR REPLACE TEMP TABLE {PARTITION_STAGING_TABLE} AS {posts_projection_sql(source_sql(source, cursor))}")
+    try:
+        rows, min_created, max_created = cursor.execute(f"""
+            SELECT COUNT(*), MIN(created_utc), MAX(created_utc)
+            FROM {PARTITION_STAGING_TABLE}
+        """).fetchone()
+
+        with commit_lock:
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                upsert_posts(cursor, PARTITION_STAGING_TABLE)
+                _record_partition(cursor, source, rows, min_created, max_created)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {PARTITION_STAGING_TABLE}")
+
+    metrics.rows = rows
+    metrics.include_created(min_created, max_created)
+    metrics.batches = 1
+    metrics.finish(time.time() - start_time)
+    load_progress.advance(rows=rows, bytes_loaded=metrics.bytes)
+    logger.info(f"Loaded {rows} posts from {source.path} ({metrics.rows_per_sec} rows/s, {metrics.mb_per_sec} MB/s)")
+    return metrics
+
+
+def load_partitions(con, sources: List[SourceFile], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Load source files into the posts table and record them in the manifest.
+
+    Compressed inputs are read directly: DuckDB's JSON reader decompresses
+    gzip/zstd itself and the streaming loader wraps a decompressing stream.
+    Files above the streaming threshold are loaded one at a time to keep the
+    memory bound; the rest are spread over a pool of ``workers`` threads,
+    each parsing on its own cursor so decompression of several files runs
+    on several cores. Posts are upserted by id, so files that overlap (or a
+    file loaded again after an interrupted run) never duplicate a post.
+
+    Args:
+        con: Connection to the snapshot being built or extended
+        sources: Source files to load
+        workers: Number of files parsed concurrently, see ``default_workers``
+
+    Returns:
+        Per-file load metrics (rows/s and MB/s) in source order
+    """
+    workers = workers or default_workers()
+    streamed = [source for source in sources if source.format == 'jsonl' and use_streaming(source.path)]
+    staged = [source for source in sources if source not in streamed]
+    metrics: Dict[str, LoadMetrics] = {}
+
+    for source in streamed:
+        metrics[source.path] = _stream_partition(con, source)
+
+    commit_lock = threading.Lock()
+
+    def load(source: SourceFile) -> LoadMetrics:
+        cursor = con.cursor()
+        try:
+            return _staged_partition(cursor, source, commit_lock)
+        finally:
+            cursor.close()
+
+    start_time = time.time()
+    if workers > 1 and len(staged) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(staged)), thread_name_prefix='ingest') as pool:
+            for source, result in zip(staged, pool.map(load, staged)):
+                metrics[source.path] = result
+    else:
+        for source in staged:
+            metrics[source.path] = load(source)
+
+    if staged:
+        elapsed = time.time() - start_time
+        total_rows = sum(metrics[source.path].rows for source in staged)
+        total_mb = sum(metrics[source.path].bytes for source in staged) / (1024 * 1024)
+        logger.info(
+            f"Loaded {len(staged)} file(s) with {min(workers, len(staged))} worker(s) in {elapsed:.2f}s "
+            f"({total_rows / max(elapsed, 1e-9):.0f} rows/s, {total_mb / max(elapsed, 1e-9):.1f} MB/s)"
+        )
+
+    return [metrics[source.path].to_dict() for source in sources]
+
+
+def build_snapshot(sources: List[SourceFile], snapshot_path: str, fingerprint: str) -> int:
+    """Parse the source files once and write them to a snapshot file.
+
+    Only the typed ``posts`` table is stored; the raw JSON structs are
+    projected away during ingest. Files are loaded in partition order so the
+    table stays clustered by time. The snapshot is written to a temporary file
+    and moved into place, so a crash half way through never leaves a
+    truncated snapshot behind.
+
+    Args:
+        sources: Source files of the dataset
+        snapshot_path: Destination of the snapshot database file
+        fingerprint: Fingerprint of the sources the snapshot is built from
+
+    Returns:
+        Number of posts written to the snapshot
+    """
+    tmp_path = f"{snapshot_path}.tmp"
+    version = next_build_version(snapshot_path)
+    for path in (tmp_path, f"{tmp_path}.wal"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    logger.info(f"Building snapshot {snapshot_path} from {len(sources)} source file(s)...")
+    build_con = duckdb.connect(tmp_path)
+    try:
+        build_con.execute(create_posts_table_sql())
+        for dimension in DIMENSIONS:
+            build_con.execute(create_dimension_table_sql(dimension))
+        build_con.execute(create_terms_table_sql())
+        build_con.execute(create_lengths_table_sql())
+        if trigram_index_enabled():
+            build_con.execute(create_trigrams_table_sql())
+
+        # One row per loaded source file, used to extend the snapshot when
+        # only new partitions were added
+        build_con.execute(f"""
+            CREATE TABLE {PARTITIONS_TABLE} (
+                source VARCHAR,
+                fingerprint VARCHAR,
+                partition_day DATE,
+                rows BIGINT,
+                min_created_utc BIGINT,
+                max_created_utc BIGINT
+            )
+        """)
+
+        load_metrics = load_partitions(build_con, sources)
+        total_posts = build_con.execute(f"SELECT COUNT(*) FROM {POSTS_TABLE}").fetchone()[0]
+
+        build_con.execute(f"CREATE TABLE {META_TABLE} (key VARCHAR PRIMARY KEY, value VARCHAR)")
+        build_con.executemany(f"INSERT INTO {META_TABLE} VALUES (?, ?)", [
+            ('fingerprint', fingerprint),
+            ('source_path', os.path.abspath(sources[0].path) if len(sources) == 1 else dataset_root(sources[0].path)),
+            ('format_version', str(SNAPSHOT_FORMAT_VERSION)),
+            ('row_count', str(total_posts)),
+            ('built_at', datetime.now(timezone.utc).isoformat()),
+            ('dataset_version', str(version)),
+            ('load_metrics', json.dumps(load_metrics)),
+            ('trigram_index', '1' if trigram_index_enabled() else '0'),
+        ])
+
+        # Every later append is recorded here so tailers never ingest a batch twice
+        build_con.execute(f"""
+            CREATE TABLE {INGEST_LOG_TABLE} (
+                source VARCHAR,
+                fingerprint VARCHAR,
+                rows BIGINT,
+                dataset_version BIGINT,
+                ingested_at TIMESTAMP
+            )
+        """)
+        build_con.execute("CHECKPOINT")
+    finally:
+        build_con.close()
+
+    os.replace(tmp_path, snapshot_path)
+    logger.info(f"Snapshot built with {total_posts} posts")
+    return total_posts
+
+
+def extend_snapshot(new_sources: List[SourceFile], snapshot_path: str, fingerprint: str) -> int:
+    """Load newly added partitions into an existing snapshot.
+
+    Args:
+        new_sources: Source files not yet in the snapshot
+        snapshot_path: Path to the snapshot database file
+        fingerprint: Fingerprint of the full, extended set of sources
+
+    Returns:
+        Number of posts in the snapshot afterwards
+    """
+    logger.info(f"Adding {len(new_sources)} new partition(s) to snapshot {snapshot_path}...")
+    snapshot_con = duckdb.connect(snapshot_path)
+    try:
+        # Each partition commits together with its manifest row, so a load
+        # interrupted here resumes with the partitions still missing
+        load_metrics = load_partitions(snapshot_con, new_sources)
+
+        snapshot_con.execute("BEGIN TRANSACTION")
+        try:
+            total_posts = snapshot_con.execute(f"SELECT COUNT(*) FROM {POSTS_TABLE}").fetchone()[0]
+            version = int(snapshot_con.execute(
+                f"SELECT value FROM {META_TABLE} WHERE key = 'dataset_version'"
+            ).fetchone()[0]) + 1
+            for key, value in [('fingerprint', fingerprint), ('row_count', str(total_posts)),
+                               ('dataset_version', str(version)), ('load_metrics', json.dumps(load_metrics))]:
+                snapshot_con.execute(f"UPDATE {META_TABLE} SET value = ? WHERE key = ?", [value, key])
+            snapshot_con.execute("COMMIT")
+        except Exception:
+            snapshot_con.execute("ROLLBACK")
+            raise
+        snapshot_con.execute("CHECKPOINT")
+    finally:
+        snapshot_con.close()
+
+    logger.info(f"Snapshot extended to {total_posts} posts")
+    return total_posts
+
+
+def ensure_snapshot(data_path: str, snapshot_path: Optional[str] = None) -> str:
+    """Make sure an up-to-date snapshot exists for a dataset.
+
+    Args:
+        data_path: Path to a JSONL/Parquet file, a directory of daily files or a glob
+        snapshot_path: Optional snapshot location, see ``default_snapshot_path``
+
+    Returns:
+        Path of the snapshot database file
+    """
+    load_progress.set_phase(DISCOVERING)
+    snapshot_path = snapshot_path or default_snapshot_path(data_path)
+    sources = discover_sources(data_path)
+    fingerprint = dataset_fingerprint(sources)
+
+    meta = read_snapshot_meta(snapshot_path)
+    if meta.get('fingerprint') == fingerprint:
+        load_progress.set_phase(ATTACHING)
+        logger.info(f"Reusing snapshot {snapshot_path} ({meta.get('row_count')} posts, built {meta.get('built_at')})")
+        return snapshot_path
+
+    same_indexes = meta.get('trigram_index') == ('1' if trigram_index_enabled() else '0')
+    if meta.get('format_version') == str(SNAPSHOT_FORMAT_VERSION) and same_indexes:
+        loaded = read_snapshot_partitions(snapshot_path)
+        current = {os.path.abspath(source.path): source.fingerprint() for source in sources}
+        unchanged = all(current.get(path) == loaded_fingerprint for path, loaded_fingerprint in loaded.items())
+        new_sources = [source for source in sources if os.path.abspath(source.path) not in loaded]
+        if loaded and unchanged and new_sources:
+            load_progress.expect(sum(os.path.getsize(source.path) for source in new_sources))
+            load_progress.set_phase(EXTENDING)
+            extend_snapshot(new_sources, snapshot_path, fingerprint)
+            return snapshot_path
+
+    if meta:
+        logger.info("Source data changed since the last snapshot, rebuilding")
+    load_progress.expect(sum(os.path.getsize(source.path) for source in sources))
+    load_progress.set_phase(BUILDING)
+    build_snapshot(sources, snapshot_path, fingerprint)
+    return snapshot_path
+
+
+def require_snapshot(snapshot_path: str) -> str:
+    """Check that a prebuilt snapshot can be served without building or extending it.
+
+    Used when the app serves the snapshot read-only: a separate ingest step
+    (``python -m ingest.snapshot``) owns the file and the app never writes it.
+
+    Args:
+        snapshot_path: Path to the snapshot database file
+
+    Returns:
+        ``snapshot_path``
+
+    Raises:
+        FileNotFoundError: If the snapshot is missing, unreadable or in an outdated format
+    """
+    load_progress.set_phase(DISCOVERING)
+    meta = read_snapshot_meta(snapshot_path)
+    if meta.get('format_version') != str(SNAPSHOT_FORMAT_VERSION):
+        raise FileNotFoundError(
+            f"No usable snapshot at {snapshot_path}; build it first with: python -m ingest.snapshot <data path> {snapshot_path}"
+        )
+
+    logger.info(f"Serving snapshot {snapshot_path} read-only ({meta.get('row_count')} posts, built {meta.get('built_at')})")
+    return snapshot_path
+
+
+def snapshot_dataset_version(con, alias: str = SNAPSHOT_ALIAS) -> int:
+    """Read the persisted dataset version of an attached snapshot."""
+    result = con.execute(f"SELECT value FROM {alias}.{META_TABLE} WHERE key = 'dataset_version'").fetchone()
+    return int(result[0]) if result else 1
+
+
+def attach_snapshot(con, snapshot_path: str, alias: str = SNAPSHOT_ALIAS, read_only: bool = True):
+    """Attach a snapshot database file to an existing DuckDB connection.
+
+    Args:
+        con: DuckDB connection to attach the snapshot to
+        snapshot_path: Path to the snapshot database file
+        alias: Catalog name the snapshot is attached under
+        read_only: Whether to attach the snapshot read-only
+    """
+    attached = {row[0] for row in con.execute("SELECT database_name FROM duckdb_databases()").fetchall()}
+    if alias in attached:
+        con.execute(f"DETACH {alias}")
+
+    mode = " (READ_ONLY)" if read_only else ""
+    con.execute(f"ATTACH '{snapshot_path}' AS {alias}{mode}")
+
+
+if __name__ == '__main__':
+    # Build the snapshot ahead of time, e.g. during the Docker image build:
+    #   python -m ingest.snapshot /app/data/data.jsonl
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        print("Usage: python -m ingest.snapshot <data.jsonl|data_dir|glob> [snapshot.duckdb]")
+        sys.exit(1)
+    ensure_snapshot(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
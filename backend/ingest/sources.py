@@ -0,0 +1,145 @@
+"""Discovery of the source files that make up the posts dataset.
+
+A dataset can be a single JSONL file, a directory or glob of daily files
+(``YYYY-MM-DD.jsonl``, optionally ``.gz``/``.zst`` compressed) or a Hive-style
+Parquet layout (``.../dt=YYYY-MM-DD/part-0.parquet``). All of them are loaded
+into the same logical posts table.
+"""
+
+import glob
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+import duckdb
+
+from .schema import RAW_DATA_FIELDS, raw_source_sql
+
+JSONL_SUFFIXES = ('.jsonl', '.jsonl.gz', '.jsonl.zst', '.json', '.json.gz', '.json.zst')
+PARQUET_SUFFIXES = ('.parquet',)
+
+# YYYY-MM-DD in a daily file name or a Hive partition directory (dt=..., date=..., day=...)
+PARTITION_PATTERN = re.compile(r'(?:^|[/=_-])(\d{4}-\d{2}-\d{2})(?=[./]|$)')
+
+
+@dataclass
+class SourceFile:
+    """One file of the dataset."""
+
+    path: str
+    format: str
+    partition: Optional[str] = None
+
+    @property
+    def compression(self) -> Optional[str]:
+        if self.path.endswith('.gz'):
+            return 'gzip'
+        if self.path.endswith('.zst'):
+            return 'zstd'
+        return None
+
+    def fingerprint(self) -> str:
+        return fingerprint_source(self.path)
+
+
+def fingerprint_source(data_path: str) -> str:
+    """Compute a cheap fingerprint of a source data file.
+
+    The fingerprint is derived from the file's name, size and modification
+    time rather than its contents, so it stays O(1) for multi-GB dumps.
+
+    Args:
+        data_path: Path to the source file
+
+    Returns:
+        Hex digest identifying this version of the source
+    """
+    stat = os.stat(data_path)
+    key = f"{os.path.basename(data_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def partition_of(path: str) -> Optional[str]:
+    """Return the ``YYYY-MM-DD`` partition encoded in a path, if any."""
+    matches = PARTITION_PATTERN.findall(path.replace(os.sep, '/'))
+    return matches[-1] if matches else None
+
+
+def _source_format(path: str) -> Optional[str]:
+    if path.endswith(JSONL_SUFFIXES):
+        return 'jsonl'
+    if path.endswith(PARQUET_SUFFIXES):
+        return 'parquet'
+    return None
+
+
+def discover_sources(spec: str) -> List[SourceFile]:
+    """Expand a file, directory or glob into the dataset's source files.
+
+    Files are ordered by partition date and then path, so loading them in
+    order keeps the posts table clustered by time.
+
+    Args:
+        spec: Path to a file or directory, or a glob pattern
+
+    Returns:
+        List of source files
+
+    Raises:
+        FileNotFoundError: If the spec matches no supported files
+    """
+    if os.path.isdir(spec):
+        paths = glob.glob(os.path.join(spec, '**', '*'), recursive=True)
+    elif glob.has_magic(spec):
+        paths = glob.glob(spec, recursive=True)
+    else:
+        paths = [spec] if os.path.exists(spec) else []
+
+    sources = []
+    for path in paths:
+        source_format = _source_format(path)
+        if source_format and os.path.isfile(path):
+            sources.append(SourceFile(path=path, format=source_format, partition=partition_of(path)))
+
+    if not sources:
+        raise FileNotFoundError(f"No JSONL or Parquet data files found for {spec}")
+
+    return sorted(sources, key=lambda source: (source.partition or '', source.path))
+
+
+def dataset_root(spec: str) -> str:
+    """Return the directory a dataset spec lives in."""
+    if os.path.isdir(spec):
+        return os.path.abspath(spec)
+    if glob.has_magic(spec):
+        prefix = re.split(r'[*?\[]', spec, maxsplit=1)[0]
+        return os.path.abspath(os.path.dirname(prefix) or '.')
+    return os.path.dirname(os.path.abspath(spec))
+
+
+def parquet_source_sql(path: str, con=None) -> str:
+    """Build a subquery reading flattened posts from a Parquet file as raw records.
+
+    Parquet exports store the post fields as top-level columns; they are
+    packed into the same ``data`` STRUCT the JSONL reader produces, with any
+    missing field left NULL.
+    """
+    con = con or duckdb.connect()
+    reader = f"read_parquet('{path}', hive_partitioning=true)"
+    available = {row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {reader}").fetchall()}
+
+    fields = ", ".join(
+        f"{name} := CAST({name if name in available else 'NULL'} AS {field_type})"
+        for name, field_type in RAW_DATA_FIELDS
+    )
+    kind = "CAST(kind AS VARCHAR)" if 'kind' in available else "'t3'"
+    return f"(SELECT {kind} AS kind, struct_pack({fields}) AS data FROM {reader})"
+
+
+def source_sql(source: SourceFile, con=None) -> str:
+    """Build the SQL source of raw ``kind``/``data`` records for one file."""
+    if source.format == 'parquet':
+        return parquet_source_sql(source.path, con)
+    return raw_source_sql(source.path)
@@ -0,0 +1,246 @@
+"""Bounded-memory, chunked ingest of large JSONL dumps.
+
+``read_json`` over a whole dump lets DuckDB decide how much to buffer and the
+final ``ORDER BY`` has to sort the entire dataset. For dumps far larger than
+the VM's RAM the streaming loader instead reads a fixed number of raw lines at
+a time, parses only the projected fields inside DuckDB and appends each batch
+to the on-disk posts table, so peak memory is bounded by the batch size and
+DuckDB's ``memory_limit`` rather than by the size of the dump.
+"""
+
+import gzip
+import io
+import itertools
+import logging
+import os
+import resource
+import sys
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+import duckdb
+import pandas as pd
+
+from .progress import load_progress
+from .schema import posts_projection_sql, raw_lines_source_sql
+from .upsert import upsert_posts
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_ROWS = 20_000
+DEFAULT_MEMORY_LIMIT_MB = 512
+
+# Share of the memory budget handed to DuckDB's buffer manager; the rest is
+# left for the interpreter and the batch of raw lines held in Python
+DUCKDB_BUDGET_SHARE = 0.5
+
+BATCH_FRAME = 'raw_batch'
+BATCH_TABLE = 'staged_batch'
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def open_text(path: str):
+    """Open a possibly gzip/zstd-compressed JSONL file for streaming text reads."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(f"Reading {path} requires the zstandard package")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+@dataclass
+class LoadMetrics:
+    """Throughput and memory metrics of a streaming load."""
+
+    source: str
+    rows: int = 0
+    skipped_lines: int = 0
+    batches: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    rows_per_sec: float = 0.0
+    mb_per_sec: float = 0.0
+    peak_rss_mb: float = 0.0
+    memory_budget_mb: Optional[int] = None
+    within_budget: Optional[bool] = None
+    # Range of created_utc over every post of the file, new or already stored
+    min_created_utc: Optional[int] = None
+    max_created_utc: Optional[int] = None
+
+    def include_created(self, min_created: Optional[int], max_created: Optional[int]):
+        """Widen the file's created_utc range with a batch's range."""
+        if min_created is not None:
+            self.min_created_utc = min_created if self.min_created_utc is None else min(self.min_created_utc, min_created)
+        if max_created is not None:
+            self.max_created_utc = max_created if self.max_created_utc is None else max(self.max_created_utc, max_created)
+
+    def finish(self, seconds: float):
+        """Record the elapsed time and derive the throughput rates.
+
+        ``mb_per_sec`` is measured on the file as stored, i.e. compressed
+        bytes for gzip/zstd inputs.
+        """
+        self.seconds = round(seconds, 3)
+        self.rows_per_sec = round(self.rows / self.seconds, 1) if self.seconds else float(self.rows)
+        size_mb = self.bytes / (1024 * 1024)
+        self.mb_per_sec = round(size_mb / self.seconds, 2) if self.seconds else round(size_mb, 2)
+        self.peak_rss_mb = round(peak_rss_mb(), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _default_memory_limit() -> str:
+    """Return DuckDB's default memory limit, as a fresh database reports it."""
+    with duckdb.connect() as con:
+        return con.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+
+
+class StreamingLoader:
+    """Loads a JSONL dump into the posts table in fixed-size batches."""
+
+    def __init__(self, db_connection, catalog: Optional[str] = None,
+                 batch_rows: int = DEFAULT_BATCH_ROWS,
+                 memory_limit_mb: Optional[int] = DEFAULT_MEMORY_LIMIT_MB):
+        """Initialize the streaming loader.
+
+        Args:
+            db_connection: Connection to the file-backed database being built
+            catalog: Catalog of the posts table to upsert into (it must already exist)
+            batch_rows: Number of JSONL lines parsed per batch
+            memory_limit_mb: Memory budget for the load; DuckDB's buffer
+                manager gets a share of it and the peak RSS is checked against it
+        """
+        self.db_connection = db_connection
+        self.catalog = catalog
+        self.batch_rows = batch_rows
+        self.memory_limit_mb = memory_limit_mb
+
+    @classmethod
+    def from_env(cls, db_connection, catalog: Optional[str] = None) -> 'StreamingLoader':
+        """Create a loader configured by ``INGEST_BATCH_ROWS`` and ``INGEST_MEMORY_LIMIT_MB``."""
+        return cls(
+            db_connection,
+            catalog=catalog,
+            batch_rows=int(os.getenv('INGEST_BATCH_ROWS', DEFAULT_BATCH_ROWS)),
+            memory_limit_mb=int(os.getenv('INGEST_MEMORY_LIMIT_MB', DEFAULT_MEMORY_LIMIT_MB))
+        )
+
+    def _configure(self) -> Dict[str, Any]:
+        """Apply the load's database settings and return what ``_restore`` needs to undo them."""
+        previous = {'preserve_insertion_order': self.db_connection.execute(
+            "SELECT current_setting('preserve_insertion_order')"
+        ).fetchone()[0], 'memory_limit': False}
+        if self.memory_limit_mb:
+            # The limit only reads back rounded, so it could not be set again
+            # exactly: a limit the connection's owner chose is left in place,
+            # and only DuckDB's default one is replaced for the load
+            current = self.db_connection.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+            if current == _default_memory_limit():
+                duckdb_limit_mb = int(self.memory_limit_mb * DUCKDB_BUDGET_SHARE)
+                self.db_connection.execute(f"SET memory_limit = '{duckdb_limit_mb}MB'")
+                previous['memory_limit'] = True
+            else:
+                logger.info(f"Keeping the connection's memory limit of {current} for the streaming load")
+        # Batches are appended as they arrive; there is no need to keep
+        # DuckDB's intermediate results in file order
+        self.db_connection.execute("SET preserve_insertion_order = false")
+        return previous
+
+    def _restore(self, previous: Dict[str, Any]):
+        # Both settings are database-wide, so the load must not leave them behind
+        if previous['memory_limit']:
+            self.db_connection.execute("RESET memory_limit")
+        self.db_connection.execute(
+            f"SET preserve_insertion_order = {'true' if previous['preserve_insertion_order'] else 'false'}"
+        )
+
+    def load(self, path: str) -> LoadMetrics:
+        """Stream every post of ``path`` into the posts table.
+
+        Args:
+            path: Path to the JSONL dump
+
+        Returns:
+            Metrics of the load
+        """
+        previous_settings = self._configure()
+        try:
+            return self._load(path)
+        finally:
+            self._restore(previous_settings)
+
+    def _load(self, path: str) -> LoadMetrics:
+        metrics = LoadMetrics(source=os.path.abspath(path), bytes=os.path.getsize(path),
+                              memory_budget_mb=self.memory_limit_mb)
+        start_time = time.time()
+        stage_sql = f"CREATE OR REPLACE TEMP TABLE {BATCH_TABLE} AS {posts_projection_sql(raw_lines_source_sql(BATCH_FRAME))}"
+
+        # Line lengths only track progress through uncompressed files; compressed
+        # ones are reported as a whole once they are done
+        report_batch_bytes = not path.endswith(('.gz', '.zst'))
+        bytes_reported = 0
+
+        with open_text(path) as f:
+            while True:
+                lines = list(itertools.islice(f, self.batch_rows))
+                if not lines:
+                    break
+
+                batch = pd.DataFrame({'line': lines})
+                self.db_connection.register(BATCH_FRAME, batch)
+                try:
+                    self.db_connection.execute(stage_sql)
+                    metrics.include_created(*self.db_connection.execute(
+                        f"SELECT MIN(created_utc), MAX(created_utc) FROM {BATCH_TABLE}"
+                    ).fetchone())
+                    # The batch's index rows and posts commit together, so an
+                    # interrupted load leaves no postings for posts it never upserted
+                    self.db_connection.execute("BEGIN TRANSACTION")
+                    try:
+                        inserted = upsert_posts(self.db_connection, BATCH_TABLE, self.catalog)
+                        self.db_connection.execute("COMMIT")
+                    except Exception:
+                        self.db_connection.execute("ROLLBACK")
+                        raise
+                finally:
+                    self.db_connection.unregister(BATCH_FRAME)
+                    self.db_connection.execute(f"DROP TABLE IF EXISTS {BATCH_TABLE}")
+                metrics.rows += inserted
+                metrics.skipped_lines += len(lines) - inserted
+                metrics.batches += 1
+                batch_bytes = sum(len(line) for line in lines) if report_batch_bytes else 0
+                bytes_reported += batch_bytes
+                load_progress.advance(rows=inserted, bytes_loaded=batch_bytes)
+                del batch, lines
+
+                if metrics.batches % 10 == 0:
+                    elapsed = time.time() - start_time
+                    logger.info(f"Streamed {metrics.rows} posts ({metrics.rows / elapsed:.0f} rows/s, peak RSS {peak_rss_mb():.0f} MB)")
+
+        load_progress.advance(bytes_loaded=max(metrics.bytes - bytes_reported, 0))
+        metrics.finish(time.time() - start_time)
+        if self.memory_limit_mb:
+            metrics.within_budget = metrics.peak_rss_mb <= self.memory_limit_mb
+
+        logger.info(
+            f"Streamed {metrics.rows} posts in {metrics.batches} batches from {path} "
+            f"({metrics.rows_per_sec} rows/s, {metrics.mb_per_sec} MB/s, peak RSS {metrics.peak_rss_mb} MB, "
+            f"{metrics.skipped_lines} lines skipped)"
+        )
+        if metrics.within_budget is False:
+            logger.warning(f"Streaming load exceeded the {self.memory_limit_mb} MB memory budget")
+        return metrics
@@ -0,0 +1,86 @@
+"""Background tailer that appends new (optionally compressed) JSONL dumps dropped into a directory."""
+
+import glob
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from .appender import PostAppender
+from .sources import JSONL_SUFFIXES, fingerprint_source
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class DirectoryTailer:
+    """Polls a directory and appends every new or changed JSONL file once."""
+
+    def __init__(self, appender: PostAppender, directory: str, pattern: str = '*.jsonl*',
+                 interval: float = 30.0, settle_seconds: float = 10.0):
+        """Initialize the tailer.
+
+        Args:
+            appender: Appender used to load new files
+            directory: Directory to watch
+            pattern: Glob pattern of the files to ingest; only JSONL files,
+                plain or gzip/zstd-compressed, are picked up
+            interval: Seconds between directory scans
+            settle_seconds: Files modified more recently than this are assumed
+                to still be written and are picked up on a later scan
+        """
+        self.appender = appender
+        self.directory = directory
+        self.pattern = pattern
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self.last_scan: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start polling in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ingest-tailer', daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {os.path.join(self.directory, self.pattern)} for new posts every {self.interval}s")
+
+    def stop(self):
+        """Stop polling after the current scan."""
+        self._stop.set()
+
+    def scan(self) -> int:
+        """Append every settled file that has not been ingested yet.
+
+        Returns:
+            Number of posts appended during this scan
+        """
+        appended = 0
+        now = time.time()
+        for path in sorted(glob.glob(os.path.join(self.directory, self.pattern))):
+            if not path.endswith(JSONL_SUFFIXES):
+                continue
+            try:
+                if now - os.path.getmtime(path) < self.settle_seconds:
+                    continue
+
+                source = os.path.abspath(path)
+                fingerprint = fingerprint_source(path)
+                if self.appender.is_ingested(source, fingerprint):
+                    continue
+
+                result = self.appender.append_file(path, source=source, fingerprint=fingerprint)
+                appended += result["rows"]
+            except Exception as e:
+                logger.error(f"Error ingesting {path}: {str(e)}")
+
+        self.last_scan = now
+        return appended
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.scan()
+            self._stop.wait(self.interval)
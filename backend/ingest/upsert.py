@@ -0,0 +1,51 @@
+"""Idempotent upsert of a staged batch of posts, shared by every ingest path."""
+
+from typing import Optional
+
+from .schema import (
+    DIMENSIONS, TRIGRAMS_TABLE, has_table, index_lengths_sql, index_terms_sql, index_trigrams_sql,
+    posts_upsert_sql, register_dimension_sql
+)
+
+
+def in_transaction(cursor) -> bool:
+    """Tell whether ``cursor`` is inside an explicit transaction.
+
+    In autocommit mode every statement runs in a transaction of its own, so
+    two consecutive statements only share a transaction id inside one.
+    """
+    first = cursor.execute("SELECT txid_current()").fetchone()[0]
+    return cursor.execute("SELECT txid_current()").fetchone()[0] == first
+
+
+def upsert_posts(cursor, staged_table: str, catalog: Optional[str] = None) -> int:
+    """Register the batch's new subreddits, authors and domains, index its new posts' words and upsert its posts.
+
+    New posts are also added to the trigram index when the catalog has one.
+
+    The index tables have no key: a post counts as new, and gets indexed, as
+    long as it is missing from the posts table. The index inserts and the
+    posts upsert must therefore commit together, so the caller has to hold a
+    transaction; otherwise a failure between them would index the posts
+    again when the batch is retried.
+
+    Args:
+        cursor: DuckDB cursor inside the caller's transaction
+        staged_table: Table holding the typed posts rows of the batch
+        catalog: Catalog the posts, dimension and index tables live in
+
+    Returns:
+        Number of posts inserted or updated
+
+    Raises:
+        RuntimeError: If ``cursor`` is not inside a transaction
+    """
+    if not in_transaction(cursor):
+        raise RuntimeError("upsert_posts must run inside a transaction (BEGIN TRANSACTION ... COMMIT)")
+    for dimension in DIMENSIONS:
+        cursor.execute(register_dimension_sql(dimension, staged_table, catalog))
+    cursor.execute(index_terms_sql(staged_table, catalog))
+    cursor.execute(index_lengths_sql(staged_table, catalog))
+    if has_table(cursor, TRIGRAMS_TABLE, catalog):
+        cursor.execute(index_trigrams_sql(staged_table, catalog))
+    return cursor.execute(posts_upsert_sql(staged_table, catalog)).fetchone()[0]
@@ -0,0 +1,56 @@
+"""Monotonic version of the loaded dataset.
+
+Everything derived from the posts table (caches, rollups, ETags) keys on this
+version, so bumping it after an append is enough to invalidate stale results.
+"""
+
+import logging
+import threading
+from typing import Callable, List
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_version = 0
+_listeners: List[Callable[[int], None]] = []
+
+
+def current_version() -> int:
+    """Return the current dataset version."""
+    return _version
+
+
+def set_version(version: int):
+    """Set the dataset version, e.g. from snapshot metadata after a load."""
+    global _version
+    with _lock:
+        _version = version
+    _notify(version)
+
+
+def bump_version() -> int:
+    """Increment the dataset version and notify listeners.
+
+    Returns:
+        The new dataset version
+    """
+    global _version
+    with _lock:
+        _version += 1
+        version = _version
+    _notify(version)
+    return version
+
+
+def on_version_change(callback: Callable[[int], None]):
+    """Register a callback invoked with the new version whenever it changes."""
+    _listeners.append(callback)
+
+
+def _notify(version: int):
+    for callback in list(_listeners):
+        try:
+            callback(version)
+        except Exception as e:
+            logger.error(f"Dataset version listener failed: {str(e)}")
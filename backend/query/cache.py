@@ -0,0 +1,276 @@
+"""Response cache for the analytics endpoints, keyed by dataset version.
+
+A cached response is keyed by the endpoint, its normalized query parameters
+and the dataset version, so an ingest that bumps the version makes every
+older entry unreachable without tracking which responses it affected. A
+snapshot rebuild never reuses a version either (see
+``ingest.snapshot.next_build_version``), so a shared backend that outlives
+the process never serves entries of a previous build.
+
+Entries live in an in-process LRU by default. Setting ``RESPONSE_CACHE_URL``
+to a ``redis://`` URL shares them between workers instead; any client with
+Redis' ``get``/``set(..., ex=)`` methods can stand in for the real server.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import Response, make_response, request
+
+from ingest.version import current_version, on_version_change
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 300
+
+# Seconds a response stays cached per endpoint; override with RESPONSE_CACHE_TTLS="topics=3600,stats=60"
+DEFAULT_TTLS = {
+    'stats': 600,
+    'timeseries': 300,
+    'network': 600,
+    'sentiment': 900,
+    'topics': 1800,
+}
+
+
+class MemoryBackend:
+    """Size-bounded LRU of encoded responses with per-entry expiry."""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """Initialize the backend.
+
+        Args:
+            max_entries: Number of responses kept before the least recently used one is evicted
+        """
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Cache shared by every worker through Redis; entries expire with Redis' own TTLs."""
+
+    name = 'redis'
+
+    def __init__(self, client, prefix: str = 'reddit-dashboard:response:'):
+        """Initialize the backend.
+
+        Args:
+            client: Redis client, or a stand-in with compatible ``get``/``set`` methods
+            prefix: Prefix of every key written
+        """
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisBackend':
+        """Connect to the Redis server at ``url``; requires the ``redis`` package."""
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("RESPONSE_CACHE_URL requires the redis package (pip install redis)")
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def clear(self):
+        # Keys embed the dataset version, so stale entries are never read and expire on their own
+        pass
+
+
+def params_digest(args) -> str:
+    """Hash request arguments independently of their order.
+
+    Parameters are sorted and empty ones dropped, so ``?a=1&b=`` and
+    ``?b=&a=1`` hash the same.
+
+    Args:
+        args: Request arguments (``request.args``)
+    """
+    params = sorted(
+        (name, sorted(value for value in args.getlist(name) if value != ''))
+        for name in args.keys()
+    )
+    params = [(name, values) for name, values in params if values]
+    return hashlib.sha1(json.dumps(params).encode('utf-8')).hexdigest()
+
+
+# Layout of stored entries; part of the key so entries of an older layout are never decoded
+ENTRY_FORMAT = 2
+
+# Headers recomputed for every response rather than replayed from the cache
+_UNCACHED_HEADERS = {'content-length', 'x-cache'}
+
+
+def _encode(response: Response) -> bytes:
+    headers = [[name, value] for name, value in response.headers.items() if name.lower() not in _UNCACHED_HEADERS]
+    return f"{response.status_code}\n{json.dumps(headers)}\n".encode('utf-8') + response.get_data()
+
+
+def _decode(value: bytes) -> Response:
+    status, headers, body = value.split(b"\n", 2)
+    return Response(body, status=int(status), headers=[tuple(header) for header in json.loads(headers)])
+
+
+class ResponseCache:
+    """Caches successful GET responses of Flask views per endpoint, parameters and dataset version."""
+
+    def __init__(self, backend, ttls: Optional[Dict[str, int]] = None, default_ttl: int = DEFAULT_TTL):
+        """Initialize the cache.
+
+        Args:
+            backend: ``MemoryBackend``, ``RedisBackend`` or a compatible object
+            ttls: Seconds each endpoint's responses stay cached
+            default_ttl: Seconds for endpoints without an entry in ``ttls``
+        """
+        self.backend = backend
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def key(self, endpoint: str, args, version: Optional[int] = None) -> str:
+        """Build the cache key of a request.
+
+        Args:
+            endpoint: Name of the cached endpoint
+            args: Request arguments (``request.args``)
+            version: Dataset version, defaults to the current one
+        """
+        version = current_version() if version is None else version
+        return f"{endpoint}:v{version}:f{ENTRY_FORMAT}:{params_digest(args)}"
+
+    def cached(self, endpoint: str):
+        """Decorate a Flask view so its successful responses are served from the cache."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                key = self.key(endpoint, request.args)
+                stored = self._get(key)
+                if stored is not None:
+                    self._count(endpoint, 'hits')
+                    response = _decode(stored)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count(endpoint, 'misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    self._set(key, _encode(response), self.ttls.get(endpoint, self.default_ttl))
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def _get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            # A failing shared backend degrades to recomputing, never to an error
+            logger.warning(f"Response cache lookup failed: {str(e)}")
+            return None
+
+    def _set(self, key: str, value: bytes, ttl: int):
+        try:
+            self.backend.set(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {str(e)}")
+
+    def _count(self, endpoint: str, counter: str):
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, {"hits": 0, "misses": 0})
+            counters[counter] += 1
+
+    def clear(self):
+        """Drop every cached response held by the backend."""
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """Report hit/miss counts per endpoint and, for the in-process backend, the number of entries."""
+        with self._lock:
+            endpoints = {name: dict(counters) for name, counters in self._counters.items()}
+        return {
+            "backend": self.backend.name,
+            "entries": len(self.backend) if hasattr(self.backend, '__len__') else None,
+            "hits": sum(counters["hits"] for counters in endpoints.values()),
+            "misses": sum(counters["misses"] for counters in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+
+def parse_ttls(spec: str) -> Dict[str, int]:
+    """Parse ``"topics=3600,stats=60"`` into per-endpoint TTLs."""
+    ttls = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        endpoint, seconds = item.split('=', 1)
+        ttls[endpoint.strip()] = int(seconds)
+    return ttls
+
+
+def create_response_cache() -> ResponseCache:
+    """Build the response cache from the environment.
+
+    ``RESPONSE_CACHE_URL`` selects the shared Redis backend, otherwise an
+    in-process LRU of ``RESPONSE_CACHE_SIZE`` entries is used and emptied
+    whenever the dataset version changes. ``RESPONSE_CACHE_TTLS`` overrides
+    the per-endpoint TTLs.
+    """
+    url = os.getenv('RESPONSE_CACHE_URL')
+    if url:
+        backend = RedisBackend.from_url(url)
+    else:
+        backend = MemoryBackend(int(os.getenv('RESPONSE_CACHE_SIZE', DEFAULT_MAX_ENTRIES)))
+        # Entries of older versions can no longer be hit, so free them right away
+        on_version_change(lambda version: backend.clear())
+
+    ttls = dict(DEFAULT_TTLS)
+    ttls.update(parse_ttls(os.getenv('RESPONSE_CACHE_TTLS', '')))
+
+    logger.info(f"Response cache initialized (backend: {backend.name})")
+    return ResponseCache(backend, ttls)
@@ -0,0 +1,57 @@
+"""Strong ETags and conditional GETs for the read-only data endpoints.
+
+A response is fully determined by the endpoint, its query parameters and the
+dataset version, so the ETag is derived from those alone. A matching
+``If-None-Match`` is answered with 304 before the view runs any query.
+"""
+
+import hashlib
+import os
+from functools import wraps
+
+from flask import make_response, request
+
+from ingest.version import current_version
+
+from .cache import params_digest
+
+# Clients (and CDNs) must revalidate, which is cheap thanks to the ETag; e.g.
+# "public, max-age=60, s-maxage=600" lets a CDN absorb repeated requests
+DEFAULT_CACHE_CONTROL = 'no-cache'
+
+
+def request_etag(endpoint: str, args, version: int) -> str:
+    """Return the strong ETag of a request for ``endpoint`` at dataset ``version``."""
+    digest = hashlib.sha1(f"{endpoint}:{params_digest(args)}".encode('utf-8')).hexdigest()[:20]
+    return f"v{version}-{digest}"
+
+
+def conditional_get(endpoint: str, cache_control: str = None):
+    """Decorate a Flask view with an ETag, Cache-Control and ``If-None-Match`` handling.
+
+    Args:
+        endpoint: Name of the endpoint, part of the ETag
+        cache_control: Cache-Control header value, defaults to ``HTTP_CACHE_CONTROL``
+            or ``DEFAULT_CACHE_CONTROL``
+    """
+    cache_control = cache_control or os.getenv('HTTP_CACHE_CONTROL', DEFAULT_CACHE_CONTROL)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            etag = request_etag(endpoint, request.args, current_version())
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
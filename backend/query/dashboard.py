@@ -0,0 +1,179 @@
+"""Dashboard bundle: several panels computed from one materialized row set.
+
+``materialized`` copies the posts matching the request's filters, only the
+columns the panels read, into a table of the in-memory main database, so the
+filters (keyword index lookups, date ranges, dimension ids) are evaluated
+once instead of once per panel query. Without any filter the copy would
+only duplicate the posts, so the panels read ``reddit_posts_view`` directly.
+
+Unlike temporary tables, which are private to one connection, main database
+tables are visible to every cursor, so ``run_panels`` computes the panels
+concurrently, each on a cursor of its own, and times each one. Each panel
+worker thread keeps one cursor over the connection for its panels, instead
+of taking them from the request cursor pool: a request already holds a pool
+cursor while its panels run, so with every request thread computing a
+dashboard, panels waiting for pool cursors would wait on each other.
+
+Tables are named after a small set of reusable slots rather than after each
+request, so the panels' queries keep the same text across requests and their
+prepared statements stay cached (DuckDB rebinds them to the recreated table).
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import duckdb
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+# Columns of ``reddit_posts_view`` every panel may read
+DASHBOARD_COLUMNS = (
+    'subreddit_id', 'author_id', 'domain_id', 'created_utc', 'score', 'num_comments', 'day_bucket',
+)
+
+# Text columns, copied only for the panels reading the posts' text
+DASHBOARD_TEXT_COLUMNS = ('id', 'title', 'selftext', 'subreddit')
+
+DASHBOARD_TABLE_PREFIX = 'dashboard_rows_'
+
+_slots_lock = threading.Lock()
+_free_slots: List[int] = []
+_slot_count = 0
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Cursor of each panel worker thread, with the connection it was opened on
+_worker_cursors = threading.local()
+
+
+def dashboard_workers() -> int:
+    """Return the number of panels computed at once (``DASHBOARD_WORKERS``, default 4)."""
+    return max(1, int(os.getenv('DASHBOARD_WORKERS', DEFAULT_WORKERS)))
+
+
+def _take_slot() -> int:
+    global _slot_count
+    with _slots_lock:
+        if _free_slots:
+            return _free_slots.pop()
+        _slot_count += 1
+        return _slot_count
+
+
+def _release_slot(slot: int):
+    with _slots_lock:
+        _free_slots.append(slot)
+
+
+@contextmanager
+def materialized(db_connection, where_clause: str, params: Sequence[Any],
+                 columns: Sequence[str] = DASHBOARD_COLUMNS) -> Iterator[Tuple[str, int]]:
+    """Copy the posts matching a filter into a table dropped on exit.
+
+    Args:
+        db_connection: DuckDB connection or cursor
+        where_clause: Filter on ``reddit_posts_view``
+        params: Params of ``where_clause``
+        columns: Columns to copy
+
+    Yields:
+        Tuple of (table name, number of rows copied); ``reddit_posts_view``
+        and None when ``where_clause`` filters nothing
+    """
+    if where_clause == "1=1":
+        yield 'reddit_posts_view', None
+        return
+
+    slot = _take_slot()
+    table = f"{DASHBOARD_TABLE_PREFIX}{slot}"
+    try:
+        # CREATE TABLE AS cannot be prepared, so it is executed directly
+        rows = db_connection.execute(f"""
+            CREATE OR REPLACE TABLE {table} AS
+            SELECT {', '.join(columns)}
+            FROM reddit_posts_view
+            WHERE {where_clause}
+        """, list(params)).fetchone()[0]
+        yield table, rows
+    finally:
+        try:
+            db_connection.execute(f"DROP TABLE IF EXISTS {table}")
+        finally:
+            _release_slot(slot)
+
+
+def _panel_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=dashboard_workers(), thread_name_prefix='dashboard')
+        return _executor
+
+
+def _worker_cursor(db_connection):
+    # Panel workers run one panel at a time, so each thread's cursor is never shared
+    current = getattr(_worker_cursors, 'current', None)
+    if current is None or current[0] is not db_connection:
+        current = (db_connection, db_connection.cursor())
+        _worker_cursors.current = current
+    return current[1]
+
+
+def run_panels(panels: Dict[str, Callable[[Any], Any]], db_connection,
+               deadline=None) -> Tuple[Dict[str, Any], Dict[str, str], Dict[str, float]]:
+    """Compute panels concurrently, each on the cursor of a panel worker thread.
+
+    A failing panel does not fail the others: its error is reported instead.
+    A panel interrupted by the deadline, though, means the request ran out of
+    time; once every panel is done, its interrupt is raised again so the
+    query guard records the cancellation.
+
+    Args:
+        panels: Function computing each panel's payload from a cursor, by panel name
+        db_connection: DuckDB connection the worker threads' cursors are opened on
+        deadline: Optional ``query.guard.Deadline`` that should also interrupt the panels' cursors
+
+    Returns:
+        Tuple of (payload by panel, error by failed panel, milliseconds by panel)
+
+    Raises:
+        duckdb.InterruptException: If a panel was interrupted by ``deadline``
+    """
+    def run(name: str, panel: Callable[[Any], Any]):
+        cursor = _worker_cursor(db_connection)
+        if deadline is not None:
+            deadline.watch(cursor)
+        started = time.perf_counter()
+        try:
+            return name, panel(cursor), None, time.perf_counter() - started
+        except Exception as e:
+            logger.error(f"Dashboard panel {name} failed: {str(e)}")
+            return name, None, e, time.perf_counter() - started
+        finally:
+            if deadline is not None:
+                deadline.unwatch(cursor)
+
+    futures = [_panel_executor().submit(run, name, panel) for name, panel in panels.items()]
+    payloads, errors, timings = {}, {}, {}
+    interrupted = None
+    for future in futures:
+        name, payload, error, seconds = future.result()
+        timings[name] = round(seconds * 1000, 3)
+        if error is None:
+            payloads[name] = payload
+        else:
+            errors[name] = str(error)
+            if isinstance(error, duckdb.InterruptException):
+                interrupted = interrupted or error
+    if interrupted is not None:
+        raise interrupted
+    return payloads, errors, timings
@@ -0,0 +1,112 @@
+"""Filters and rankings over the dictionary-encoded subreddit, author and domain columns."""
+
+from typing import Any, List, Optional, Tuple, Union
+
+from ingest.schema import dimension_id_column, dimension_table
+
+# Dimension key filter leaving deleted accounts and the moderation bot out of author rankings
+EXCLUDED_AUTHORS_FILTER = "key NOT IN ('[deleted]', 'automoderator')"
+
+
+def dimension_ids(db_connection, dimension: str, values: List[str]) -> List[int]:
+    """Look up the integer ids of subreddit/author/domain values, ignoring case.
+
+    Args:
+        db_connection: DuckDB connection or cursor
+        dimension: ``subreddit``, ``author`` or ``domain``
+        values: Values to look up; unknown values are skipped
+
+    Returns:
+        Ids of the values present in the dataset
+    """
+    placeholders = ", ".join("LOWER(?)" for _ in values)
+    rows = db_connection.execute(
+        f"SELECT id FROM {dimension_table(dimension)} WHERE key IN ({placeholders})",
+        list(values)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def dimension_condition(db_connection, dimension: str, values: Union[str, List[str]]) -> Tuple[str, List[Any]]:
+    """Compile a case-insensitive equality (or IN) filter into a predicate on the integer id column.
+
+    The values are resolved against the small dimension table once, so the
+    posts scan compares integers instead of lowercasing every row's string.
+
+    Args:
+        db_connection: DuckDB connection or cursor
+        dimension: ``subreddit``, ``author`` or ``domain``
+        values: One value or a list of values to match
+
+    Returns:
+        Tuple of (condition, positional params); the condition matches
+        nothing if none of the values occur in the dataset
+    """
+    if isinstance(values, str):
+        values = [values]
+
+    ids = dimension_ids(db_connection, dimension, values)
+    if not ids:
+        return "FALSE", []
+
+    column = dimension_id_column(dimension)
+    if len(ids) == 1:
+        return f"{column} = ?", ids
+    placeholders = ", ".join("?" for _ in ids)
+    return f"{column} IN ({placeholders})", ids
+
+
+def top_values_sql(dimension: str, where_clause: str = "1=1", limit: int = 10,
+                   count_alias: str = 'count', key_filter: Optional[str] = None,
+                   source: str = 'reddit_posts_view') -> str:
+    """Build a query ranking subreddits, authors or domains by post count.
+
+    Posts are grouped on the integer id and only the top ``limit`` groups are
+    joined back to the dimension table for their display name. Ties are
+    broken by id, so the ranking is stable across requests.
+
+    Args:
+        dimension: ``subreddit``, ``author`` or ``domain``
+        where_clause: Filter on ``reddit_posts_view``; its params are passed when executing
+        limit: Number of values to return
+        count_alias: Name of the count column
+        key_filter: Optional predicate on the dimension's lowercase ``key``,
+            e.g. ``"key NOT LIKE 'self.%'"``
+        source: Table or view of posts to rank, holding the dimension id columns
+
+    Returns:
+        SQL selecting ``(name, count, id)`` rows, most frequent first
+    """
+    column = dimension_id_column(dimension)
+    table = dimension_table(dimension)
+
+    if key_filter:
+        # Filter the grouped ids rather than the posts, so the key predicate
+        # runs once per distinct value instead of once per row
+        return f"""
+            SELECT {table}.name AS {dimension}, grouped.{count_alias}, grouped.{column}
+            FROM (
+                SELECT {column}, COUNT(*) AS {count_alias}
+                FROM {source}
+                WHERE {where_clause}
+                GROUP BY {column}
+            ) AS grouped
+            JOIN {table} ON {table}.id = grouped.{column}
+            WHERE {key_filter}
+            ORDER BY grouped.{count_alias} DESC, grouped.{column}
+            LIMIT {int(limit)}
+        """
+
+    return f"""
+        SELECT {table}.name AS {dimension}, top_values.{count_alias}, top_values.{column}
+        FROM (
+            SELECT {column}, COUNT(*) AS {count_alias}
+            FROM {source}
+            WHERE {where_clause}
+            GROUP BY {column}
+            ORDER BY {count_alias} DESC, {column}
+            LIMIT {int(limit)}
+        ) AS top_values
+        LEFT JOIN {table} ON {table}.id = top_values.{column}
+        ORDER BY top_values.{count_alias} DESC, top_values.{column}
+    """
@@ -0,0 +1,91 @@
+"""Streaming NDJSON/CSV export of query results.
+
+Rows are pulled from DuckDB ``EXPORT_BATCH_ROWS`` at a time with
+``fetchmany`` and each batch is encoded and yielded before the next one is
+fetched, so a Flask response streaming these generators (chunked transfer
+encoding) holds one batch in memory however many rows the query returns.
+"""
+
+import csv
+import io
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+DEFAULT_BATCH_ROWS = 5000
+
+# Export formats and their content types (``format`` request parameter)
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_batch_rows() -> int:
+    """Return the rows fetched per batch (``EXPORT_BATCH_ROWS``, default 5000)."""
+    return max(1, int(os.getenv('EXPORT_BATCH_ROWS', DEFAULT_BATCH_ROWS)))
+
+
+def fetch_batches(result, batch_rows: Optional[int] = None) -> Iterator[List[tuple]]:
+    """Yield the rows of an executed DuckDB query in batches of ``batch_rows``."""
+    batch_rows = batch_rows or export_batch_rows()
+    while True:
+        rows = result.fetchmany(batch_rows)
+        if not rows:
+            return
+        yield rows
+
+
+def stream_ndjson(result, columns: Sequence[str],
+                  convert: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                  batch_rows: Optional[int] = None) -> Iterator[str]:
+    """Encode query results as newline-delimited JSON, one chunk per batch.
+
+    Args:
+        result: Executed DuckDB query (connection or cursor after ``execute``)
+        columns: Names of the result columns, in order
+        convert: Optional function adjusting each row dict (e.g. formatting dates)
+        batch_rows: Rows per batch, see ``export_batch_rows``
+    """
+    for rows in fetch_batches(result, batch_rows):
+        lines = []
+        for row in rows:
+            record = dict(zip(columns, row))
+            if convert:
+                record = convert(record)
+            lines.append(json.dumps(record, ensure_ascii=False, default=str))
+        yield "\n".join(lines) + "\n"
+
+
+def stream_csv(result, columns: Sequence[str],
+               convert: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+               batch_rows: Optional[int] = None) -> Iterator[str]:
+    """Encode query results as CSV with a header row, one chunk per batch.
+
+    Args:
+        result: Executed DuckDB query (connection or cursor after ``execute``)
+        columns: Names of the result columns, in order
+        convert: Optional function adjusting each row dict (e.g. formatting dates)
+        batch_rows: Rows per batch, see ``export_batch_rows``
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for rows in fetch_batches(result, batch_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            if convert:
+                record = convert(dict(zip(columns, row)))
+                row = [record[column] for column in columns]
+            writer.writerow(row)
+        yield buffer.getvalue()
+
+
+# Encoder of each export format
+EXPORT_STREAMS = {
+    'ndjson': stream_ndjson,
+    'csv': stream_csv,
+}
@@ -0,0 +1,158 @@
+"""Compile API filter parameters into SQL predicates over the posts table."""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, List, Optional, Tuple
+
+from .dimensions import dimension_condition
+from .fulltext import keyword_condition, substring_condition
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def parse_date(value: str) -> datetime:
+    """Parse a ``YYYY-MM-DD`` request parameter as midnight UTC.
+
+    Raises:
+        ValueError: If the value is not a valid date
+    """
+    return datetime.strptime(value, DATE_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def date_range_conditions(start_date: Optional[str] = None,
+                          end_date: Optional[str] = None,
+                          start_name: str = 'start_date',
+                          end_name: str = 'end_date') -> Tuple[List[str], List[Any]]:
+    """Turn inclusive start/end dates into an epoch range on ``created_utc``.
+
+    The predicates compare the raw integer column against constants, so the
+    filter is a plain range scan that DuckDB can prune with row-group min/max
+    statistics instead of evaluating a date expression for every row.
+
+    Args:
+        start_date: First day to include (``YYYY-MM-DD``), inclusive
+        end_date: Last day to include (``YYYY-MM-DD``), inclusive
+        start_name: Request parameter name of the start date, used in errors
+        end_name: Request parameter name of the end date, used in errors
+
+    Returns:
+        Tuple of (conditions, positional params)
+
+    Raises:
+        ValueError: If either date is not in ``YYYY-MM-DD`` format
+    """
+    conditions = []
+    params = []
+
+    if start_date:
+        try:
+            start = parse_date(start_date)
+        except ValueError:
+            raise ValueError(f"Invalid {start_name} format. Use YYYY-MM-DD")
+        conditions.append("created_utc >= ?")
+        params.append(int(start.timestamp()))
+
+    if end_date:
+        try:
+            end = parse_date(end_date) + timedelta(days=1)
+        except ValueError:
+            raise ValueError(f"Invalid {end_name} format. Use YYYY-MM-DD")
+        conditions.append("created_utc < ?")
+        params.append(int(end.timestamp()))
+
+    return conditions, params
+
+
+# Filters understood by FilterSpec.from_args; 'dates' reads the start/end date parameters
+FILTER_FIELDS = ('keyword', 'subreddit', 'author', 'domain', 'dates')
+
+# How a keyword matches posts (``match`` request parameter): a plain
+# case-insensitive substring of the title or selftext (the default, as
+# keywords always matched), or, opted into with ``match=words``, whole words
+# through the inverted index with AND/OR/phrase/prefix syntax
+MATCH_MODES = ('substring', 'words')
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """The keyword/subreddit/author/domain/date filters shared by the data endpoints.
+
+    Every endpoint compiles its filters through ``compile``, which always
+    emits the predicates in the same order and with placeholders for every
+    value, so equal combinations of filters produce byte-identical SQL that
+    the prepared statement cache can reuse.
+    """
+
+    keyword: str = ''
+    subreddit: str = ''
+    author: str = ''
+    domain: str = ''
+    start_date: str = ''
+    end_date: str = ''
+    start_name: str = 'start_date'
+    end_name: str = 'end_date'
+    match: str = 'substring'
+
+    @classmethod
+    def from_args(cls, args, fields: Iterable[str] = FILTER_FIELDS,
+                  start_name: str = 'start_date', end_name: str = 'end_date',
+                  match: str = 'substring') -> 'FilterSpec':
+        """Read the filters an endpoint supports from its request arguments.
+
+        Args:
+            args: Request arguments (``request.args``)
+            fields: Filters the endpoint supports, a subset of ``FILTER_FIELDS``
+            start_name: Request parameter holding the first day to include
+            end_name: Request parameter holding the last day to include
+            match: Keyword match mode used when the request has no ``match``, see ``MATCH_MODES``
+
+        Returns:
+            The filter spec; unsupported or missing filters are left empty
+        """
+        values = {name: args.get(name, '') for name in fields if name != 'dates'}
+        if 'dates' in fields:
+            values['start_date'] = args.get(start_name, '')
+            values['end_date'] = args.get(end_name, '')
+        if 'keyword' in fields:
+            match = args.get('match') or match
+        return cls(start_name=start_name, end_name=end_name, match=match, **values)
+
+    def compile(self, db_connection) -> Tuple[str, List[Any]]:
+        """Compile the filters into a WHERE clause over ``reddit_posts_view``.
+
+        Args:
+            db_connection: DuckDB connection or cursor used to resolve dimension ids
+
+        Returns:
+            Tuple of (where clause, positional params); ``"1=1"`` without filters
+
+        Raises:
+            ValueError: If a date is not in ``YYYY-MM-DD`` format or the match mode is unknown
+        """
+        conditions = []
+        params = []
+
+        if self.match not in MATCH_MODES:
+            raise ValueError(f"Invalid match. Use one of: {', '.join(MATCH_MODES)}")
+
+        if self.keyword:
+            compile_keyword = substring_condition if self.match == 'substring' else keyword_condition
+            condition, condition_params = compile_keyword(self.keyword)
+            conditions.append(condition)
+            params.extend(condition_params)
+
+        for dimension in ('subreddit', 'author', 'domain'):
+            value = getattr(self, dimension)
+            if value:
+                condition, condition_params = dimension_condition(db_connection, dimension, value)
+                conditions.append(condition)
+                params.extend(condition_params)
+
+        date_conditions, date_params = date_range_conditions(
+            self.start_date, self.end_date, self.start_name, self.end_name
+        )
+        conditions.extend(date_conditions)
+        params.extend(date_params)
+
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        return where_clause, params
@@ -0,0 +1,272 @@
+"""Keyword search over the inverted index of post words built at ingest time.
+
+Every post's title and selftext are split into lowercase words stored as
+``(term, post_id)`` rows of ``post_terms`` (see ``ingest.schema``). A
+keyword filter then looks its words up in that small, term-sorted table and
+keeps the posts whose id is among the hits, instead of
+lowercasing and scanning the text of every post.
+
+Keyword syntax::
+
+    climate change          both words, anywhere in the post
+    climate OR weather      either word
+    "climate change"        the words next to each other, in this order
+    climat*                 any word starting with "climat"
+
+Words are maximal runs of letters and digits, so matching is by whole word
+(``cat`` does not match ``category``; use ``cat*`` for that). Endpoints only
+use this syntax when asked with ``match=words``.
+
+``substring_condition`` is the default plain substring match (``ukrain``
+matches ``Ukraine`` and ``Ukrainian``). When the snapshot was built with the
+optional trigram index (``INGEST_TRIGRAMS=1``), it first narrows the posts
+down to those holding every trigram of the keyword, so the exact LIKE only
+runs on those candidates rather than on every post.
+"""
+
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, List, Tuple
+
+from ingest.schema import MAX_TERM_LENGTH, TERMS_TABLE, TRIGRAMS_TABLE
+
+# Same split as the index's TERM_SPLIT_PATTERN: runs of letters and digits
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+# Regex class of the characters between words, for phrase verification in DuckDB (RE2)
+SEPARATOR_CLASS = r"[^\pL\pN]"
+
+# A quoted phrase, an OR operator or any other whitespace-separated chunk
+QUERY_TOKEN_PATTERN = re.compile(r'"([^"]*)"?|(\S+)')
+
+# Case-insensitive substring match of a keyword in the title or body; takes the keyword twice
+SUBSTRING_CONDITION = "(LOWER(title) LIKE '%' || LOWER(?) || '%' OR LOWER(selftext) LIKE '%' || LOWER(?) || '%')"
+
+# Text the index is built from
+POST_TEXT = "LOWER(COALESCE(title, '') || ' ' || COALESCE(selftext, ''))"
+
+# Whether the attached snapshot has the trigram index, see ``set_trigram_index``
+_trigram_index = False
+
+
+def set_trigram_index(available: bool):
+    """Record whether the ``post_trigrams`` view is available to substring matches."""
+    global _trigram_index
+    _trigram_index = available
+
+
+def trigram_index_available() -> bool:
+    """Tell whether substring matches are narrowed through the trigram index."""
+    return _trigram_index
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into the lowercase words the index stores."""
+    return WORD_PATTERN.findall(text.lower())
+
+
+@dataclass(frozen=True)
+class Clause:
+    """One word, word prefix or phrase of a keyword query."""
+
+    terms: Tuple[str, ...]
+    prefix: bool = False
+
+
+def parse_query(keyword: str) -> List[List[Clause]]:
+    """Parse a keyword query into OR-ed groups of AND-ed clauses.
+
+    Returns:
+        Groups of clauses; empty if the keyword holds no word at all
+    """
+    groups: List[List[Clause]] = [[]]
+    for match in QUERY_TOKEN_PATTERN.finditer(keyword):
+        phrase, chunk = match.groups()
+        if chunk == 'OR':
+            if groups[-1]:
+                groups.append([])
+            continue
+
+        text = phrase if phrase is not None else chunk
+        terms = tuple(tokenize(text))
+        if not terms:
+            continue
+        prefix = phrase is None and len(terms) == 1 and text.endswith('*')
+        groups[-1].append(Clause(terms, prefix))
+
+    return [group for group in groups if group]
+
+
+def _term_condition(term: str, prefix: bool = False) -> Tuple[str, List[Any]]:
+    if prefix:
+        # Words hold only letters and digits, so they never contain LIKE wildcards
+        return f"id IN (SELECT post_id FROM {TERMS_TABLE} WHERE term LIKE ?)", [term + '%']
+    return f"id IN (SELECT post_id FROM {TERMS_TABLE} WHERE term = ?)", [term]
+
+
+def _clause_condition(clause: Clause) -> Tuple[str, List[Any]]:
+    if any(len(term) > MAX_TERM_LENGTH for term in clause.terms):
+        # Not in the index; fall back to scanning the text
+        text = " ".join(clause.terms)
+        return SUBSTRING_CONDITION, [text, text]
+
+    if len(clause.terms) == 1:
+        return _term_condition(clause.terms[0], clause.prefix)
+
+    conditions = []
+    params: List[Any] = []
+    for term in dict.fromkeys(clause.terms):
+        condition, condition_params = _term_condition(term)
+        conditions.append(condition)
+        params.extend(condition_params)
+
+    # The index narrows the posts down to those holding every word; check they are adjacent
+    separator = SEPARATOR_CLASS + "+"
+    pattern = f"(^|{SEPARATOR_CLASS})" + separator.join(clause.terms) + f"({SEPARATOR_CLASS}|$)"
+    conditions.append(f"regexp_matches({POST_TEXT}, ?)")
+    params.append(pattern)
+    return "(" + " AND ".join(conditions) + ")", params
+
+
+def keyword_condition(keyword: str) -> Tuple[str, List[Any]]:
+    """Compile a keyword query into a predicate over ``reddit_posts_view``.
+
+    A keyword without any word (e.g. ``"++"``) keeps the old substring match.
+
+    Returns:
+        Tuple of (condition, positional params)
+    """
+    groups = parse_query(keyword)
+    if not groups:
+        return SUBSTRING_CONDITION, [keyword, keyword]
+
+    alternatives = []
+    params: List[Any] = []
+    for group in groups:
+        conditions = []
+        for clause in group:
+            condition, clause_params = _clause_condition(clause)
+            conditions.append(condition)
+            params.extend(clause_params)
+        alternatives.append(" AND ".join(conditions))
+
+    if len(alternatives) == 1:
+        return f"({alternatives[0]})", params
+    return "(" + " OR ".join(f"({alternative})" for alternative in alternatives) + ")", params
+
+
+def keyword_trigrams(keyword: str) -> List[str]:
+    """Return the distinct trigrams of a lowercased keyword, in order of appearance."""
+    text = keyword.lower()
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def substring_condition(keyword: str) -> Tuple[str, List[Any]]:
+    """Compile a keyword into a case-insensitive substring match on the title or selftext.
+
+    With the trigram index available, keywords of three or more characters
+    only have their LIKE evaluated on posts holding all of their trigrams.
+    Keywords with LIKE wildcards (``%``, ``_``) keep matching them as
+    wildcards and skip the index, which only knows literal characters.
+
+    Returns:
+        Tuple of (condition, positional params)
+    """
+    trigrams = keyword_trigrams(keyword)
+    if not _trigram_index or not trigrams or any(char in keyword for char in '%_'):
+        return SUBSTRING_CONDITION, [keyword, keyword]
+
+    placeholders = ", ".join("?" for _ in trigrams)
+    candidates = (
+        f"id IN (SELECT post_id FROM {TRIGRAMS_TABLE} WHERE trigram IN ({placeholders}) "
+        f"GROUP BY post_id HAVING COUNT(*) = ?)"
+    )
+    return f"({candidates} AND {SUBSTRING_CONDITION})", trigrams + [len(trigrams), keyword, keyword]
+
+
+def any_substring_condition(keywords: List[str]) -> Tuple[str, List[Any]]:
+    """Compile free-form keywords into a predicate matching posts containing any of them.
+
+    Used by the chat engines, whose keywords come from natural language and
+    should also match longer forms of the word (``elect`` matches ``election``).
+
+    Returns:
+        Tuple of (condition, positional params)
+    """
+    conditions = []
+    params: List[Any] = []
+    for keyword in keywords:
+        condition, condition_params = substring_condition(keyword)
+        conditions.append(condition)
+        params.extend(condition_params)
+    if len(conditions) == 1:
+        return conditions[0], params
+    return "(" + " OR ".join(conditions) + ")", params
+
+
+def benchmark(db_connection, keyword: str, repeat: int = 5) -> dict:
+    """Time counting the posts matching a keyword through the indexes and through LIKE.
+
+    Args:
+        db_connection: DuckDB connection with ``reddit_posts_view`` and ``post_terms``
+        keyword: Keyword query
+        repeat: Runs of each query; the fastest one is reported
+
+    Returns:
+        Matches and best time in milliseconds of each path; ``trigram`` only
+        when the trigram index is available
+    """
+    def best_of(sql: str, params: List[Any]) -> Tuple[int, float]:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            matches = db_connection.execute(sql, params).fetchone()[0]
+            timings.append(time.perf_counter() - started)
+        return matches, round(min(timings) * 1000, 3)
+
+    condition, params = keyword_condition(keyword)
+    index_matches, index_ms = best_of(f"SELECT COUNT(*) FROM reddit_posts_view WHERE {condition}", params)
+    like_matches, like_ms = best_of(
+        f"SELECT COUNT(*) FROM reddit_posts_view WHERE {SUBSTRING_CONDITION}", [keyword, keyword]
+    )
+    result = {
+        "keyword": keyword,
+        "index": {"matches": index_matches, "ms": index_ms},
+        "like": {"matches": like_matches, "ms": like_ms},
+    }
+    if _trigram_index:
+        condition, params = substring_condition(keyword)
+        trigram_matches, trigram_ms = best_of(f"SELECT COUNT(*) FROM reddit_posts_view WHERE {condition}", params)
+        result["trigram"] = {"matches": trigram_matches, "ms": trigram_ms}
+    return result
+
+
+if __name__ == '__main__':
+    # Compare the index against the LIKE scan on a built snapshot:
+    #   python -m query.fulltext data/reddit_posts.duckdb climate "climate change"
+    import duckdb
+
+    from ingest.schema import POSTS_TABLE, has_table, posts_view_sql, terms_view_sql, trigrams_view_sql
+    from ingest.snapshot import SNAPSHOT_ALIAS, attach_snapshot
+
+    if len(sys.argv) < 3:
+        print("Usage: python -m query.fulltext <snapshot.duckdb> <keyword> [keyword ...]")
+        sys.exit(1)
+
+    bench_con = duckdb.connect()
+    attach_snapshot(bench_con, sys.argv[1], read_only=True)
+    bench_con.execute(posts_view_sql(f"{SNAPSHOT_ALIAS}.{POSTS_TABLE}"))
+    bench_con.execute(terms_view_sql(SNAPSHOT_ALIAS))
+    if has_table(bench_con, TRIGRAMS_TABLE, SNAPSHOT_ALIAS):
+        bench_con.execute(trigrams_view_sql(SNAPSHOT_ALIAS))
+        set_trigram_index(True)
+    for query in sys.argv[2:]:
+        result = benchmark(bench_con, query)
+        speedup = result["like"]["ms"] / result["index"]["ms"] if result["index"]["ms"] else float('inf')
+        print(f"{query!r}: index {result['index']['matches']} matches in {result['index']['ms']} ms, "
+              f"LIKE {result['like']['matches']} matches in {result['like']['ms']} ms ({speedup:.1f}x)")
+        if "trigram" in result:
+            print(f"{'':>{len(repr(query))}}  trigram + LIKE {result['trigram']['matches']} matches "
+                  f"in {result['trigram']['ms']} ms")
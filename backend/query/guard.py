@@ -0,0 +1,274 @@
+"""Time budgets and cost checks for the heavy analytics endpoints.
+
+Every guarded request gets a time budget (``QUERY_BUDGETS``). When it runs
+out, the request's cursor is interrupted with DuckDB's ``interrupt()``, and
+again every ``INTERRUPT_INTERVAL`` seconds until the view returns, so no
+query of that request keeps the database busy past its budget. The request is
+then answered with 503 instead of its result.
+
+Before running an expensive query, a view can ask for its estimated row
+count (``estimate_rows``, from ``EXPLAIN``) and compare it with the
+endpoint's limit (``QUERY_MAX_ROWS``), to downgrade the request, e.g. by
+sampling, or reject it with ``QueryTooExpensive``.
+
+Cancellations, rejections and downgrades are logged as one JSON object per
+event, and counted and kept in a short history reported by ``/api/health``.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from flask import g, has_request_context, jsonify, make_response, request
+
+from .cache import parse_ttls
+from .pool import request_cursor
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Seconds a request may run before its queries are interrupted; 0 disables the budget
+DEFAULT_BUDGET = 30
+DEFAULT_BUDGETS = {
+    'network': 30,
+    'topics': 60,
+}
+
+# Largest estimated row count an endpoint accepts before downgrading or rejecting a request
+DEFAULT_MAX_ROWS = {
+    # Rows of the network's node-pair self-join
+    'network': 20_000_000,
+    # Posts fitted by the topic model
+    'topics': 20_000,
+}
+
+# Seconds between repeated interrupts once a budget has run out
+INTERRUPT_INTERVAL = 0.1
+
+# Number of guard events kept for /api/health
+DEFAULT_HISTORY = 50
+
+# An operator's estimated cardinality in a text plan: ``EC: 1234`` or ``~1,234 rows``
+ESTIMATE_PATTERN = re.compile(r"(?:\bEC:\s*|~)(\d[\d,]*)")
+
+# Attribute of ``flask.g`` holding the deadline of the current request
+_REQUEST_DEADLINE = 'query_deadline'
+
+# Event kinds
+CANCELLED = 'cancelled'
+REJECTED = 'rejected'
+DOWNGRADED = 'downgraded'
+
+
+class QueryTooExpensive(Exception):
+    """Raised when a request's estimated cost exceeds its endpoint's limit."""
+
+    def __init__(self, estimated_rows: int, max_rows: int):
+        super().__init__(f"Request too expensive: about {estimated_rows} rows, the limit is {max_rows}")
+        self.estimated_rows = estimated_rows
+        self.max_rows = max_rows
+
+
+class Deadline:
+    """Interrupts a cursor's queries once ``seconds`` have passed, until the deadline is left.
+
+    Views fanning queries out to more cursors ``watch`` them so they are
+    interrupted too, and ``unwatch`` them before giving them back to the pool.
+    """
+
+    def __init__(self, cursor, seconds: float):
+        self.cursors = [cursor]
+        self.seconds = seconds
+        self.expired = False
+        self.started = 0.0
+        self._done = False
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'Deadline':
+        self.started = time.perf_counter()
+        self._schedule(self.seconds)
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self._done = True
+            if self._timer is not None:
+                self._timer.cancel()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def watch(self, cursor):
+        """Interrupt ``cursor`` along with the request's own cursor."""
+        with self._lock:
+            self.cursors.append(cursor)
+            if self.expired and not self._done:
+                cursor.interrupt()
+
+    def unwatch(self, cursor):
+        """Stop interrupting ``cursor``, e.g. before it returns to the pool."""
+        with self._lock:
+            self.cursors.remove(cursor)
+
+    def _schedule(self, delay: float):
+        self._timer = threading.Timer(delay, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self):
+        with self._lock:
+            if self._done:
+                return
+            self.expired = True
+            # An idle cursor ignores the interrupt, so keep interrupting
+            # until the view returns in case it starts another query
+            for cursor in self.cursors:
+                cursor.interrupt()
+            self._schedule(INTERRUPT_INTERVAL)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Return the deadline of the current guarded request, if any."""
+    return g.get(_REQUEST_DEADLINE) if has_request_context() else None
+
+
+def estimate_rows(db_connection, sql: str, params=None) -> int:
+    """Return DuckDB's estimated cardinality of a query's result, from ``EXPLAIN``.
+
+    Reads the text plan, which every DuckDB version renders: each operator's
+    box ends with its estimate, ``EC: 1234`` in older versions and
+    ``~1,234 rows`` in newer ones. Operators are listed from the result down,
+    so the first positive estimate is the result's; the projections DuckDB
+    adds around compressed columns report 0 and are skipped.
+    """
+    plan = db_connection.execute(f"EXPLAIN {sql}", list(params or [])).fetchall()
+    for _, text in plan:
+        for match in ESTIMATE_PATTERN.finditer(text):
+            estimate = int(match.group(1).replace(",", ""))
+            if estimate > 0:
+                return estimate
+    return 0
+
+
+class QueryGuard:
+    """Per-endpoint time budgets and cost limits, with a log of what they stopped."""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, max_rows: Optional[Dict[str, int]] = None,
+                 default_budget: int = DEFAULT_BUDGET, history: int = DEFAULT_HISTORY):
+        """Initialize the guard.
+
+        Args:
+            budgets: Seconds each endpoint may run; 0 disables the budget
+            max_rows: Largest estimated row count each endpoint accepts
+            default_budget: Seconds for endpoints without an entry in ``budgets``
+            history: Number of recent events kept
+        """
+        self.budgets = dict(budgets or {})
+        self.limits = dict(max_rows or {})
+        self.default_budget = default_budget
+        self._events: deque = deque(maxlen=history)
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, endpoint: str) -> int:
+        """Return the seconds ``endpoint`` may run (0 when unbounded)."""
+        return self.budgets.get(endpoint, self.default_budget)
+
+    def max_rows(self, endpoint: str) -> Optional[int]:
+        """Return the largest estimated row count ``endpoint`` accepts, or None when unlimited."""
+        return self.limits.get(endpoint) or None
+
+    def guarded(self, endpoint: str):
+        """Decorate a Flask view so its queries are interrupted once the endpoint's budget runs out."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                budget = self.budget(endpoint)
+                if not budget:
+                    return view(*args, **kwargs)
+
+                with Deadline(request_cursor(), budget) as deadline:
+                    g.setdefault(_REQUEST_DEADLINE, deadline)
+                    response = make_response(view(*args, **kwargs))
+                if not deadline.expired or response.status_code < 500:
+                    return response
+
+                # The view failed on an interrupted query
+                self.record(endpoint, CANCELLED, 'timeout', budget_seconds=budget,
+                            elapsed_seconds=round(deadline.elapsed, 3))
+                return make_response(jsonify({
+                    "error": f"Query exceeded the {budget}s time budget of this endpoint",
+                    "reason": "timeout",
+                    "budget_seconds": budget,
+                }), 503)
+            return wrapper
+        return decorator
+
+    def rejection(self, endpoint: str, error: QueryTooExpensive):
+        """Record a rejected request and build its 422 response."""
+        self.record(endpoint, REJECTED, 'estimated_rows', estimated_rows=error.estimated_rows,
+                    max_rows=error.max_rows)
+        return jsonify({
+            "error": str(error),
+            "reason": "estimated_rows",
+            "estimated_rows": error.estimated_rows,
+            "max_rows": error.max_rows,
+        }), 422
+
+    def record(self, endpoint: str, event: str, reason: str, **details: Any):
+        """Log and count a cancelled, rejected or downgraded request.
+
+        Args:
+            endpoint: Name of the guarded endpoint
+            event: ``cancelled``, ``rejected`` or ``downgraded``
+            reason: Why, e.g. ``timeout`` or ``estimated_rows``
+            details: Numbers behind the decision (budget, estimates, limits)
+        """
+        entry = {
+            "time": time.time(),
+            "endpoint": endpoint,
+            "event": event,
+            "reason": reason,
+            "params": request.args.to_dict() if has_request_context() else {},
+            **details,
+        }
+        with self._lock:
+            self._events.append(entry)
+            counters = self._counters.setdefault(endpoint, {CANCELLED: 0, REJECTED: 0, DOWNGRADED: 0})
+            counters[event] = counters.get(event, 0) + 1
+        logger.warning(f"Query guard: {json.dumps(entry, default=str)}")
+
+    def stats(self) -> dict:
+        """Report the budgets, the counts per endpoint and the most recent events."""
+        with self._lock:
+            return {
+                "budgets": {**self.budgets, "default": self.default_budget},
+                "max_rows": dict(self.limits),
+                "endpoints": {name: dict(counters) for name, counters in self._counters.items()},
+                "recent": list(self._events),
+            }
+
+
+def create_query_guard() -> QueryGuard:
+    """Build the guard from the environment.
+
+    ``QUERY_BUDGETS="network=10,topics=120"`` overrides the per-endpoint time
+    budgets in seconds and ``QUERY_BUDGET`` the default one;
+    ``QUERY_MAX_ROWS="network=5000000"`` overrides the cost limits. A value
+    of 0 disables the budget or limit.
+    """
+    budgets = dict(DEFAULT_BUDGETS)
+    budgets.update(parse_ttls(os.getenv('QUERY_BUDGETS', '')))
+    max_rows = dict(DEFAULT_MAX_ROWS)
+    max_rows.update(parse_ttls(os.getenv('QUERY_MAX_ROWS', '')))
+    guard = QueryGuard(budgets, max_rows, default_budget=int(os.getenv('QUERY_BUDGET', DEFAULT_BUDGET)))
+    logger.info(f"Query guard initialized (default budget: {guard.default_budget}s)")
+    return guard
@@ -0,0 +1,115 @@
+"""Keyset pagination and optional, cheaper result totals for post listings.
+
+Pages are ordered by ``(created_utc, id)`` descending. Instead of an OFFSET,
+which makes DuckDB produce and discard every earlier row, a page carries an
+opaque cursor holding the sort key of its last row and the next page starts
+right after it, so every page costs the same however deep it is.
+"""
+
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+
+from .prepared import execute_prepared
+
+# Order of the listing; ids break ties between posts created in the same second
+KEYSET_ORDER = "created_utc DESC NULLS LAST, id DESC"
+
+# Ways of computing the number of matching posts (``total`` request parameter)
+TOTAL_MODES = ('exact', 'estimate', 'bounded', 'none')
+
+# Relation of the reported total to the real number of matches
+TOTAL_EXACT = 'eq'
+TOTAL_APPROXIMATE = 'approx'
+TOTAL_LOWER_BOUND = 'gte'
+
+# ``bounded`` totals stop counting after this many matches
+DEFAULT_TOTAL_LIMIT = 10000
+
+# Below this many posts an estimate is not worth it and the count is exact
+ESTIMATE_MIN_ROWS = 1000000
+ESTIMATE_SAMPLE_PERCENT = 10
+
+
+def encode_cursor(created_utc: Optional[int], post_id: str) -> str:
+    """Encode the sort key of a page's last row as an opaque, URL-safe cursor."""
+    payload = json.dumps([created_utc, post_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[int], str]:
+    """Decode a cursor made by ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_utc, post_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(post_id, str) or not (created_utc is None or isinstance(created_utc, int)):
+        raise ValueError("Invalid cursor")
+    return created_utc, post_id
+
+
+def keyset_condition(cursor: str) -> Tuple[str, List[Any]]:
+    """Compile a cursor into a predicate selecting the rows after it in ``KEYSET_ORDER``.
+
+    Returns:
+        Tuple of (condition, positional params)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    created_utc, post_id = decode_cursor(cursor)
+    if created_utc is None:
+        # Posts without a timestamp sort last
+        return "(created_utc IS NULL AND id < ?)", [post_id]
+    return (
+        "(created_utc < ? OR (created_utc = ? AND id < ?) OR created_utc IS NULL)",
+        [created_utc, created_utc, post_id]
+    )
+
+
+def count_matches(db_connection, where_clause: str, params: List[Any], mode: str = 'exact',
+                  limit: int = DEFAULT_TOTAL_LIMIT) -> Tuple[Optional[int], Optional[str]]:
+    """Count the posts matching a filter as precisely as ``mode`` asks for.
+
+    Args:
+        db_connection: DuckDB connection or cursor
+        where_clause: Filter on ``reddit_posts_view``
+        params: Positional params of the filter
+        mode: ``exact``; ``estimate`` (extrapolated from a sample on large
+            datasets); ``bounded`` (counts at most ``limit`` matches); ``none``
+        limit: Number of matches a ``bounded`` count stops at
+
+    Returns:
+        Tuple of (total, relation), where relation is ``TOTAL_EXACT``,
+        ``TOTAL_APPROXIMATE`` or ``TOTAL_LOWER_BOUND``; ``(None, None)`` for ``none``
+    """
+    if mode == 'none':
+        return None, None
+
+    if mode == 'bounded':
+        total = execute_prepared(db_connection, f"""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM reddit_posts_view WHERE {where_clause} LIMIT ?
+            )
+        """, params + [limit + 1]).fetchone()[0]
+        if total > limit:
+            return limit, TOTAL_LOWER_BOUND
+        return total, TOTAL_EXACT
+
+    if mode == 'estimate' and where_clause != "1=1":
+        rows = db_connection.execute("SELECT COUNT(*) FROM reddit_posts_view").fetchone()[0]
+        if rows >= ESTIMATE_MIN_ROWS:
+            sampled = execute_prepared(db_connection, f"""
+                SELECT COUNT(*)
+                FROM reddit_posts_view TABLESAMPLE {ESTIMATE_SAMPLE_PERCENT}% (system)
+                WHERE {where_clause}
+            """, params).fetchone()[0]
+            return round(sampled * 100 / ESTIMATE_SAMPLE_PERCENT), TOTAL_APPROXIMATE
+
+    total = execute_prepared(db_connection, f"SELECT COUNT(*) FROM reddit_posts_view WHERE {where_clause}", params).fetchone()[0]
+    return total, TOTAL_EXACT
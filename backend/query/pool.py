@@ -0,0 +1,194 @@
+"""Pool of DuckDB cursors so concurrent requests query the database in parallel.
+
+A single DuckDB connection serializes every query issued through it. Each
+cursor (``db_connection.cursor()``) is an independent connection to the same
+database, sharing its catalog, attached snapshot and views, so requests
+holding different cursors run on DuckDB's thread pool side by side.
+
+Each request takes one cursor from the pool on first use and returns it when
+the request ends. Code running outside a request (background threads, module
+initialization) gets a cursor of its own per thread.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+
+from flask import g, has_app_context
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_ACQUIRE_TIMEOUT = 30.0
+
+
+class PoolTimeout(Exception):
+    """Raised when no cursor becomes free within the acquire timeout."""
+
+
+class CursorPool:
+    """Bounded pool of cursors over one DuckDB connection."""
+
+    def __init__(self, db_connection, size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_ACQUIRE_TIMEOUT):
+        """Initialize the pool; cursors are created lazily, up to ``size``.
+
+        Args:
+            db_connection: DuckDB connection the cursors are opened on
+            size: Maximum number of cursors handed out at once
+            timeout: Seconds to wait for a free cursor before giving up
+        """
+        self.db_connection = db_connection
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle: 'queue.LifoQueue' = queue.LifoQueue()
+        self._created = 0
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._thread_cursors = threading.local()
+
+        # Wait time metrics
+        self.acquisitions = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def acquire(self):
+        """Take a cursor from the pool, opening one if the pool is not full yet.
+
+        Returns:
+            A DuckDB cursor; give it back with ``release``
+
+        Raises:
+            PoolTimeout: If every cursor stays busy for ``timeout`` seconds
+        """
+        started = time.perf_counter()
+        cursor = self._take_idle_or_new()
+        if cursor is None:
+            try:
+                cursor = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self.timeouts += 1
+                raise PoolTimeout(f"No database cursor became free within {self.timeout:g}s")
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self.acquisitions += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if waited >= 0.001:
+                self.waits += 1
+        return cursor
+
+    def _take_idle_or_new(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return self.db_connection.cursor()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, cursor):
+        """Return a cursor taken with ``acquire`` to the pool."""
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(cursor)
+
+    def thread_cursor(self):
+        """Return the cursor owned by the calling thread, for use outside requests."""
+        cursor = getattr(self._thread_cursors, 'cursor', None)
+        if cursor is None:
+            cursor = self.db_connection.cursor()
+            self._thread_cursors.cursor = cursor
+        return cursor
+
+    def stats(self) -> dict:
+        """Report the pool size, cursors in use and how long requests waited for one."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "acquisitions": self.acquisitions,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_seconds / self.acquisitions * 1000, 3) if self.acquisitions else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+# Attribute of ``flask.g`` holding the cursor of the current request
+_REQUEST_CURSOR = 'db_cursor'
+
+pool: Optional[CursorPool] = None
+
+
+def init_pool(app, db_connection, size: int = DEFAULT_POOL_SIZE,
+              timeout: float = DEFAULT_ACQUIRE_TIMEOUT) -> CursorPool:
+    """Create the cursor pool and return each request's cursor when the request ends.
+
+    Args:
+        app: Flask application instance
+        db_connection: DuckDB connection the cursors are opened on
+        size: Maximum number of cursors handed out at once
+        timeout: Seconds a request waits for a free cursor
+
+    Returns:
+        The pool
+    """
+    global pool
+
+    pool = CursorPool(db_connection, size=size, timeout=timeout)
+
+    @app.teardown_appcontext
+    def release_request_cursor(exception=None):
+        cursor = g.pop(_REQUEST_CURSOR, None)
+        if cursor is not None:
+            pool.release(cursor)
+
+    logger.info(f"Database cursor pool initialized (size: {pool.size})")
+    return pool
+
+
+def request_cursor():
+    """Return the cursor of the current request, taking one from the pool on first use.
+
+    Outside a request the calling thread's own cursor is returned instead.
+    """
+    if not has_app_context():
+        return pool.thread_cursor()
+
+    cursor = g.get(_REQUEST_CURSOR)
+    if cursor is None:
+        cursor = pool.acquire()
+        g.setdefault(_REQUEST_CURSOR, cursor)
+    return cursor
+
+
+class PooledConnection:
+    """Connection-like object running every call on the current request's cursor.
+
+    Lets modules written against a single connection (``db_connection.execute``)
+    share the pool without knowing about it.
+    """
+
+    def execute(self, *args, **kwargs):
+        return request_cursor().execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(request_cursor(), name)
@@ -0,0 +1,180 @@
+"""Per-connection cache of DuckDB prepared statements keyed by query shape.
+
+``db_connection.execute(sql, params)`` parses, binds and plans ``sql`` on
+every call. The API only issues a small set of query shapes (the filters
+compile to canonical SQL, see ``query.filters.FilterSpec``), so each shape is
+``PREPARE``d once per connection and later calls only ``EXECUTE`` it with the
+new parameter values.
+
+Plans are built with the statistics of the tables at PREPARE time, which
+appends make stale (e.g. the range of a dimension id a perfect-hash
+aggregate is sized for), so a cache deallocates its statements whenever
+the dataset version changes and prepares them again.
+
+The Python client cannot bind parameters to an ``EXECUTE`` statement, so the
+values are rendered as SQL literals. Only plain scalars are rendered; any
+other value makes the call fall back to a regular parameterized execute.
+"""
+
+import logging
+import math
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from ingest.version import current_version
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_STATEMENTS = 256
+
+# Single-quoted string literals (with '' escapes), double-quoted identifiers or a ? placeholder
+_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\?")
+
+
+class PreparedStatementCache:
+    """LRU cache of the statements prepared on one DuckDB connection or cursor."""
+
+    def __init__(self, db_connection, max_statements: int = DEFAULT_MAX_STATEMENTS):
+        """Initialize the cache.
+
+        Args:
+            db_connection: DuckDB connection or cursor the statements are prepared on
+            max_statements: Number of prepared statements kept before the least
+                recently used one is deallocated
+        """
+        self.db_connection = db_connection
+        self.max_statements = max_statements
+        self.hits = 0
+        self.misses = 0
+        self._statements: 'OrderedDict[str, str]' = OrderedDict()
+        self._counter = 0
+        self._version = current_version()
+        self._lock = threading.Lock()
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None):
+        """Execute ``sql`` with ``?`` placeholders through a cached prepared statement.
+
+        Args:
+            sql: Query with positional ``?`` placeholders
+            params: Values of the placeholders
+
+        Returns:
+            The connection, ready to fetch results, like ``db_connection.execute``
+        """
+        params = list(params or [])
+        literals = _render_literals(params)
+        if literals is None:
+            return self.db_connection.execute(sql, params)
+
+        shape = sql
+        with self._lock:
+            version = current_version()
+            if version != self._version:
+                self._deallocate_all()
+                self._version = version
+
+            name = self._statements.get(shape)
+            if name is None:
+                name = self._prepare(shape, len(params))
+                if name is None:
+                    return self.db_connection.execute(sql, params)
+                self.misses += 1
+            else:
+                self._statements.move_to_end(shape)
+                self.hits += 1
+
+            arguments = f"({', '.join(literals)})" if literals else ""
+            return self.db_connection.execute(f"EXECUTE {name}{arguments}")
+
+    def _prepare(self, shape: str, param_count: int) -> Optional[str]:
+        numbered, placeholders = _number_placeholders(shape)
+        if placeholders != param_count:
+            return None
+
+        self._counter += 1
+        name = f"api_stmt_{self._counter}"
+        try:
+            self.db_connection.execute(f"PREPARE {name} AS {numbered}")
+        except Exception as e:
+            # Statements DuckDB cannot prepare are simply executed directly
+            logger.debug(f"Not caching statement that cannot be prepared: {str(e)}")
+            return None
+
+        self._statements[shape] = name
+        if len(self._statements) > self.max_statements:
+            _, evicted = self._statements.popitem(last=False)
+            self.db_connection.execute(f"DEALLOCATE {evicted}")
+        return name
+
+    def clear(self):
+        """Deallocate every cached statement."""
+        with self._lock:
+            self._deallocate_all()
+
+    def _deallocate_all(self):
+        for name in self._statements.values():
+            try:
+                self.db_connection.execute(f"DEALLOCATE {name}")
+            except Exception:
+                pass
+        self._statements.clear()
+
+    def stats(self) -> dict:
+        """Return the number of cached statements and the cache hit/miss counts."""
+        return {"statements": len(self._statements), "hits": self.hits, "misses": self.misses}
+
+
+def _number_placeholders(sql: str):
+    """Rewrite ``?`` placeholders outside of literals as ``$1``, ``$2``, ..."""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(0) != '?':
+            return match.group(0)
+        count += 1
+        return f"${count}"
+
+    return _TOKEN_PATTERN.sub(replace, sql), count
+
+
+def _render_literals(params: Sequence[Any]) -> Optional[list]:
+    """Render parameter values as SQL literals, or return None if one cannot be."""
+    literals = []
+    for value in params:
+        if value is None:
+            literals.append("NULL")
+        elif isinstance(value, bool):
+            literals.append("TRUE" if value else "FALSE")
+        elif isinstance(value, int):
+            literals.append(str(value))
+        elif isinstance(value, float) and math.isfinite(value):
+            literals.append(repr(value))
+        elif isinstance(value, str) and '\x00' not in value:
+            literals.append("'" + value.replace("'", "''") + "'")
+        else:
+            return None
+    return literals
+
+
+_caches: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def prepared_statements(db_connection) -> PreparedStatementCache:
+    """Return the prepared statement cache of a connection or cursor, creating it on first use."""
+    with _caches_lock:
+        cache = _caches.get(db_connection)
+        if cache is None:
+            cache = PreparedStatementCache(db_connection)
+            _caches[db_connection] = cache
+        return cache
+
+
+def execute_prepared(db_connection, sql: str, params: Optional[Sequence[Any]] = None):
+    """Execute ``sql`` on ``db_connection`` through its prepared statement cache."""
+    return prepared_statements(db_connection).execute(sql, params)
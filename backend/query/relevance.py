@@ -0,0 +1,134 @@
+"""BM25 relevance ranking of keyword matches over the inverted index.
+
+Posts are scored with BM25F over their title and selftext: each field's term
+frequency (stored per post in ``post_terms``) is normalized by the field's
+length relative to its average (``post_lengths``), the title weighted
+``TITLE_BOOST`` times the body, and every query term weighted by its inverse
+document frequency. Only the postings of the query terms are read, and
+``ORDER BY score DESC LIMIT k`` runs as DuckDB's top-N operator, a heap of k
+rows, so ranking many matches to return a page never sorts all of them.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from ingest.schema import LENGTHS_TABLE, TERMS_TABLE
+from ingest.version import current_version, on_version_change
+
+from .fulltext import parse_query
+
+# Orders of /api/posts/search (``sort`` request parameter)
+SORT_MODES = ('newest', 'relevance')
+
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+# Weight of a title occurrence relative to a selftext occurrence
+TITLE_BOOST = 2.0
+
+
+@dataclass(frozen=True)
+class CorpusStats:
+    """Number of posts and average field lengths, the corpus-wide inputs of BM25."""
+
+    documents: int
+    avg_title_length: float
+    avg_body_length: float
+
+
+_stats_lock = threading.Lock()
+_stats: Optional[Tuple[int, CorpusStats]] = None
+
+
+def _forget_stats(version: int):
+    global _stats
+    with _stats_lock:
+        _stats = None
+
+
+on_version_change(_forget_stats)
+
+
+def corpus_stats(db_connection) -> CorpusStats:
+    """Return the corpus statistics, computed once per dataset version."""
+    global _stats
+    version = current_version()
+    with _stats_lock:
+        if _stats is not None and _stats[0] == version:
+            return _stats[1]
+
+    documents, avg_title, avg_body = db_connection.execute(
+        f"SELECT COUNT(*), AVG(title_length), AVG(body_length) FROM {LENGTHS_TABLE}"
+    ).fetchone()
+    # Guard the length normalization against empty fields across the whole corpus
+    stats = CorpusStats(documents, max(avg_title or 0.0, 1.0), max(avg_body or 0.0, 1.0))
+    with _stats_lock:
+        _stats = (version, stats)
+    return stats
+
+
+def scoring_terms(keyword: str, prefix: bool = False) -> List[Tuple[str, str]]:
+    """List the words of a keyword query to score posts on.
+
+    Args:
+        keyword: Keyword query, see ``query.fulltext``
+        prefix: Score every word as a prefix, as substring matches do
+            (``ukrain`` scores posts containing ``ukraine``)
+
+    Returns:
+        Distinct ``(predicate on post_terms.term, param)`` pairs, one per word
+    """
+    terms = []
+    for group in parse_query(keyword):
+        for clause in group:
+            for term in clause.terms:
+                if prefix or clause.prefix:
+                    terms.append(("term LIKE ?", term + '%'))
+                else:
+                    terms.append(("term = ?", term))
+    return list(dict.fromkeys(terms))
+
+
+def relevance_scores_sql(db_connection, keyword: str, prefix: bool = False) -> Tuple[str, List[Any]]:
+    """Build a subquery scoring every post holding a word of the keyword.
+
+    Each word's postings are read by a query of their own: a lone equality
+    (or prefix LIKE) on the term-sorted index lets DuckDB skip every row
+    group outside the word's range, which an OR or IN of several words does not.
+
+    Args:
+        db_connection: DuckDB connection or cursor, used for the corpus statistics
+        keyword: Keyword query, see ``query.fulltext``
+        prefix: Score every word as a prefix, see ``scoring_terms``
+
+    Returns:
+        Tuple of (SQL selecting ``post_id, score``, positional params)
+    """
+    terms = scoring_terms(keyword, prefix)
+    if not terms:
+        return "SELECT NULL::VARCHAR AS post_id, NULL::DOUBLE AS score WHERE false", []
+
+    stats = corpus_stats(db_connection)
+    postings = "\n                UNION ALL\n                ".join(
+        f"SELECT term, post_id, title_tf, body_tf, title_length, body_length FROM {TERMS_TABLE} WHERE {predicate}"
+        for predicate, _ in terms
+    )
+    sql = f"""
+            SELECT post_id, SUM(idf * tf * ({K1} + 1) / (tf + {K1})) AS score
+            FROM (
+                SELECT
+                    post_id,
+                    LN(1 + (? - COUNT(*) OVER (PARTITION BY term) + 0.5) / (COUNT(*) OVER (PARTITION BY term) + 0.5)) AS idf,
+                    ? * title_tf / (1 - {B} + {B} * title_length / ?)
+                        + body_tf / (1 - {B} + {B} * body_length / ?) AS tf
+                FROM (
+                {postings}
+                )
+            )
+            GROUP BY post_id
+    """
+    params = [stats.documents, TITLE_BOOST, stats.avg_title_length, stats.avg_body_length]
+    params += [param for _, param in terms]
+    return sql, params
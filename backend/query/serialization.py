@@ -0,0 +1,175 @@
+"""Pluggable JSON encoding of the API's responses.
+
+Every route answers through ``jsonify``, which encodes with ``app.json``.
+``init_json`` installs the provider picked by ``JSON_SERIALIZER``:
+
+    auto (default)  orjson when the package is installed, else the stdlib
+    orjson          orjson, failing at startup if it is missing
+    stdlib          Python's ``json`` module
+
+orjson encodes the large network and topics payloads (long lists of dicts
+holding floats) several times faster than the stdlib encoder and writes
+UTF-8 bytes straight into the response. Both providers produce the same
+documents: keys sorted, numpy scalars and arrays as numbers and lists, and
+dates in ISO 8601.
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date
+from typing import Any, Dict, List
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Values of the JSON_SERIALIZER setting
+SERIALIZERS = ('auto', 'orjson', 'stdlib')
+
+
+def _default(value):
+    """Encode the types neither encoder handles natively, then defer to Flask's rules."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        # Also covers masked arrays, whose masked entries become None
+        return value.tolist()
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's stdlib provider, taught numpy values and ISO 8601 dates."""
+
+    name = 'stdlib'
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Encodes responses with orjson; calls with ``json.dumps`` keyword arguments keep the stdlib."""
+
+    name = 'orjson'
+    default = staticmethod(_default)
+
+    def __init__(self, app):
+        import orjson
+
+        super().__init__(app)
+        self._orjson = orjson
+
+    def _options(self, indent: bool = False) -> int:
+        options = self._orjson.OPT_SERIALIZE_NUMPY | self._orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+        if indent:
+            options |= self._orjson.OPT_INDENT_2
+        return options
+
+    def encode(self, obj: Any, indent: bool = False) -> bytes:
+        """Serialize data as UTF-8 JSON bytes."""
+        return self._orjson.dumps(obj, default=_default, option=self._options(indent))
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self._orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.encode(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def orjson_available() -> bool:
+    """Tell whether the orjson package can be imported."""
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def json_serializer() -> str:
+    """Resolve ``JSON_SERIALIZER`` (default ``auto``) to ``orjson`` or ``stdlib``.
+
+    Raises:
+        ValueError: If the setting is unknown
+        ImportError: If ``orjson`` is requested but not installed
+    """
+    requested = os.getenv('JSON_SERIALIZER', 'auto').lower()
+    if requested not in SERIALIZERS:
+        raise ValueError(f"Invalid JSON_SERIALIZER. Use one of: {', '.join(SERIALIZERS)}")
+    if requested == 'stdlib':
+        return 'stdlib'
+    if orjson_available():
+        return 'orjson'
+    if requested == 'orjson':
+        raise ImportError("JSON_SERIALIZER=orjson requires the orjson package (pip install orjson)")
+    return 'stdlib'
+
+
+def init_json(app) -> str:
+    """Install the configured JSON provider on a Flask app and return its name."""
+    provider = OrjsonProvider if json_serializer() == 'orjson' else StdlibJSONProvider
+    app.json = provider(app)
+    logger.info(f"Encoding JSON responses with {provider.name}")
+    return provider.name
+
+
+def benchmark(payload: Any, repeat: int = 20) -> Dict[str, Any]:
+    """Time encoding a response payload with each available provider.
+
+    Args:
+        payload: Decoded response body, e.g. ``/api/network?limit=8000``
+        repeat: Runs of each encoder; the fastest one is reported
+
+    Returns:
+        Encoded size and best time in milliseconds per provider
+    """
+    from flask import Flask
+
+    app = Flask(__name__)
+    providers: List[type] = [StdlibJSONProvider]
+    if orjson_available():
+        providers.append(OrjsonProvider)
+
+    result = {}
+    for provider_class in providers:
+        provider = provider_class(app)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = provider.response(payload).get_data()
+            timings.append(time.perf_counter() - started)
+        result[provider.name] = {"bytes": len(body), "ms": round(min(timings) * 1000, 3)}
+    return result
+
+
+if __name__ == '__main__':
+    # Compare the encoders on saved responses:
+    #   curl -s 'localhost:5000/api/network?limit=8000' > network.json
+    #   python -m query.serialization network.json topics.json
+    if len(sys.argv) < 2:
+        print("Usage: python -m query.serialization <response.json> [response.json ...]")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        with open(path, encoding='utf-8') as payload_file:
+            payload = json.load(payload_file)
+        result = benchmark(payload)
+        line = f"{path}: stdlib {result['stdlib']['ms']} ms ({result['stdlib']['bytes']} bytes)"
+        if 'orjson' in result:
+            speedup = result['stdlib']['ms'] / result['orjson']['ms'] if result['orjson']['ms'] else float('inf')
+            line += f", orjson {result['orjson']['ms']} ms ({speedup:.1f}x)"
+        print(line)
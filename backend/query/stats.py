@@ -0,0 +1,267 @@
+"""One-pass /api/stats: every aggregate from a single GROUPING SETS scan.
+
+The stats payload counts posts in total, per subreddit, author, domain and
+day. ``compute_stats`` computes all five in one scan of the posts with
+``GROUP BY GROUPING SETS`` and ranks the top values of each dimension in
+the same query, instead of scanning the posts once per aggregate.
+
+The unfiltered stats only change when data is appended, so ``StatsRollup``
+keeps those grouped counts in a small in-memory table built once the data is
+loaded, and holds the ranked payload in memory for the current dataset
+version. Appends refresh it incrementally: inside the append transaction
+only the batch's new posts are counted, and once the new version is
+committed their counts are added to the rollup and the payload is ranked
+again from it. The counts cannot be added to the rollup inside the append
+transaction itself, because a DuckDB transaction writes to a single attached
+database.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from ingest.appender import register_derived_table
+from ingest.schema import POSTS_TABLE, dimension_id_column, dimension_table
+from ingest.snapshot import SNAPSHOT_ALIAS
+from ingest.version import current_version, on_version_change
+
+from .dimensions import EXCLUDED_AUTHORS_FILTER
+from .prepared import execute_prepared
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+STATS_ROLLUP_TABLE = 'stats_rollup'
+
+# The snapshot's posts table, whose rowids tell an append's new posts apart
+POSTS_SOURCE = f"{SNAPSHOT_ALIAS}.{POSTS_TABLE}"
+
+# Grouped columns, in the order of their bits in GROUPING(): a set's bit is
+# 0 for the columns it groups by and 1 for the others
+GROUPED_COLUMNS = ('subreddit_id', 'author_id', 'domain_id', 'day_bucket')
+_ALL_BITS = (1 << len(GROUPED_COLUMNS)) - 1
+
+
+def _grouping_set(column: str) -> int:
+    return _ALL_BITS & ~(1 << (len(GROUPED_COLUMNS) - 1 - GROUPED_COLUMNS.index(column)))
+
+
+# GROUPING() of each grouping set
+TOTAL_SET = _ALL_BITS
+SUBREDDIT_SET = _grouping_set('subreddit_id')
+AUTHOR_SET = _grouping_set('author_id')
+DOMAIN_SET = _grouping_set('domain_id')
+DAY_SET = _grouping_set('day_bucket')
+
+# Ranked dimensions: (dimension, grouping set, payload key, dimension key filter)
+RANKINGS = (
+    ('subreddit', SUBREDDIT_SET, 'top_subreddits', None),
+    ('domain', DOMAIN_SET, 'top_domains', "key NOT LIKE 'self.%'"),
+    ('author', AUTHOR_SET, 'top_authors', EXCLUDED_AUTHORS_FILTER),
+)
+
+TOP_LIMIT = 10
+
+
+def grouped_counts_sql(source: str = 'reddit_posts_view', where_clause: str = "1=1") -> str:
+    """Build the GROUPING SETS query counting posts in total and per subreddit, author, domain and day.
+
+    Returns:
+        SQL selecting ``grouping_set``, the grouped columns and ``post_count``
+    """
+    columns = ", ".join(GROUPED_COLUMNS)
+    sets = ", ".join(f"({column})" for column in GROUPED_COLUMNS)
+    return f"""
+            SELECT GROUPING({columns}) AS grouping_set, {columns}, COUNT(*) AS post_count
+            FROM {source}
+            WHERE {where_clause}
+            GROUP BY GROUPING SETS ((), {sets})
+    """
+
+
+def ranked_stats_sql(grouped: str) -> str:
+    """Build a query ranking grouped counts into the rows of the stats payload.
+
+    Every dimension's values are ranked by post count, ties broken by id, and
+    only the top ``TOP_LIMIT`` are joined to their dimension table for their
+    display name. Author rankings leave out deleted accounts and the
+    moderation bot, domain rankings self posts.
+
+    Args:
+        grouped: Query or table of grouped counts, see ``grouped_counts_sql``
+
+    Returns:
+        SQL selecting ``(grouping_set, name, day, post_count, rank_id)`` rows
+    """
+    rankings = []
+    for dimension, grouping_set, _, key_filter in RANKINGS:
+        column = dimension_id_column(dimension)
+        table = dimension_table(dimension)
+        # Joining only the ranked set keeps ``key`` unambiguous in the filter
+        join = f"JOIN {table} ON {table}.id = grouped.{column}" if key_filter else \
+            f"LEFT JOIN {table} ON {table}.id = grouped.{column}"
+        condition = f" AND {key_filter}" if key_filter else ""
+        rankings.append(f"""
+            SELECT * FROM (
+                SELECT grouped.grouping_set, {table}.name, NULL::TIMESTAMP AS day, grouped.post_count, grouped.{column} AS rank_id
+                FROM grouped
+                {join}
+                WHERE grouped.grouping_set = {grouping_set}{condition}
+                ORDER BY grouped.post_count DESC, grouped.{column}
+                LIMIT {TOP_LIMIT}
+            )""")
+    union = "\n            UNION ALL".join(rankings)
+    return f"""
+            WITH grouped AS MATERIALIZED ({grouped})
+            SELECT grouping_set, NULL::VARCHAR AS name, day_bucket AS day, post_count, NULL::BIGINT AS rank_id
+            FROM grouped
+            WHERE grouping_set IN ({TOTAL_SET}, {DAY_SET})
+            UNION ALL{union}
+            ORDER BY grouping_set, day, post_count DESC, rank_id
+    """
+
+
+def stats_payload(rows: Sequence[Tuple[Any, ...]]) -> Dict[str, Any]:
+    """Turn ranked stats rows into the /api/stats payload."""
+    payload = {"total_posts": 0, "posts_over_time": []}
+    for _, _, key, _ in RANKINGS:
+        payload[key] = []
+    rankings = {grouping_set: (dimension, key) for dimension, grouping_set, key, _ in RANKINGS}
+
+    for grouping_set, name, day, post_count, _ in rows:
+        if grouping_set == TOTAL_SET:
+            payload["total_posts"] = post_count
+        elif grouping_set == DAY_SET:
+            payload["posts_over_time"].append({"date": day.strftime("%Y-%m-%d"), "count": post_count})
+        else:
+            dimension, key = rankings[grouping_set]
+            payload[key].append({dimension: name, "count": post_count})
+    return payload
+
+
+def compute_stats(db_connection, source: str = 'reddit_posts_view', where_clause: str = "1=1",
+                  params: Sequence[Any] = ()) -> Dict[str, Any]:
+    """Compute the /api/stats payload over the posts of ``source`` matching ``where_clause`` in one scan."""
+    sql = ranked_stats_sql(grouped_counts_sql(source, where_clause))
+    return stats_payload(execute_prepared(db_connection, sql, list(params)).fetchall())
+
+
+class StatsRollup:
+    """The unfiltered stats' grouped counts and ranked payload, kept current across appends."""
+
+    def __init__(self):
+        self.db_connection = None
+        # Number of posts counted into the rollup table
+        self.counted = 0
+        self._payload: Optional[Tuple[int, Dict[str, Any]]] = None
+        # (dataset version the append will commit, posts counted before it, posts after it,
+        # grouped counts of its new posts) of the append in progress
+        self._pending: Optional[Tuple[int, int, int, Any]] = None
+        self._lock = threading.Lock()
+
+    def build(self, db_connection):
+        """Count the loaded posts into the rollup table and rank its payload.
+
+        Also starts refreshing it on every append.
+
+        Args:
+            db_connection: DuckDB connection the posts are loaded into
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self.db_connection = db_connection
+            self._rebuild(db_connection, current_version())
+        register_derived_table(STATS_ROLLUP_TABLE, self.refresh)
+        logger.info(f"Built the stats rollup of {self.counted} posts in {time.perf_counter() - started:.3f}s")
+
+    def refresh(self, cursor, staged_table: str):
+        """Count an append's new posts; a derived-table callback of the appender.
+
+        The posts table is append-only and re-crawled posts are updated in
+        place, so the batch's new posts are the rows past the ones already
+        counted, and the subreddit, author, domain and day of the updated ones
+        never change.
+        """
+        with self._lock:
+            counted = self.counted
+        new_posts = cursor.execute(
+            grouped_counts_sql(POSTS_SOURCE, f"rowid >= {int(counted)}")
+        ).fetchdf()
+        total = cursor.execute(f"SELECT COUNT(*) FROM {POSTS_SOURCE}").fetchone()[0]
+        with self._lock:
+            self._pending = (current_version() + 1, counted, total, new_posts)
+
+    def _apply(self, version: int):
+        # Dataset version listener: add the append's counts once it is committed
+        with self._lock:
+            if self.db_connection is None:
+                return
+            pending, self._pending = self._pending, None
+            cursor = self.db_connection.cursor()
+            try:
+                if pending is None or pending[0] != version or pending[1] != self.counted:
+                    # Not an append of ours, e.g. a reload: recount everything
+                    self._rebuild(cursor, version)
+                    return
+
+                _, counted, total, new_posts = pending
+                new_total = new_posts.loc[new_posts['grouping_set'] == TOTAL_SET, 'post_count'].sum()
+                if counted + new_total != total:
+                    logger.warning(f"Stats rollup out of step ({counted} + {new_total} != {total} posts), recounting")
+                    self._rebuild(cursor, version)
+                    return
+
+                cursor.register('new_stats', new_posts)
+                same_key = " AND ".join(
+                    f"new_stats.{column} IS NOT DISTINCT FROM {STATS_ROLLUP_TABLE}.{column}"
+                    for column in ('grouping_set',) + GROUPED_COLUMNS
+                )
+                cursor.execute(f"""
+                    UPDATE {STATS_ROLLUP_TABLE}
+                    SET post_count = {STATS_ROLLUP_TABLE}.post_count + new_stats.post_count
+                    FROM new_stats
+                    WHERE {same_key}
+                """)
+                cursor.execute(f"""
+                    INSERT INTO {STATS_ROLLUP_TABLE}
+                    SELECT * FROM new_stats
+                    WHERE NOT EXISTS (SELECT 1 FROM {STATS_ROLLUP_TABLE} WHERE {same_key})
+                """)
+                cursor.unregister('new_stats')
+                self.counted = total
+                self._rank(cursor, version)
+            except Exception as e:
+                # Requests fall back to scanning the posts until the next refresh
+                logger.error(f"Failed to refresh the stats rollup: {str(e)}")
+                self._payload = None
+            finally:
+                cursor.close()
+
+    def _rebuild(self, db_connection, version: int):
+        db_connection.execute(f"CREATE OR REPLACE TABLE {STATS_ROLLUP_TABLE} AS {grouped_counts_sql(POSTS_SOURCE)}")
+        total = db_connection.execute(
+            f"SELECT post_count FROM {STATS_ROLLUP_TABLE} WHERE grouping_set = {TOTAL_SET}"
+        ).fetchone()
+        self.counted = total[0] if total else 0
+        self._rank(db_connection, version)
+
+    def _rank(self, db_connection, version: int):
+        rows = db_connection.execute(ranked_stats_sql(f"SELECT * FROM {STATS_ROLLUP_TABLE}")).fetchall()
+        self._payload = (version, stats_payload(rows))
+
+    def stats(self) -> Optional[Dict[str, Any]]:
+        """Return the unfiltered stats of the current dataset version, or None if not built yet."""
+        payload = self._payload
+        if payload is None or payload[0] != current_version():
+            return None
+        return payload[1]
+
+    def info(self) -> Dict[str, Any]:
+        """Report the number of posts counted and the dataset version the payload was ranked at."""
+        payload = self._payload
+        return {"posts": self.counted, "version": payload[0] if payload else None, "current": self.stats() is not None}
+
+
+stats_rollup = StatsRollup()
+on_version_change(stats_rollup._apply)
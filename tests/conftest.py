@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The backend's packages (ingest, query, chat) are imported from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+
+def post(post_id, title="a post", selftext="", created_utc=1700000000, subreddit="test", author="someone",
+         domain="self.test", score=1, num_comments=0, upvote_ratio=1.0):
+    """Return one raw Reddit listing line for a post."""
+    return {"kind": "t3", "data": {
+        "id": post_id, "subreddit": subreddit, "author": author, "title": title, "selftext": selftext,
+        "created_utc": created_utc, "score": score, "num_comments": num_comments, "permalink": f"/r/{subreddit}/{post_id}",
+        "url": f"http://example.com/{post_id}", "upvote_ratio": upvote_ratio, "domain": domain,
+    }}
+
+
+@pytest.fixture
+def write_posts():
+    """Write raw posts to a JSONL file and return its path."""
+    def write(path, posts):
+        with open(path, 'w') as f:
+            for line in posts:
+                f.write(json.dumps(line) + "\n")
+        return str(path)
+    return write
@@ -0,0 +1,73 @@
+import duckdb
+import pytest
+
+import ingest.appender
+import ingest.version
+from ingest.appender import PostAppender
+from ingest.schema import LENGTHS_TABLE, POSTS_TABLE, TERMS_TABLE
+from ingest.snapshot import SNAPSHOT_ALIAS, attach_snapshot, ensure_snapshot, snapshot_dataset_version
+from ingest.version import current_version, set_version
+
+from ..conftest import post
+
+ORIGINAL = post('p1', title="climate change", selftext="original body", subreddit="news", author="alice",
+                domain="a.com", created_utc=1700000000, score=1, num_comments=2, upvote_ratio=0.5)
+
+
+@pytest.fixture
+def con(tmp_path, write_posts, monkeypatch):
+    # Appends here must not refresh the app's derived tables or notify its listeners
+    monkeypatch.setattr(ingest.appender, '_derived_tables', [])
+    monkeypatch.setattr(ingest.version, '_listeners', [])
+    previous_version = current_version()
+
+    data_path = write_posts(tmp_path / 'data.jsonl', [ORIGINAL])
+    con = duckdb.connect(':memory:')
+    attach_snapshot(con, ensure_snapshot(data_path, str(tmp_path / 'snapshot.duckdb')), read_only=False)
+    set_version(snapshot_dataset_version(con))
+    yield con
+    con.close()
+    set_version(previous_version)
+
+
+def stored_post(con, post_id):
+    return con.execute(f"""
+        SELECT title, selftext, subreddit, author, domain, created_utc, score, num_comments, upvote_ratio
+        FROM {SNAPSHOT_ALIAS}.{POSTS_TABLE} WHERE id = ?
+    """, [post_id]).fetchone()
+
+
+def index_of(con, post_id):
+    terms = con.execute(
+        f"SELECT * FROM {SNAPSHOT_ALIAS}.{TERMS_TABLE} WHERE post_id = ? ORDER BY term", [post_id]
+    ).fetchall()
+    lengths = con.execute(f"SELECT * FROM {SNAPSHOT_ALIAS}.{LENGTHS_TABLE} WHERE post_id = ?", [post_id]).fetchall()
+    return terms, lengths
+
+
+def test_recrawl_updates_only_engagement(con, tmp_path, write_posts):
+    index = index_of(con, 'p1')
+    recrawled = post('p1', title="edited title", selftext="edited body", subreddit="politics", author="bob",
+                     domain="b.com", created_utc=1800000000, score=99, num_comments=40, upvote_ratio=0.75)
+
+    result = PostAppender(con).append_file(write_posts(tmp_path / 'batch.jsonl', [recrawled]))
+    assert (result["rows"], result["inserted"], result["updated"]) == (1, 0, 1)
+    assert stored_post(con, 'p1') == (
+        "climate change", "original body", "news", "alice", "a.com", 1700000000, 99, 40, 0.75
+    )
+    # The text is never indexed again
+    assert index_of(con, 'p1') == index
+    assert con.execute(f"SELECT COUNT(*) FROM {SNAPSHOT_ALIAS}.{TERMS_TABLE} WHERE term = 'edited'").fetchone()[0] == 0
+
+
+def test_reingesting_a_batch_is_harmless(con, tmp_path, write_posts):
+    appender = PostAppender(con)
+    path = write_posts(tmp_path / 'batch.jsonl', [post('p2', title="weather report", created_utc=1700003600)])
+    first = appender.append_file(path)
+    index = index_of(con, 'p2')
+
+    second = appender.append_file(path)
+    assert (first["inserted"], second["inserted"], second["updated"]) == (1, 0, 1)
+    assert second["dataset_version"] == first["dataset_version"] + 1
+    assert con.execute(f"SELECT COUNT(*) FROM {SNAPSHOT_ALIAS}.{POSTS_TABLE}").fetchone()[0] == 2
+    assert index_of(con, 'p2') == index
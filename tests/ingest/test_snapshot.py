@@ -0,0 +1,37 @@
+import duckdb
+
+from ingest.snapshot import META_TABLE, ensure_snapshot, read_snapshot_meta
+
+from ..conftest import post
+
+
+def dataset_version(snapshot_path):
+    return int(read_snapshot_meta(snapshot_path)['dataset_version'])
+
+
+def test_rebuild_never_reuses_a_dataset_version(tmp_path, write_posts):
+    data_path = write_posts(tmp_path / 'data.jsonl', [post('p1'), post('p2')])
+    snapshot_path = str(tmp_path / 'snapshot.duckdb')
+    ensure_snapshot(data_path, snapshot_path)
+    first = dataset_version(snapshot_path)
+
+    # The sources change, so the snapshot is rebuilt rather than extended
+    write_posts(tmp_path / 'data.jsonl', [post('p3', title="other data")])
+    ensure_snapshot(data_path, snapshot_path)
+    assert dataset_version(snapshot_path) > first
+
+
+def test_rebuild_carries_on_from_appended_versions(tmp_path, write_posts):
+    data_path = write_posts(tmp_path / 'data.jsonl', [post('p1')])
+    snapshot_path = str(tmp_path / 'snapshot.duckdb')
+    ensure_snapshot(data_path, snapshot_path)
+
+    # Versions bumped by appends may run ahead of the clock
+    ahead = dataset_version(snapshot_path) + 1000
+    con = duckdb.connect(snapshot_path)
+    con.execute(f"UPDATE {META_TABLE} SET value = ? WHERE key = 'dataset_version'", [str(ahead)])
+    con.close()
+
+    write_posts(tmp_path / 'data.jsonl', [post('p2')])
+    ensure_snapshot(data_path, snapshot_path)
+    assert dataset_version(snapshot_path) == ahead + 1
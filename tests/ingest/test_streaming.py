@@ -0,0 +1,61 @@
+import duckdb
+import pytest
+
+import ingest.upsert
+from ingest.schema import (
+    DIMENSIONS, LENGTHS_TABLE, POSTS_TABLE, TERMS_TABLE, create_dimension_table_sql, create_lengths_table_sql,
+    create_posts_table_sql, create_terms_table_sql
+)
+from ingest.streaming import StreamingLoader
+
+from ..conftest import post
+
+POSTS = [post(f"p{i}", title=f"climate report {i}", created_utc=1700000000 + i) for i in range(5)]
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect(':memory:')
+    con.execute(create_posts_table_sql())
+    for dimension in DIMENSIONS:
+        con.execute(create_dimension_table_sql(dimension))
+    con.execute(create_terms_table_sql())
+    con.execute(create_lengths_table_sql())
+    yield con
+    con.close()
+
+
+def counts(con):
+    return tuple(con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                 for table in (POSTS_TABLE, TERMS_TABLE, LENGTHS_TABLE))
+
+
+def test_load(con, tmp_path, write_posts):
+    metrics = StreamingLoader(con, batch_rows=2).load(write_posts(tmp_path / 'data.jsonl', POSTS))
+    assert (metrics.rows, metrics.batches) == (5, 3)
+    assert (metrics.min_created_utc, metrics.max_created_utc) == (1700000000, 1700000004)
+    assert counts(con) == (5, 15, 5)
+
+
+def test_interrupted_batch_leaves_no_postings(con, tmp_path, write_posts, monkeypatch):
+    path = write_posts(tmp_path / 'data.jsonl', POSTS)
+
+    # Fail the posts upsert of the second batch, after its index rows were inserted
+    upserts = []
+    posts_upsert_sql = ingest.upsert.posts_upsert_sql
+
+    def failing_upsert_sql(*args, **kwargs):
+        upserts.append(1)
+        if len(upserts) == 2:
+            return "SELECT * FROM no_such_table"
+        return posts_upsert_sql(*args, **kwargs)
+
+    monkeypatch.setattr(ingest.upsert, 'posts_upsert_sql', failing_upsert_sql)
+    with pytest.raises(duckdb.Error):
+        StreamingLoader(con, batch_rows=2).load(path)
+    assert counts(con) == (2, 6, 2)
+
+    # Loading the file again, as after a crash, leaves every post indexed once
+    monkeypatch.setattr(ingest.upsert, 'posts_upsert_sql', posts_upsert_sql)
+    StreamingLoader(con, batch_rows=2).load(path)
+    assert counts(con) == (5, 15, 5)
@@ -0,0 +1,76 @@
+import duckdb
+import pytest
+
+from ingest.schema import (
+    DIMENSIONS, LENGTHS_TABLE, POSTS_TABLE, TERMS_TABLE, create_dimension_table_sql, create_lengths_table_sql,
+    create_posts_table_sql, create_terms_table_sql, posts_projection_sql, raw_source_sql
+)
+from ingest.upsert import upsert_posts
+
+from ..conftest import post
+
+STAGED_TABLE = 'staged_posts'
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect(':memory:')
+    con.execute(create_posts_table_sql())
+    for dimension in DIMENSIONS:
+        con.execute(create_dimension_table_sql(dimension))
+    con.execute(create_terms_table_sql())
+    con.execute(create_lengths_table_sql())
+    yield con
+    con.close()
+
+
+@pytest.fixture
+def stage(con, tmp_path, write_posts):
+    """Stage raw posts as a typed batch, like the ingest paths do."""
+    def stage_posts(posts):
+        path = write_posts(tmp_path / 'batch.jsonl', posts)
+        con.execute(f"CREATE OR REPLACE TEMP TABLE {STAGED_TABLE} AS {posts_projection_sql(raw_source_sql(path))}")
+    return stage_posts
+
+
+def upsert(con):
+    con.execute("BEGIN TRANSACTION")
+    try:
+        rows = upsert_posts(con, STAGED_TABLE)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return rows
+
+
+def test_same_batch_twice_indexes_once(con, stage):
+    stage([post('p1', title="climate change", selftext="climate talks"), post('p2', title="weather")])
+    upsert(con)
+    postings = con.execute(f"SELECT * FROM {TERMS_TABLE} ORDER BY term, post_id").fetchall()
+    lengths = con.execute(f"SELECT * FROM {LENGTHS_TABLE} ORDER BY post_id").fetchall()
+
+    assert upsert(con) == 2
+    assert con.execute(f"SELECT * FROM {TERMS_TABLE} ORDER BY term, post_id").fetchall() == postings
+    assert con.execute(f"SELECT * FROM {LENGTHS_TABLE} ORDER BY post_id").fetchall() == lengths
+    assert con.execute(f"SELECT COUNT(*) FROM {POSTS_TABLE}").fetchone()[0] == 2
+    assert ('climate', 'p1', 1, 1, 2, 2) in postings
+
+
+def test_requires_a_transaction(con, stage):
+    stage([post('p1')])
+    with pytest.raises(RuntimeError):
+        upsert_posts(con, STAGED_TABLE)
+    assert con.execute(f"SELECT COUNT(*) FROM {TERMS_TABLE}").fetchone()[0] == 0
+
+
+def test_dimension_keeps_first_spelling_seen(con, stage):
+    stage([
+        post('p1', subreddit="WorldNews", created_utc=1700000100),
+        post('p2', subreddit="worldnews", created_utc=1700000200),
+        post('p3', subreddit="Worldnews", created_utc=1700000000),
+    ])
+    upsert(con)
+    stage([post('p4', subreddit="WORLDNEWS", created_utc=1600000000)])
+    upsert(con)
+    assert con.execute("SELECT key, name FROM subreddit_dim").fetchall() == [('worldnews', 'Worldnews')]
@@ -0,0 +1,148 @@
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+from ingest.snapshot import ensure_snapshot, read_snapshot_meta
+from ingest.version import current_version, set_version
+from query.cache import RedisBackend, ResponseCache
+
+
+class FakeRedis:
+    """Dict-backed stand-in for a Redis client's get/set(ex=)."""
+
+    def __init__(self):
+        self.store = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+        self.expiry[key] = ex
+
+
+@pytest.fixture
+def version():
+    previous = current_version()
+    set_version(1)
+    yield
+    set_version(previous)
+
+
+@pytest.fixture
+def client(version):
+    redis = FakeRedis()
+    cache = ResponseCache(RedisBackend(redis), ttls={'stats': 60})
+    app = Flask(__name__)
+    calls = []
+
+    @app.route('/stats')
+    @cache.cached('stats')
+    def stats():
+        calls.append(1)
+        response = jsonify({"calls": len(calls)})
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        response.headers['X-Custom'] = 'kept'
+        return response
+
+    @app.route('/fails')
+    @cache.cached('stats')
+    def fails():
+        calls.append(1)
+        return jsonify({"error": "boom"}), 500
+
+    return app.test_client(), redis, calls, cache
+
+
+def test_miss_then_hit_replays_body_and_headers(client):
+    test_client, redis, calls, _ = client
+
+    first = test_client.get('/stats?b=2&a=1')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert len(redis.store) == 1
+    assert list(redis.expiry.values()) == [60]
+
+    second = test_client.get('/stats?a=1&b=2')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == first.get_json() == {"calls": 1}
+    assert second.headers['X-Custom'] == 'kept'
+    assert second.headers['Cache-Control'] == 'public, max-age=60'
+    assert second.mimetype == 'application/json'
+    assert second.headers['Content-Length'] == str(len(second.get_data()))
+    assert len(calls) == 1
+
+
+def test_other_params_miss(client):
+    test_client, _, calls, _ = client
+
+    test_client.get('/stats?a=1')
+    response = test_client.get('/stats?a=2')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(calls) == 2
+
+
+def test_version_bump_invalidates(client):
+    test_client, redis, calls, cache = client
+
+    test_client.get('/stats')
+    set_version(2)
+    response = test_client.get('/stats')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json() == {"calls": 2}
+    assert len(redis.store) == 2
+    assert cache.stats()["endpoints"]["stats"] == {"hits": 0, "misses": 2}
+
+
+def test_rebuilt_snapshot_misses_shared_entries(client, tmp_path):
+    test_client, redis, calls, _ = client
+    data_path = tmp_path / 'data.jsonl'
+    snapshot_path = str(tmp_path / 'snapshot.duckdb')
+
+    def build(post_id):
+        data_path.write_text(json.dumps({"kind": "t3", "data": {
+            "id": post_id, "title": "a post", "selftext": "", "created_utc": 1700000000,
+            "subreddit": "test", "author": "someone", "domain": "self.test",
+        }}) + "\n")
+        ensure_snapshot(str(data_path), snapshot_path)
+        set_version(int(read_snapshot_meta(snapshot_path)['dataset_version']))
+
+    # Redis outlives the process, so entries of the previous build must not be served
+    build('p1')
+    test_client.get('/stats')
+    build('p2')
+    response = test_client.get('/stats')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json() == {"calls": 2}
+    assert len(redis.store) == 2
+
+
+def test_errors_are_not_cached(client):
+    test_client, redis, calls, _ = client
+
+    assert test_client.get('/fails').status_code == 500
+    assert test_client.get('/fails').headers['X-Cache'] == 'MISS'
+    assert redis.store == {}
+    assert len(calls) == 2
+
+
+def test_failing_backend_degrades_to_misses(version):
+    class BrokenRedis:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def set(self, key, value, ex=None):
+            raise ConnectionError("down")
+
+    cache = ResponseCache(RedisBackend(BrokenRedis()))
+    app = Flask(__name__)
+
+    @app.route('/stats')
+    @cache.cached('stats')
+    def stats():
+        return jsonify({"ok": True})
+
+    response = app.test_client().get('/stats')
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
@@ -0,0 +1,96 @@
+import json
+
+import duckdb
+import pytest
+
+from ingest.schema import DIMENSIONS, POSTS_TABLE, dimension_view_sql, lengths_view_sql, posts_view_sql, terms_view_sql
+from ingest.snapshot import SNAPSHOT_ALIAS, attach_snapshot, ensure_snapshot
+from query.filters import FilterSpec
+from query.fulltext import Clause, any_substring_condition, parse_query
+
+POSTS = [
+    ("p1", "The cat sat on the mat", ""),
+    ("p2", "Category theory for programmers", ""),
+    ("p3", "Two cats and a dog", "climate change is real"),
+    ("p4", "Weather report", "change of climate ahead"),
+]
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('fulltext')
+    data_path = directory / 'data.jsonl'
+    with open(data_path, 'w') as f:
+        for i, (post_id, title, selftext) in enumerate(POSTS):
+            f.write(json.dumps({"kind": "t3", "data": {
+                "id": post_id, "subreddit": "test", "author": "someone", "title": title, "selftext": selftext,
+                "created_utc": 1700000000 + i * 3600, "score": 1, "num_comments": 0, "permalink": f"/r/test/{i}",
+                "url": f"http://example.com/{i}", "upvote_ratio": 1.0, "domain": "self.test",
+            }}) + "\n")
+
+    con = duckdb.connect(':memory:')
+    attach_snapshot(con, ensure_snapshot(str(data_path), str(directory / 'snapshot.duckdb')))
+    con.execute(posts_view_sql(f"{SNAPSHOT_ALIAS}.{POSTS_TABLE}"))
+    for dimension in DIMENSIONS:
+        con.execute(dimension_view_sql(dimension, SNAPSHOT_ALIAS))
+    con.execute(terms_view_sql(SNAPSHOT_ALIAS))
+    con.execute(lengths_view_sql(SNAPSHOT_ALIAS))
+    yield con
+    con.close()
+
+
+def matching(con, keyword, match=None):
+    args = {'keyword': keyword}
+    if match:
+        args['match'] = match
+    where_clause, params = FilterSpec.from_args(args).compile(con)
+    rows = con.execute(f"SELECT id FROM reddit_posts_view WHERE {where_clause} ORDER BY id", params).fetchall()
+    return [row[0] for row in rows]
+
+
+def test_parse_and():
+    assert parse_query("climate change") == [[Clause(('climate',)), Clause(('change',))]]
+
+
+def test_parse_or():
+    assert parse_query("climate OR weather") == [[Clause(('climate',))], [Clause(('weather',))]]
+
+
+def test_parse_phrase():
+    assert parse_query('"Climate Change" now') == [[Clause(('climate', 'change')), Clause(('now',))]]
+
+
+def test_parse_prefix():
+    assert parse_query("climat*") == [[Clause(('climat',), prefix=True)]]
+    # Only a single bare word can be a prefix
+    assert parse_query('"climate change*"') == [[Clause(('climate', 'change'))]]
+
+
+def test_parse_without_words():
+    assert parse_query("OR ++") == []
+
+
+def test_substring_is_default():
+    assert FilterSpec.from_args({'keyword': 'cat'}).match == 'substring'
+
+
+def test_substring_matches_inside_words(db):
+    assert matching(db, 'cat') == ['p1', 'p2', 'p3']
+    assert matching(db, 'CAT', 'substring') == ['p1', 'p2', 'p3']
+
+
+def test_words_match_whole_words(db):
+    assert matching(db, 'cat', 'words') == ['p1']
+    assert matching(db, 'cat*', 'words') == ['p1', 'p2', 'p3']
+
+
+def test_words_and_or_phrase(db):
+    assert matching(db, 'climate change', 'words') == ['p3', 'p4']
+    assert matching(db, '"climate change"', 'words') == ['p3']
+    assert matching(db, 'dog OR weather', 'words') == ['p3', 'p4']
+
+
+def test_any_substring_condition(db):
+    condition, params = any_substring_condition(['dog', 'weath'])
+    rows = db.execute(f"SELECT id FROM reddit_posts_view WHERE {condition} ORDER BY id", params).fetchall()
+    assert [row[0] for row in rows] == ['p3', 'p4']
@@ -0,0 +1,75 @@
+import duckdb
+import pytest
+
+import ingest.appender
+import ingest.version
+from ingest.appender import PostAppender
+from ingest.schema import DIMENSIONS, POSTS_TABLE, dimension_view_sql, posts_view_sql
+from ingest.snapshot import SNAPSHOT_ALIAS, attach_snapshot, ensure_snapshot, snapshot_dataset_version
+from ingest.version import current_version, on_version_change, set_version
+from query.stats import StatsRollup, compute_stats
+
+from ..conftest import post
+
+DAY = 86400
+
+
+@pytest.fixture
+def con(tmp_path, write_posts, monkeypatch):
+    # Keep the rollup under test from touching the app's derived tables and version listeners
+    monkeypatch.setattr(ingest.appender, '_derived_tables', [])
+    monkeypatch.setattr(ingest.version, '_listeners', [])
+    previous_version = current_version()
+
+    data_path = write_posts(tmp_path / 'data.jsonl', [
+        post('p1', subreddit="news", author="alice", domain="a.com", created_utc=1700000000),
+        post('p2', subreddit="news", author="bob", domain="b.com", created_utc=1700000000 + DAY),
+        post('p3', subreddit="politics", author="alice", domain="a.com", created_utc=1700000000 + DAY),
+    ])
+    con = duckdb.connect(':memory:')
+    attach_snapshot(con, ensure_snapshot(data_path, str(tmp_path / 'snapshot.duckdb')), read_only=False)
+    con.execute(posts_view_sql(f"{SNAPSHOT_ALIAS}.{POSTS_TABLE}"))
+    for dimension in DIMENSIONS:
+        con.execute(dimension_view_sql(dimension, SNAPSHOT_ALIAS))
+    set_version(snapshot_dataset_version(con))
+    yield con
+    con.close()
+    set_version(previous_version)
+
+
+@pytest.fixture
+def rollup(con):
+    rollup = StatsRollup()
+    on_version_change(rollup._apply)
+    rollup.build(con)
+    return rollup
+
+
+def test_build_matches_compute_stats(con, rollup):
+    assert rollup.stats() == compute_stats(con)
+    assert rollup.stats()["total_posts"] == 3
+
+
+def test_appends_refresh_incrementally(con, rollup, tmp_path, write_posts, monkeypatch):
+    def recount(*args):
+        raise AssertionError("the rollup was recounted instead of refreshed")
+
+    monkeypatch.setattr(rollup, '_rebuild', recount)
+    appender = PostAppender(con)
+    result = appender.append_file(write_posts(tmp_path / 'batch1.jsonl', [
+        # Re-crawled: only its engagement metrics change, it is not counted again
+        post('p1', subreddit="news", author="alice", domain="a.com", created_utc=1700000000, score=50),
+        post('p4', subreddit="worldnews", author="carol", domain="c.com", created_utc=1700000000 + 2 * DAY),
+        post('p5', subreddit="news", author="bob", domain="b.com", created_utc=1700000000 + 2 * DAY),
+    ]))
+    assert (result["inserted"], result["updated"]) == (2, 1)
+    assert rollup.info() == {"posts": 5, "version": current_version(), "current": True}
+    assert rollup.stats() == compute_stats(con)
+
+    appender.append_file(write_posts(tmp_path / 'batch2.jsonl', [
+        post('p6', subreddit="politics", author="dave", domain="a.com", created_utc=1700000000 + 3 * DAY),
+    ]))
+    stats = rollup.stats()
+    assert stats == compute_stats(con)
+    assert stats["total_posts"] == 6
+    assert {"subreddit": "news", "count": 3} in stats["top_subreddits"]